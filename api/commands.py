@@ -11,6 +11,7 @@ import click
 from tqdm import tqdm
 from flask import current_app, Flask
 from langchain.embeddings import OpenAIEmbeddings
+from sqlalchemy import func
 from werkzeug.exceptions import NotFound
 
 from core.embedding.cached_embedding import CacheEmbedding
@@ -25,7 +26,7 @@ from libs.helper import email as email_validate
 from extensions.ext_database import db
 from libs.rsa import generate_key_pair
 from models.account import InvitationCode, Tenant, TenantAccountJoin
-from models.dataset import Dataset, DatasetQuery, Document, DatasetCollectionBinding
+from models.dataset import Dataset, DatasetQuery, Document, DatasetCollectionBinding, Embedding
 from models.model import Account, AppModelConfig, App
 import secrets
 import base64
@@ -718,6 +719,54 @@ def migrate_default_input_to_dataset_query_variable(batch_size):
             pbar.update(len(data_batch))
 
 
+@click.command('migrate-embeddings-storage-format', help='Convert pickled cached embeddings to the binary storage format.')
+@click.option("--batch-size", default=500, help="Number of records to migrate in each batch.")
+@click.option("--storage-format", default='float32', type=click.Choice(['float32', 'float16']),
+              help="Target storage format.")
+@click.option("--interval", default=0.0, help="Seconds to sleep between batches to limit database load.")
+def migrate_embeddings_storage_format(batch_size, storage_format, interval):
+    click.secho("Start migrate cached embeddings to {} storage format.".format(storage_format), fg='green')
+
+    legacy_filter = func.get_byte(Embedding.embedding, 0) == Embedding.LEGACY_PICKLE_PREFIX
+
+    total_records = db.session.query(Embedding).filter(legacy_filter).count()
+    if total_records == 0:
+        click.secho("No data to migrate.", fg='green')
+        return
+
+    migrated_count = 0
+    last_id = None
+    with tqdm(total=total_records, desc="Migrating Data") as pbar:
+        while True:
+            query = db.session.query(Embedding.id, Embedding.embedding).filter(legacy_filter)
+            if last_id:
+                query = query.filter(Embedding.id > last_id)
+
+            data_batch = query.order_by(Embedding.id).limit(batch_size).all()
+            if not data_batch:
+                break
+
+            last_id = data_batch[-1].id
+
+            try:
+                db.session.bulk_update_mappings(Embedding, [{
+                    'id': embedding_id,
+                    'embedding': Embedding.encode_embedding(Embedding.decode_embedding(data), storage_format)
+                } for embedding_id, data in data_batch])
+                db.session.commit()
+                migrated_count += len(data_batch)
+            except Exception as e:
+                db.session.rollback()
+                click.secho(f"Error while migrating data: {e}, last embedding id: {last_id}", fg='red')
+
+            pbar.update(len(data_batch))
+
+            if interval:
+                time.sleep(interval)
+
+    click.secho(f"Congratulations! Migrated {migrated_count} cached embeddings.", fg='green')
+
+
 def register_commands(app):
     app.cli.add_command(reset_password)
     app.cli.add_command(reset_email)
@@ -731,3 +780,4 @@ def register_commands(app):
     app.cli.add_command(update_app_model_configs)
     app.cli.add_command(normalization_collections)
     app.cli.add_command(migrate_default_input_to_dataset_query_variable)
+    app.cli.add_command(migrate_embeddings_storage_format)
@@ -60,7 +60,42 @@ DEFAULTS = {
     'UPLOAD_FILE_BATCH_LIMIT': 5,
     'UPLOAD_IMAGE_FILE_SIZE_LIMIT': 10,
     'OUTPUT_MODERATION_BUFFER_SIZE': 300,
-    'MULTIMODAL_SEND_IMAGE_FORMAT': 'base64'
+    'MULTIMODAL_SEND_IMAGE_FORMAT': 'base64',
+    'EMBEDDING_CACHE_BATCH_SIZE': 500,
+    'EMBEDDING_STORAGE_FORMAT': 'float32',
+    'EMBEDDING_QUERY_CACHE_SIZE': 10000,
+    'EMBEDDING_QUERY_CACHE_TTL': 600,
+    'EMBEDDING_REDIS_CACHE_ENABLED': 'False',
+    'EMBEDDING_REDIS_CACHE_TTL': 3600,
+    'KEYWORD_INDEX_SCORING_MODE': 'bm25',
+    'KEYWORD_EXTRACT_MAX_WORKERS': 4,
+    'SEGMENT_HIT_COUNT_FLUSH_INTERVAL': 30,
+    'DATASET_METADATA_CACHE_SIZE': 1000,
+    'DATASET_METADATA_CACHE_TTL': 30,
+    'HIT_TESTING_PROJECTION_METHOD': 'pca',
+    'HIT_TESTING_POSITION_CACHE_TTL': 600,
+    'INDEXING_EMBEDDING_CONCURRENCY': 2,
+    'INDEXING_PIPELINE_QUEUE_SIZE': 4,
+    'QA_DOCUMENT_FORMAT_CONCURRENCY': 10,
+    'QA_DOCUMENT_FORMAT_MAX_RETRIES': 2,
+    'COMPLETION_STREAM_TIMEOUT': 600,
+    'COMPLETION_STREAM_TTL': 600,
+    'COMPLETION_STREAM_MAXLEN': 10000,
+    'COMPLETION_STREAM_READ_BLOCK': 1000,
+    'COMPLETION_STREAM_FLUSH_TOKENS': 16,
+    'COMPLETION_STREAM_FLUSH_INTERVAL': 20,
+    'COMPLETION_STREAM_STOP_CHECK_INTERVAL': 200,
+    'PROMPT_TOKEN_COUNT_CACHE_SIZE': 50000,
+    'CONVERSATION_HISTORY_CACHE_SIZE': 20,
+    'CONVERSATION_HISTORY_CACHE_TTL': 3600,
+    'APP_MODEL_CONFIG_CACHE_SIZE': 5000,
+    'PREFERRED_PROVIDER_CACHE_SIZE': 10000,
+    'PREFERRED_PROVIDER_CACHE_TTL': 60,
+    'RSA_PRIVATE_KEY_CACHE_SIZE': 1000,
+    'RSA_PRIVATE_KEY_CACHE_TTL': 600,
+    'DECRYPTED_TOKEN_CACHE_SIZE': 10000,
+    'DECRYPTED_TOKEN_CACHE_TTL': 600,
+    'COMPLETION_GENERATE_MAX_WORKERS': 100,
 }
 
 
@@ -237,6 +272,88 @@ class Config:
         self.TENANT_DOCUMENT_COUNT = get_env('TENANT_DOCUMENT_COUNT')
         self.CLEAN_DAY_SETTING = get_env('CLEAN_DAY_SETTING')
 
+        # max number of texts looked up or inserted per query against the embeddings cache table
+        self.EMBEDDING_CACHE_BATCH_SIZE = int(get_env('EMBEDDING_CACHE_BATCH_SIZE'))
+
+        # binary format of vectors stored in the embeddings cache table, support float32, float16
+        self.EMBEDDING_STORAGE_FORMAT = get_env('EMBEDDING_STORAGE_FORMAT')
+
+        # query embedding cache in front of the embeddings cache table,
+        # an in-process LRU (max entries, ttl seconds) and an optional redis tier.
+        self.EMBEDDING_QUERY_CACHE_SIZE = int(get_env('EMBEDDING_QUERY_CACHE_SIZE'))
+        self.EMBEDDING_QUERY_CACHE_TTL = int(get_env('EMBEDDING_QUERY_CACHE_TTL'))
+        self.EMBEDDING_REDIS_CACHE_ENABLED = get_bool_env('EMBEDDING_REDIS_CACHE_ENABLED')
+        self.EMBEDDING_REDIS_CACHE_TTL = int(get_env('EMBEDDING_REDIS_CACHE_TTL'))
+
+        # ranking of economy (keyword) index search, support bm25, keyword_count
+        self.KEYWORD_INDEX_SCORING_MODE = get_env('KEYWORD_INDEX_SCORING_MODE')
+
+        # max worker processes used for bulk jieba keyword extraction, 1 to disable parallel extraction
+        self.KEYWORD_EXTRACT_MAX_WORKERS = int(get_env('KEYWORD_EXTRACT_MAX_WORKERS'))
+
+        # seconds retrieved segment hit counts are buffered in redis before being written to the database
+        self.SEGMENT_HIT_COUNT_FLUSH_INTERVAL = int(get_env('SEGMENT_HIT_COUNT_FLUSH_INTERVAL'))
+
+        # datasets cached per process for retrieval, a change of a dataset is seen after the ttl (seconds) at most
+        self.DATASET_METADATA_CACHE_SIZE = int(get_env('DATASET_METADATA_CACHE_SIZE'))
+        self.DATASET_METADATA_CACHE_TTL = int(get_env('DATASET_METADATA_CACHE_TTL'))
+
+        # projection of hit testing results on a plane, support pca, random_projection, tsne (slow),
+        # positions are cached per dataset, query and results for the ttl (seconds).
+        self.HIT_TESTING_PROJECTION_METHOD = get_env('HIT_TESTING_PROJECTION_METHOD')
+        self.HIT_TESTING_POSITION_CACHE_TTL = int(get_env('HIT_TESTING_POSITION_CACHE_TTL'))
+
+        # indexing pipeline, concurrent embedding requests per model provider and
+        # max chunks buffered between the split, embedding and index writing stages.
+        self.INDEXING_EMBEDDING_CONCURRENCY = int(get_env('INDEXING_EMBEDDING_CONCURRENCY'))
+        self.INDEXING_PIPELINE_QUEUE_SIZE = int(get_env('INDEXING_PIPELINE_QUEUE_SIZE'))
+
+        # QA mode documents, max concurrent LLM calls per process and retries per chunk.
+        self.QA_DOCUMENT_FORMAT_CONCURRENCY = int(get_env('QA_DOCUMENT_FORMAT_CONCURRENCY'))
+        self.QA_DOCUMENT_FORMAT_MAX_RETRIES = int(get_env('QA_DOCUMENT_FORMAT_MAX_RETRIES'))
+
+        # Completion streams, generate results are written to capped redis streams.
+        # timeout: seconds a reader follows a task before stopping it,
+        # ttl: seconds a stream is kept after its last event so clients can resume,
+        # maxlen: approximate max events kept per stream,
+        # read block: milliseconds per blocking read of the process wide stream reader.
+        self.COMPLETION_STREAM_TIMEOUT = int(get_env('COMPLETION_STREAM_TIMEOUT'))
+        self.COMPLETION_STREAM_TTL = int(get_env('COMPLETION_STREAM_TTL'))
+        self.COMPLETION_STREAM_MAXLEN = int(get_env('COMPLETION_STREAM_MAXLEN'))
+        self.COMPLETION_STREAM_READ_BLOCK = int(get_env('COMPLETION_STREAM_READ_BLOCK'))
+
+        # LLM tokens are coalesced before being written to the stream, flushed every n tokens
+        # or flush interval milliseconds, the stopped flag is checked once per check interval milliseconds.
+        self.COMPLETION_STREAM_FLUSH_TOKENS = int(get_env('COMPLETION_STREAM_FLUSH_TOKENS'))
+        self.COMPLETION_STREAM_FLUSH_INTERVAL = int(get_env('COMPLETION_STREAM_FLUSH_INTERVAL'))
+        self.COMPLETION_STREAM_STOP_CHECK_INTERVAL = int(get_env('COMPLETION_STREAM_STOP_CHECK_INTERVAL'))
+
+        # max number of generate workers running at once per process, further requests wait for a free worker
+        self.COMPLETION_GENERATE_MAX_WORKERS = int(get_env('COMPLETION_GENERATE_MAX_WORKERS'))
+
+        # max number of per model, per message token counts memoized for conversation memory pruning
+        self.PROMPT_TOKEN_COUNT_CACHE_SIZE = int(get_env('PROMPT_TOKEN_COUNT_CACHE_SIZE'))
+
+        # rolling window of the latest messages per conversation cached in redis for chat memory,
+        # max messages kept per conversation and seconds kept after the last message.
+        self.CONVERSATION_HISTORY_CACHE_SIZE = int(get_env('CONVERSATION_HISTORY_CACHE_SIZE'))
+        self.CONVERSATION_HISTORY_CACHE_TTL = int(get_env('CONVERSATION_HISTORY_CACHE_TTL'))
+
+        # max number of parsed app model config columns cached per process
+        self.APP_MODEL_CONFIG_CACHE_SIZE = int(get_env('APP_MODEL_CONFIG_CACHE_SIZE'))
+
+        # max number of (tenant, provider) resolved preferred providers cached per process and their ttl in seconds,
+        # changes made through the provider service invalidate them across processes before the ttl
+        self.PREFERRED_PROVIDER_CACHE_SIZE = int(get_env('PREFERRED_PROVIDER_CACHE_SIZE'))
+        self.PREFERRED_PROVIDER_CACHE_TTL = int(get_env('PREFERRED_PROVIDER_CACHE_TTL'))
+
+        # max number of parsed tenant private keys and of decrypted tokens kept per process and their ttl in seconds,
+        # decrypted tokens are keyed by a digest of their ciphertext
+        self.RSA_PRIVATE_KEY_CACHE_SIZE = int(get_env('RSA_PRIVATE_KEY_CACHE_SIZE'))
+        self.RSA_PRIVATE_KEY_CACHE_TTL = int(get_env('RSA_PRIVATE_KEY_CACHE_TTL'))
+        self.DECRYPTED_TOKEN_CACHE_SIZE = int(get_env('DECRYPTED_TOKEN_CACHE_SIZE'))
+        self.DECRYPTED_TOKEN_CACHE_TTL = int(get_env('DECRYPTED_TOKEN_CACHE_TTL'))
+
         # File upload Configurations.
         self.UPLOAD_FILE_SIZE_LIMIT = int(get_env('UPLOAD_FILE_SIZE_LIMIT'))
         self.UPLOAD_FILE_BATCH_LIMIT = int(get_env('UPLOAD_FILE_BATCH_LIMIT'))
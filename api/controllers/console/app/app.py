@@ -139,7 +139,7 @@ class AppListApi(Resource):
                         f"No Default System Reasoning Model available. Please configure "
                         f"in the Settings -> Model Provider.")
                 else:
-                    model_dict = app_model_config.model_dict
+                    model_dict = app_model_config.model_dict.copy()
                     model_dict['provider'] = default_model.model_provider.provider_name
                     model_dict['name'] = default_model.name
                     app_model_config.model = json.dumps(model_dict)
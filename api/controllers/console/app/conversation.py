@@ -94,6 +94,8 @@ class CompletionConversationApi(Resource):
             error_out=False
         )
 
+        Conversation.preload_properties(conversations.items)
+
         return conversations
 
 
@@ -216,6 +218,8 @@ class ChatConversationApi(Resource):
             error_out=False
         )
 
+        Conversation.preload_properties(conversations.items)
+
         return conversations
 
 
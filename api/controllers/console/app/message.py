@@ -60,42 +60,21 @@ class ChatMessageListApi(Resource):
         if not conversation:
             raise NotFound("Conversation Not Exists.")
 
+        base_query = db.session.query(Message).filter(Message.conversation_id == conversation.id)
+
+        first_message = None
         if args['first_id']:
-            first_message = db.session.query(Message) \
-                .filter(Message.conversation_id == conversation.id, Message.id == args['first_id']).first()
+            first_message = base_query.filter(Message.id == args['first_id']).first()
 
             if not first_message:
                 raise NotFound("First message not found")
 
-            history_messages = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < first_message.created_at,
-                Message.id != first_message.id
-            ) \
-                .order_by(Message.created_at.desc()).limit(args['limit']).all()
-        else:
-            history_messages = db.session.query(Message).filter(Message.conversation_id == conversation.id) \
-                .order_by(Message.created_at.desc()).limit(args['limit']).all()
-
-        has_more = False
-        if len(history_messages) == args['limit']:
-            current_page_first_message = history_messages[-1]
-            rest_count = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
-
-        history_messages = list(reversed(history_messages))
-
-        return InfiniteScrollPagination(
-            data=history_messages,
-            limit=args['limit'],
-            has_more=has_more
-        )
+        pagination = InfiniteScrollPagination.paginate(base_query, Message, args['limit'], cursor=first_message)
+
+        pagination.data = list(reversed(pagination.data))
+        Message.preload_properties(pagination.data)
+
+        return pagination
 
 
 class MessageFeedbackApi(Resource):
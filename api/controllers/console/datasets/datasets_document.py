@@ -72,6 +72,14 @@ class DocumentResource(Resource):
 
         return documents
 
+    def _set_qa_formatting_progress(self, document: Document):
+        progress = None
+        if document.doc_form == 'qa_model' and document.indexing_status == 'splitting':
+            progress = IndexingRunner.get_qa_formatting_progress(document.id)
+
+        document.qa_completed_chunks = progress['completed'] if progress else None
+        document.qa_total_chunks = progress['total'] if progress else None
+
 
 class GetProcessRuleApi(Resource):
     @setup_required
@@ -496,6 +504,7 @@ class DocumentBatchIndexingStatusApi(DocumentResource):
                                                           DocumentSegment.status != 're_segment').count()
             document.completed_segments = completed_segments
             document.total_segments = total_segments
+            self._set_qa_formatting_progress(document)
             if document.is_paused:
                 document.indexing_status = 'paused'
             documents_status.append(marshal(document, document_status_fields))
@@ -527,6 +536,7 @@ class DocumentIndexingStatusApi(DocumentResource):
 
         document.completed_segments = completed_segments
         document.total_segments = total_segments
+        self._set_qa_formatting_progress(document)
         if document.is_paused:
             document.indexing_status = 'paused'
         return marshal(document, document_status_fields)
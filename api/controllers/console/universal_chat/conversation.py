@@ -9,6 +9,7 @@ from controllers.console.universal_chat.wraps import UniversalChatResource
 from fields.conversation_fields import conversation_with_model_config_infinite_scroll_pagination_fields, \
     conversation_with_model_config_fields
 from libs.helper import TimestampField, uuid_value
+from models.model import Conversation
 from services.conversation_service import ConversationService
 from services.errors.conversation import LastConversationNotExistsError, ConversationNotExistsError
 from services.web_conversation_service import WebConversationService
@@ -31,7 +32,7 @@ class UniversalChatConversationListApi(UniversalChatResource):
             pinned = True if args['pinned'] == 'true' else False
 
         try:
-            return WebConversationService.pagination_by_last_id(
+            pagination = WebConversationService.pagination_by_last_id(
                 app_model=app_model,
                 user=current_user,
                 last_id=args['last_id'],
@@ -41,6 +42,10 @@ class UniversalChatConversationListApi(UniversalChatResource):
         except LastConversationNotExistsError:
             raise NotFound("Last Conversation Not Exists.")
 
+        Conversation.preload_properties(pagination.data)
+
+        return pagination
+
 
 class UniversalChatConversationApi(UniversalChatResource):
     def delete(self, universal_app, c_id):
@@ -3,7 +3,7 @@ import json
 import logging
 from typing import Generator, Union
 
-from flask import Response, stream_with_context
+from flask import Response, stream_with_context, request
 from flask_restful import reqparse
 from werkzeug.exceptions import InternalServerError, NotFound
 
@@ -82,6 +82,19 @@ class CompletionStopApi(WebApiResource):
         return {'result': 'success'}, 200
 
 
+class CompletionStreamApi(WebApiResource):
+    def get(self, app_model, end_user, task_id):
+        if app_model.mode != 'completion':
+            raise NotCompletionAppError()
+
+        try:
+            response = CompletionService.resume_stream(end_user, task_id, _get_last_event_id())
+        except ValueError:
+            raise NotFound("Task Not Exists.")
+
+        return compact_response(response)
+
+
 class ChatApi(WebApiResource):
     def post(self, app_model, end_user):
         if app_model.mode != 'chat':
@@ -143,6 +156,24 @@ class ChatStopApi(WebApiResource):
         return {'result': 'success'}, 200
 
 
+class ChatStreamApi(WebApiResource):
+    def get(self, app_model, end_user, task_id):
+        if app_model.mode != 'chat':
+            raise NotChatAppError()
+
+        try:
+            response = CompletionService.resume_stream(end_user, task_id, _get_last_event_id())
+        except ValueError:
+            raise NotFound("Task Not Exists.")
+
+        return compact_response(response)
+
+
+def _get_last_event_id() -> str:
+    # EventSource sends the id of the last received event on reconnect
+    return request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or '0'
+
+
 def compact_response(response: Union[dict, Generator]) -> Response:
     if isinstance(response, dict):
         return Response(response=json.dumps(response), status=200, mimetype='application/json')
@@ -179,5 +210,7 @@ def compact_response(response: Union[dict, Generator]) -> Response:
 
 api.add_resource(CompletionApi, '/completion-messages')
 api.add_resource(CompletionStopApi, '/completion-messages/<string:task_id>/stop')
+api.add_resource(CompletionStreamApi, '/completion-messages/<string:task_id>/stream')
 api.add_resource(ChatApi, '/chat-messages')
 api.add_resource(ChatStopApi, '/chat-messages/<string:task_id>/stop')
+api.add_resource(ChatStreamApi, '/chat-messages/<string:task_id>/stream')
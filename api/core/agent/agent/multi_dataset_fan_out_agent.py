@@ -0,0 +1,58 @@
+from typing import Tuple, List, Any, Union, Sequence
+
+from langchain.agents import BaseSingleActionAgent
+from langchain.callbacks.manager import Callbacks
+from langchain.schema import AgentAction, AgentFinish
+from langchain.tools import BaseTool
+
+from core.tool.dataset_multi_retriever_tool import DatasetMultiRetrieverTool
+
+
+class MultiDatasetFanOutAgent(BaseSingleActionAgent):
+    """
+    An Multi Dataset Retrieve Agent querying all the datasets at once, without a routing LLM call.
+    """
+    tools: Sequence[BaseTool]
+
+    @property
+    def input_keys(self) -> List[str]:
+        return ["input"]
+
+    def should_use_agent(self, query: str):
+        """
+        return should use agent
+
+        :param query:
+        :return:
+        """
+        return True
+
+    def plan(
+        self,
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        callbacks: Callbacks = None,
+        **kwargs: Any,
+    ) -> Union[AgentAction, AgentFinish]:
+        """Retrieve from all the datasets and finish with the merged result.
+
+        Args:
+            intermediate_steps: Steps the LLM has taken to date, along with observations
+            **kwargs: User inputs.
+
+        Returns:
+            The retrieved context.
+        """
+        tools = [tool for tool in self.tools if isinstance(tool, DatasetMultiRetrieverTool)]
+        if len(tools) == 0:
+            return AgentFinish(return_values={"output": ''}, log='')
+
+        rst = tools[0].run(tool_input={'query': kwargs['input']})
+        return AgentFinish(return_values={"output": rst}, log=rst)
+
+    async def aplan(
+            self,
+            intermediate_steps: List[Tuple[AgentAction, str]],
+            callbacks: Callbacks = None,
+            **kwargs: Any,
+    ) -> Union[AgentAction, AgentFinish]:
+        raise NotImplementedError()
@@ -8,6 +8,7 @@ from langchain.memory.chat_memory import BaseChatMemory
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Extra
 
+from core.agent.agent.multi_dataset_fan_out_agent import MultiDatasetFanOutAgent
 from core.agent.agent.multi_dataset_router_agent import MultiDatasetRouterAgent
 from core.agent.agent.openai_function_call import AutoSummarizingOpenAIFunctionCallAgent
 from core.agent.agent.output_parser.structured_chat import StructuredChatOutputParser
@@ -18,12 +19,14 @@ from langchain.agents import AgentExecutor as LCAgentExecutor
 from core.helper import moderation
 from core.model_providers.error import LLMError
 from core.model_providers.models.llm.base import BaseLLM
+from core.tool.dataset_multi_retriever_tool import DatasetMultiRetrieverTool
 from core.tool.dataset_retriever_tool import DatasetRetrieverTool
 
 
 class PlanningStrategy(str, enum.Enum):
     ROUTER = 'router'
     REACT_ROUTER = 'react_router'
+    FAN_OUT = 'fan_out'
     REACT = 'react'
     FUNCTION_CALL = 'function_call'
 
@@ -93,6 +96,10 @@ class AgentExecutor:
                 output_parser=StructuredChatOutputParser(),
                 verbose=True
             )
+        elif self.configuration.strategy == PlanningStrategy.FAN_OUT:
+            dataset_tools = [t for t in self.configuration.tools if isinstance(t, DatasetRetrieverTool)]
+            self.configuration.tools = [DatasetMultiRetrieverTool.from_tools(dataset_tools)] if dataset_tools else []
+            agent = MultiDatasetFanOutAgent(tools=self.configuration.tools)
         else:
             raise NotImplementedError(f"Unknown Agent Strategy: {self.configuration.strategy}")
 
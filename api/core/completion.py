@@ -144,7 +144,8 @@ class Completion:
             fake_response = None
             if not app_model_config.pre_prompt and agent_execute_result and agent_execute_result.output \
                     and agent_execute_result.strategy not in [PlanningStrategy.ROUTER,
-                                                              PlanningStrategy.REACT_ROUTER]:
+                                                              PlanningStrategy.REACT_ROUTER,
+                                                              PlanningStrategy.FAN_OUT]:
                 fake_response = agent_execute_result.output
 
             # run the final llm
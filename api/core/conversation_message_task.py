@@ -2,11 +2,14 @@ import json
 import time
 from typing import Optional, Union, List
 
+from flask import current_app
+
 from core.callback_handler.entity.agent_loop import AgentLoop
 from core.callback_handler.entity.dataset_query import DatasetQueryObj
 from core.callback_handler.entity.llm_message import LLMMessage
 from core.callback_handler.entity.chain_result import ChainResult
 from core.file.file_obj import FileObj
+from core.memory.conversation_history_cache import conversation_history_cache
 from core.model_providers.model_factory import ModelFactory
 from core.model_providers.models.entity.message import to_prompt_messages, MessageType, PromptMessageFile
 from core.model_providers.models.llm.base import BaseLLM
@@ -190,6 +193,8 @@ class ConversationMessageTask:
 
         db.session.commit()
 
+        conversation_history_cache.append_message(self.message, has_files=bool(self.files))
+
         message_was_created.send(
             self.message,
             conversation=self.conversation,
@@ -321,6 +326,15 @@ class ConversationMessageTask:
 
 
 class PubHandler:
+    """
+    Publishes the events of a generate task to its result stream.
+
+    LLM tokens are coalesced, buffered text is flushed as a single message event once
+    COMPLETION_STREAM_FLUSH_TOKENS tokens are buffered or COMPLETION_STREAM_FLUSH_INTERVAL
+    milliseconds have passed since the last flush, and always before any other event.
+    The stopped flag is read from redis at most once per COMPLETION_STREAM_STOP_CHECK_INTERVAL.
+    """
+
     def __init__(self, user: Union[Account | EndUser], task_id: str,
                  message: Message, conversation: Conversation,
                  chain_pub: bool = False, agent_thought_pub: bool = False):
@@ -333,6 +347,15 @@ class PubHandler:
         self._chain_pub = chain_pub
         self._agent_thought_pub = agent_thought_pub
 
+        self._flush_tokens = int(current_app.config.get('COMPLETION_STREAM_FLUSH_TOKENS'))
+        self._flush_interval = int(current_app.config.get('COMPLETION_STREAM_FLUSH_INTERVAL')) / 1000
+        self._stop_check_interval = int(current_app.config.get('COMPLETION_STREAM_STOP_CHECK_INTERVAL')) / 1000
+
+        self._pending_texts = []
+        self._last_flushed_at = time.perf_counter()
+        self._last_stop_checked_at = None
+        self._stopped = False
+
     @classmethod
     def generate_channel_name(cls, user: Union[Account | EndUser], task_id: str):
         if not user:
@@ -347,22 +370,13 @@ class PubHandler:
         return "generate_result_stopped:{}-{}".format(user_str, task_id)
 
     def pub_text(self, text: str):
-        content = {
-            'event': 'message',
-            'data': {
-                'task_id': self._task_id,
-                'message_id': str(self._message.id),
-                'text': text,
-                'mode': self._conversation.mode,
-                'conversation_id': str(self._conversation.id)
-            }
-        }
+        self._pending_texts.append(text)
 
-        redis_client.publish(self._channel, json.dumps(content))
+        if len(self._pending_texts) >= self._flush_tokens \
+                or time.perf_counter() - self._last_flushed_at >= self._flush_interval:
+            self.flush()
 
-        if self._is_stopped():
-            self.pub_end()
-            raise ConversationTaskStoppedException()
+        self._check_stopped()
 
     def pub_message_replace(self, text: str):
         content = {
@@ -376,11 +390,8 @@ class PubHandler:
             }
         }
 
-        redis_client.publish(self._channel, json.dumps(content))
-
-        if self._is_stopped():
-            self.pub_end()
-            raise ConversationTaskStoppedException()
+        self.flush(content)
+        self._check_stopped()
 
     def pub_chain(self, message_chain: MessageChain):
         if self._chain_pub:
@@ -398,11 +409,9 @@ class PubHandler:
                 }
             }
 
-            redis_client.publish(self._channel, json.dumps(content))
+            self.flush(content)
 
-        if self._is_stopped():
-            self.pub_end()
-            raise ConversationTaskStoppedException()
+        self._check_stopped()
 
     def pub_agent_thought(self, message_agent_thought: MessageAgentThought):
         if self._agent_thought_pub:
@@ -422,11 +431,9 @@ class PubHandler:
                 }
             }
 
-            redis_client.publish(self._channel, json.dumps(content))
+            self.flush(content)
 
-        if self._is_stopped():
-            self.pub_end()
-            raise ConversationTaskStoppedException()
+        self._check_stopped()
 
     def pub_message_end(self, retriever_resource: List):
         content = {
@@ -440,18 +447,40 @@ class PubHandler:
         }
         if retriever_resource:
             content['data']['retriever_resources'] = retriever_resource
-        redis_client.publish(self._channel, json.dumps(content))
 
-        if self._is_stopped():
-            self.pub_end()
-            raise ConversationTaskStoppedException()
+        self.flush(content)
+        self._check_stopped()
 
     def pub_end(self):
         content = {
             'event': 'end',
         }
 
-        redis_client.publish(self._channel, json.dumps(content))
+        self.flush(content)
+
+    def flush(self, *contents: dict):
+        """
+        Publish the buffered text, followed by the given events, in a single round trip.
+        """
+        events = []
+        if self._pending_texts:
+            events.append({
+                'event': 'message',
+                'data': {
+                    'task_id': self._task_id,
+                    'message_id': str(self._message.id),
+                    'text': ''.join(self._pending_texts),
+                    'mode': self._conversation.mode,
+                    'conversation_id': str(self._conversation.id)
+                }
+            })
+            self._pending_texts = []
+
+        events.extend(contents)
+        if events:
+            self.publish(self._channel, *events)
+
+        self._last_flushed_at = time.perf_counter()
 
     @classmethod
     def pub_error(cls, user: Union[Account | EndUser], task_id: str, e):
@@ -461,10 +490,41 @@ class PubHandler:
         }
 
         channel = cls.generate_channel_name(user, task_id)
-        redis_client.publish(channel, json.dumps(content))
+        cls.publish(channel, content)
+
+    @classmethod
+    def publish(cls, channel: str, *contents: dict):
+        """
+        Append events to the generate result stream.
+
+        Events are kept in a capped redis stream that expires shortly after the last write,
+        so a reader subscribing late or reconnecting can replay them from any offset.
+        """
+        maxlen = int(current_app.config.get('COMPLETION_STREAM_MAXLEN'))
+
+        pipeline = redis_client.pipeline(transaction=False)
+        for content in contents:
+            pipeline.xadd(channel, {'data': json.dumps(content)}, maxlen=maxlen, approximate=True)
+
+        pipeline.expire(channel, int(current_app.config.get('COMPLETION_STREAM_TTL')))
+        pipeline.execute()
+
+    def _check_stopped(self):
+        if self._is_stopped():
+            self.pub_end()
+            raise ConversationTaskStoppedException()
 
     def _is_stopped(self):
-        return redis_client.get(self._stopped_cache_key) is not None
+        if self._stopped:
+            return True
+
+        now = time.perf_counter()
+        if self._last_stop_checked_at is not None and now - self._last_stop_checked_at < self._stop_check_interval:
+            return False
+
+        self._last_stop_checked_at = now
+        self._stopped = redis_client.get(self._stopped_cache_key) is not None
+        return self._stopped
 
     @classmethod
     def ping(cls, user: Union[Account | EndUser], task_id: str):
@@ -473,7 +533,7 @@ class PubHandler:
         }
 
         channel = cls.generate_channel_name(user, task_id)
-        redis_client.publish(channel, json.dumps(content))
+        cls.publish(channel, content)
 
     @classmethod
     def stop(cls, user: Union[Account | EndUser], task_id: str):
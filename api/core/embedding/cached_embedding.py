@@ -1,10 +1,13 @@
 import logging
-from typing import List
+from typing import List, Optional, Dict
 
 import numpy as np
+from flask import current_app
 from langchain.embeddings.base import Embeddings
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
+from core.embedding.embedding_cache import embedding_cache
 from core.model_providers.models.embedding.base import BaseEmbedding
 from extensions.ext_database import db
 from libs import helper
@@ -12,59 +15,100 @@ from models.dataset import Embedding
 
 
 class CacheEmbedding(Embeddings):
-    def __init__(self, embeddings: BaseEmbedding):
+    def __init__(self, embeddings: BaseEmbedding, batch_size: Optional[int] = None):
         self._embeddings = embeddings
+        self._batch_size = batch_size
+
+    @property
+    def model_name(self) -> str:
+        return self._embeddings.name
+
+    @property
+    def batch_size(self) -> int:
+        if self._batch_size:
+            return self._batch_size
+
+        return int(current_app.config.get('EMBEDDING_CACHE_BATCH_SIZE', 500))
+
+    @property
+    def storage_format(self) -> str:
+        return current_app.config.get('EMBEDDING_STORAGE_FORMAT', 'float32')
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed search docs."""
         # use doc embedding cache or store if not exists
-        text_embeddings = []
-        embedding_queue_texts = []
-        for text in texts:
-            hash = helper.generate_text_hash(text)
-            embedding = db.session.query(Embedding).filter_by(model_name=self._embeddings.name, hash=hash).first()
-            if embedding:
-                text_embeddings.append(embedding.get_embedding())
-            else:
-                embedding_queue_texts.append(text)
-
-        if embedding_queue_texts:
+        text_hashes = [helper.generate_text_hash(text) for text in texts]
+        cached_embeddings = self._get_cached_embeddings(list(dict.fromkeys(text_hashes)))
+
+        # texts with the same hash only need to be embedded once
+        embedding_queue = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in cached_embeddings and text_hash not in embedding_queue:
+                embedding_queue[text_hash] = text
+
+        if embedding_queue:
             try:
-                embedding_results = self._embeddings.client.embed_documents(embedding_queue_texts)
+                embedding_results = self._embeddings.client.embed_documents(list(embedding_queue.values()))
             except Exception as ex:
                 raise self._embeddings.handle_exceptions(ex)
-            i = 0
-            normalized_embedding_results = []
-            for text in embedding_queue_texts:
-                hash = helper.generate_text_hash(text)
-
-                try:
-                    embedding = Embedding(model_name=self._embeddings.name, hash=hash)
-                    vector = embedding_results[i]
-                    normalized_embedding = (vector / np.linalg.norm(vector)).tolist()
-                    normalized_embedding_results.append(normalized_embedding)
-                    embedding.set_embedding(normalized_embedding)
-                    db.session.add(embedding)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
-                    continue
-                except:
-                    logging.exception('Failed to add embedding to db')
-                    continue
-                finally:
-                    i += 1
-
-            text_embeddings.extend(normalized_embedding_results)
-        return text_embeddings
+
+            new_embeddings = {}
+            for text_hash, vector in zip(embedding_queue.keys(), embedding_results):
+                new_embeddings[text_hash] = (vector / np.linalg.norm(vector)).tolist()
+
+            self._save_embeddings(new_embeddings)
+            cached_embeddings.update(new_embeddings)
+
+        return [cached_embeddings[text_hash] for text_hash in text_hashes]
+
+    def _get_cached_embeddings(self, text_hashes: List[str]) -> Dict[str, List[float]]:
+        """Fetch cached embeddings keyed by text hash, one IN (...) query per batch."""
+        cached_embeddings = {}
+        for i in range(0, len(text_hashes), self.batch_size):
+            batch_hashes = text_hashes[i:i + self.batch_size]
+            embeddings = db.session.query(Embedding.hash, Embedding.embedding).filter(
+                Embedding.model_name == self._embeddings.name,
+                Embedding.hash.in_(batch_hashes)
+            ).all()
+
+            for text_hash, data in embeddings:
+                cached_embeddings[text_hash] = Embedding.decode_embedding(data).tolist()
+
+        return cached_embeddings
+
+    def _save_embeddings(self, embeddings: Dict[str, List[float]]):
+        """Bulk insert new embeddings, one multi-row INSERT per batch, ignoring rows that already exist."""
+        items = list(embeddings.items())
+        for i in range(0, len(items), self.batch_size):
+            values = [{
+                'model_name': self._embeddings.name,
+                'hash': text_hash,
+                'embedding': Embedding.encode_embedding(vector, self.storage_format)
+            } for text_hash, vector in items[i:i + self.batch_size]]
+
+            try:
+                stmt = insert(Embedding).values(values).on_conflict_do_nothing(
+                    index_elements=['model_name', 'hash']
+                )
+                db.session.execute(stmt)
+                db.session.commit()
+            except:
+                db.session.rollback()
+                logging.exception('Failed to add embeddings to db')
 
     def embed_query(self, text: str) -> List[float]:
         """Embed query text."""
         # use doc embedding cache or store if not exists
         hash = helper.generate_text_hash(text)
+        embedding_results = embedding_cache.get(self._embeddings.name, hash)
+        if embedding_results is not None:
+            return embedding_results
+
         embedding = db.session.query(Embedding).filter_by(model_name=self._embeddings.name, hash=hash).first()
         if embedding:
-            return embedding.get_embedding()
+            embedding_results = embedding.get_embedding()
+            embedding_cache.set(self._embeddings.name, hash, embedding_results)
+            return embedding_results
 
         try:
             embedding_results = self._embeddings.client.embed_query(text)
@@ -74,7 +118,7 @@ class CacheEmbedding(Embeddings):
 
         try:
             embedding = Embedding(model_name=self._embeddings.name, hash=hash)
-            embedding.set_embedding(embedding_results)
+            embedding.set_embedding(embedding_results, self.storage_format)
             db.session.add(embedding)
             db.session.commit()
         except IntegrityError:
@@ -82,5 +126,7 @@ class CacheEmbedding(Embeddings):
         except:
             logging.exception('Failed to add embedding to db')
 
+        embedding_cache.set(self._embeddings.name, hash, embedding_results)
+
         return embedding_results
 
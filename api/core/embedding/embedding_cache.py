@@ -0,0 +1,110 @@
+import logging
+import threading
+from typing import Optional, List
+
+import numpy as np
+from cachetools import TTLCache
+from flask import current_app
+
+from extensions.ext_redis import redis_client
+
+
+class EmbeddingCache:
+    """
+    Two-tier query embedding cache that sits in front of the embeddings table.
+
+    The first tier is a bounded in-process LRU with TTL, the second (optional) tier
+    is Redis, which stores vectors as packed little-endian float32 bytes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local_cache = None
+        self._stats = {
+            'local_hits': 0,
+            'redis_hits': 0,
+            'misses': 0
+        }
+
+    def get(self, model_name: str, text_hash: str) -> Optional[List[float]]:
+        cache_key = self._get_cache_key(model_name, text_hash)
+        local_cache = self._get_local_cache()
+
+        with self._lock:
+            embedding = local_cache.get(cache_key)
+
+        if embedding is not None:
+            self._incr('local_hits')
+            return list(embedding)
+
+        if current_app.config.get('EMBEDDING_REDIS_CACHE_ENABLED'):
+            try:
+                data = redis_client.get(cache_key)
+            except Exception:
+                logging.exception('Failed to get embedding from redis cache')
+                data = None
+
+            if data:
+                embedding = np.frombuffer(data, dtype='<f4').tolist()
+                with self._lock:
+                    local_cache[cache_key] = embedding
+
+                self._incr('redis_hits')
+                return list(embedding)
+
+        self._incr('misses')
+        return None
+
+    def set(self, model_name: str, text_hash: str, embedding: List[float]):
+        cache_key = self._get_cache_key(model_name, text_hash)
+        local_cache = self._get_local_cache()
+
+        with self._lock:
+            local_cache[cache_key] = list(embedding)
+
+        if current_app.config.get('EMBEDDING_REDIS_CACHE_ENABLED'):
+            try:
+                redis_client.setex(
+                    cache_key,
+                    int(current_app.config.get('EMBEDDING_REDIS_CACHE_TTL')),
+                    np.asarray(embedding, dtype='<f4').tobytes()
+                )
+            except Exception:
+                logging.exception('Failed to set embedding to redis cache')
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['local_size'] = len(self._local_cache) if self._local_cache is not None else 0
+
+        return stats
+
+    def clear(self):
+        with self._lock:
+            if self._local_cache is not None:
+                self._local_cache.clear()
+
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def _get_local_cache(self) -> TTLCache:
+        if self._local_cache is None:
+            with self._lock:
+                if self._local_cache is None:
+                    self._local_cache = TTLCache(
+                        maxsize=int(current_app.config.get('EMBEDDING_QUERY_CACHE_SIZE')),
+                        ttl=int(current_app.config.get('EMBEDDING_QUERY_CACHE_TTL'))
+                    )
+
+        return self._local_cache
+
+    def _incr(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _get_cache_key(model_name: str, text_hash: str) -> str:
+        return 'embedding_cache:{}:{}'.format(model_name, text_hash)
+
+
+embedding_cache = EmbeddingCache()
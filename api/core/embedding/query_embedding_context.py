@@ -0,0 +1,32 @@
+import threading
+from concurrent.futures import Future
+from typing import Dict, Tuple, List
+
+from core.embedding.cached_embedding import CacheEmbedding
+
+
+class QueryEmbeddingContext:
+    """
+    Query vectors of a single request, so a query searched in several datasets is embedded once
+    per embedding model, even when the datasets are searched from several threads at the same time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vectors: Dict[Tuple[str, str], Future] = {}
+
+    def embed_query(self, embeddings: CacheEmbedding, query: str) -> List[float]:
+        key = (embeddings.model_name, query)
+        with self._lock:
+            vector = self._vectors.get(key)
+            embed = vector is None
+            if embed:
+                vector = self._vectors[key] = Future()
+
+        if embed:
+            try:
+                vector.set_result(embeddings.embed_query(query))
+            except Exception as ex:
+                vector.set_exception(ex)
+
+        return vector.result()
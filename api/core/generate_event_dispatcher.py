@@ -0,0 +1,154 @@
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Tuple, List, Dict
+
+from extensions.ext_redis import redis_client
+
+
+class GenerateEventSubscription:
+    """
+    Events of one generate task stream for one reader, filled by the dispatcher.
+    """
+
+    def __init__(self, channel: str, last_event_id: str):
+        self.channel = channel
+        self.last_event_id = last_event_id
+        self._queue = queue.Queue()
+
+    def get(self, timeout: float) -> Tuple[str, dict]:
+        """
+        Wait for the next (event_id, event), raises queue.Empty after timeout seconds.
+        """
+        return self._queue.get(timeout=timeout)
+
+    def put(self, event_id: str, event: dict):
+        self._queue.put((event_id, event))
+
+
+class GenerateEventDispatcher:
+    """
+    Reads the redis streams of all the generate tasks followed by this process with a single blocking XREAD,
+    and dispatches their events to in-process subscriptions.
+
+    Without it every open SSE response holds its own redis connection blocked on its own stream for the whole
+    generation. With it an open response only waits on a local queue, so a process can follow thousands of
+    streams with one connection. New subscriptions interrupt the pending XREAD through a private wakeup stream,
+    so they are picked up without waiting for the read to time out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[str, set] = defaultdict(set)
+        self._has_subscriptions = threading.Event()
+        self._thread = None
+        self._block = None
+        self._wakeup_key = 'generate_event_dispatcher_wakeup:{}'.format(uuid.uuid4().hex)
+
+    def subscribe(self, channel: str, last_event_id: str, block: int) -> GenerateEventSubscription:
+        """
+        Follow the events of a stream published after last_event_id.
+
+        :param channel: the stream key
+        :param last_event_id: id of the last event already received, '0' for all the events
+        :param block: max milliseconds a read blocks on redis when all the streams are idle
+        """
+        subscription = GenerateEventSubscription(channel, last_event_id)
+
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+            self._has_subscriptions.set()
+
+            if self._thread is None or not self._thread.is_alive():
+                # also restarts the reader in a forked worker, where the thread of the parent does not exist
+                self._block = block
+                self._thread = threading.Thread(target=self._run, name='generate-event-dispatcher', daemon=True)
+                self._thread.start()
+
+        self._wakeup()
+        return subscription
+
+    def unsubscribe(self, subscription: GenerateEventSubscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is None:
+                return
+
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.channel]
+
+    def _wakeup(self):
+        try:
+            pipeline = redis_client.pipeline()
+            pipeline.xadd(self._wakeup_key, {'data': b'1'}, maxlen=1, approximate=False)
+            pipeline.expire(self._wakeup_key, 60)
+            pipeline.execute()
+        except Exception:
+            logging.exception('Failed to wake up generate event dispatcher')
+
+    def _run(self):
+        wakeup_last_id = '0'
+
+        while True:
+            with self._lock:
+                streams = self._get_streams()
+                if not streams:
+                    self._has_subscriptions.clear()
+
+            if not streams:
+                self._has_subscriptions.wait()
+                continue
+
+            streams[self._wakeup_key] = wakeup_last_id
+
+            try:
+                response = redis_client.xread(streams, count=100, block=self._block)
+            except Exception:
+                logging.exception('Failed to read generate events from redis')
+                time.sleep(1)
+                continue
+
+            for stream, events in response or []:
+                stream = stream.decode('utf-8')
+                if stream == self._wakeup_key:
+                    wakeup_last_id = events[-1][0].decode('utf-8')
+                    continue
+
+                self._dispatch(stream, events)
+
+    def _get_streams(self) -> Dict[str, str]:
+        """
+        The streams to read with the oldest last event id of their subscriptions.
+        """
+        return {
+            channel: min((subscription.last_event_id for subscription in subscriptions), key=self._parse_event_id)
+            for channel, subscriptions in self._subscriptions.items()
+        }
+
+    def _dispatch(self, channel: str, events: List[Tuple[bytes, dict]]):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, []))
+
+        for event_id, fields in events:
+            event_id = event_id.decode('utf-8')
+            parsed_event_id = self._parse_event_id(event_id)
+            event = json.loads(fields[b'data'].decode('utf-8'))
+
+            for subscription in subscriptions:
+                # a subscription that resumed later than others on the same stream skips what it already has
+                if parsed_event_id > self._parse_event_id(subscription.last_event_id):
+                    subscription.last_event_id = event_id
+                    subscription.put(event_id, event)
+
+    @staticmethod
+    def _parse_event_id(event_id: str) -> Tuple[int, int]:
+        milliseconds, _, sequence = event_id.partition('-')
+        return int(milliseconds), int(sequence or 0)
+
+
+generate_event_dispatcher = GenerateEventDispatcher()
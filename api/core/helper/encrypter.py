@@ -1,4 +1,5 @@
 import base64
+from typing import Optional
 
 from extensions.ext_database import db
 from libs import rsa
@@ -18,3 +19,17 @@ def encrypt_token(tenant_id: str, token: str):
 
 def decrypt_token(tenant_id: str, token: str):
     return rsa.decrypt(base64.b64decode(token), tenant_id)
+
+
+def batch_decrypt_token(tenant_id: str, tokens: list[Optional[str]]) -> list[Optional[str]]:
+    """
+    Decrypt several tokens of a tenant in one call, empty tokens are returned as is.
+    """
+    indexes = [i for i, token in enumerate(tokens) if token]
+    decrypted_tokens = rsa.decrypt_batch([base64.b64decode(tokens[i]) for i in indexes], tenant_id)
+
+    results = list(tokens)
+    for i, decrypted_token in zip(indexes, decrypted_tokens):
+        results[i] = decrypted_token
+
+    return results
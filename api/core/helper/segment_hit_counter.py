@@ -0,0 +1,111 @@
+import logging
+import uuid
+from collections import Counter
+from typing import List, Dict, Tuple
+
+from flask import current_app
+from redis.exceptions import ResponseError
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from tasks.flush_segment_hit_counts_task import flush_segment_hit_counts_task
+
+
+class SegmentHitCounter:
+    """
+    Buffers the hit counts of retrieved document segments in a redis hash and writes them to the database
+    in bulk, so retrieval does not run an UPDATE and a COMMIT per retrieved segment inside the request.
+
+    The first hit after a flush schedules the next one SEGMENT_HIT_COUNT_FLUSH_INTERVAL seconds later.
+    A flush renames the hash before reading it, so hits counted meanwhile go to a new hash and are never
+    lost or counted twice.
+    """
+
+    hit_counts_key = 'segment_hit_counts'
+    flush_scheduled_key = 'segment_hit_counts_flush_scheduled'
+    flushing_key_ttl = 86400
+    batch_size = 1000
+
+    def add(self, dataset_id: str, index_node_ids: List[str]):
+        if not index_node_ids:
+            return
+
+        interval = int(current_app.config.get('SEGMENT_HIT_COUNT_FLUSH_INTERVAL'))
+
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for index_node_id, hits in Counter(index_node_ids).items():
+                pipeline.hincrby(self.hit_counts_key, '{}:{}'.format(dataset_id, index_node_id), hits)
+
+            # expires on its own in case the scheduled flush is lost, so a later hit schedules a new one
+            pipeline.set(self.flush_scheduled_key, 1, nx=True, ex=interval * 2)
+            if pipeline.execute()[-1]:
+                flush_segment_hit_counts_task.apply_async(countdown=interval)
+        except Exception:
+            # best effort, the scheduled flag expires so a later hit schedules the flush again
+            logging.exception('Failed to count segment hits')
+
+    def flush(self):
+        redis_client.delete(self.flush_scheduled_key)
+
+        flushing_key = '{}:flushing:{}'.format(self.hit_counts_key, uuid.uuid4().hex)
+        try:
+            redis_client.rename(self.hit_counts_key, flushing_key)
+        except ResponseError:
+            # no hits since the last flush
+            return
+
+        hit_counts = None
+        try:
+            # left for inspection if the worker dies mid flush, but not forever
+            redis_client.expire(flushing_key, self.flushing_key_ttl)
+            hit_counts = {
+                field.decode('utf-8'): int(hits) for field, hits in redis_client.hgetall(flushing_key).items()
+            }
+
+            self._update_hit_counts(hit_counts)
+        except Exception:
+            db.session.rollback()
+            if hit_counts is None:
+                logging.exception('Failed to read segment hit counts, they are kept in %s until it expires',
+                                  flushing_key)
+                return
+
+            logging.exception('Failed to flush segment hit counts, they are kept for the next flush')
+            pipeline = redis_client.pipeline(transaction=False)
+            for field, hits in hit_counts.items():
+                pipeline.hincrby(self.hit_counts_key, field, hits)
+            pipeline.execute()
+
+        redis_client.delete(flushing_key)
+
+    def _update_hit_counts(self, hit_counts: Dict[str, int]):
+        """Add hits to the segments with one UPDATE ... FROM (VALUES ...) per batch."""
+        items = [(self._parse_field(field), hits) for field, hits in hit_counts.items()]
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+
+            params = {}
+            values = []
+            for j, ((dataset_id, index_node_id), hits) in enumerate(batch):
+                params[f'dataset_id_{j}'] = dataset_id
+                params[f'index_node_id_{j}'] = index_node_id
+                params[f'hits_{j}'] = hits
+                values.append(f'(CAST(:dataset_id_{j} AS uuid), :index_node_id_{j}, CAST(:hits_{j} AS integer))')
+
+            db.session.execute(db.text(
+                'UPDATE document_segments SET hit_count = document_segments.hit_count + v.hits '
+                f'FROM (VALUES {", ".join(values)}) AS v(dataset_id, index_node_id, hits) '
+                'WHERE document_segments.dataset_id = v.dataset_id '
+                'AND document_segments.index_node_id = v.index_node_id'
+            ), params)
+
+        db.session.commit()
+
+    @staticmethod
+    def _parse_field(field: str) -> Tuple[str, str]:
+        dataset_id, _, index_node_id = field.partition(':')
+        return dataset_id, index_node_id
+
+
+segment_hit_counter = SegmentHitCounter()
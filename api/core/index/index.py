@@ -39,7 +39,9 @@ class IndexBuilder:
             return KeywordTableIndex(
                 dataset=dataset,
                 config=KeywordTableConfig(
-                    max_keywords_per_chunk=10
+                    max_keywords_per_chunk=10,
+                    scoring_mode=current_app.config.get('KEYWORD_INDEX_SCORING_MODE', 'bm25'),
+                    extract_max_workers=current_app.config.get('KEYWORD_EXTRACT_MAX_WORKERS', 1)
                 )
             )
         else:
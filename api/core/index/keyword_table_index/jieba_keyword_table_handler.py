@@ -1,5 +1,10 @@
+import logging
+import multiprocessing
 import re
-from typing import Set
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Set, Dict, Iterable, List, Optional
 
 import jieba
 from jieba.analyse import default_tfidf
@@ -8,20 +13,82 @@ from core.index.keyword_table_index.stopwords import STOPWORDS
 
 
 class JiebaKeywordTableHandler:
+    # below this number of texts, the cost of starting worker processes outweighs parallel extraction
+    PARALLEL_EXTRACT_MIN_TEXTS = 64
+    _serial_extract_warned = False
 
     def __init__(self):
         default_tfidf.stop_words = STOPWORDS
 
     def extract_keywords(self, text: str, max_keywords_per_chunk: int = 10) -> Set[str]:
         """Extract keywords with JIEBA tfidf."""
-        keywords = jieba.analyse.extract_tags(
-            sentence=text,
-            topK=max_keywords_per_chunk,
-        )
+        return set(self.extract_keywords_with_term_frequencies(text, max_keywords_per_chunk))
 
-        return set(self._expand_tokens_with_subtokens(keywords))
+    def extract_keywords_with_term_frequencies(self, text: str, max_keywords_per_chunk: int = 10) -> Dict[str, int]:
+        """
+        Extract keywords with JIEBA tfidf along with their term frequencies in text, tokenizing text once.
+        Same ranking as jieba.analyse.extract_tags, which does not expose the counts it computes.
+        """
+        tokens = list(jieba.cut(text))
 
-    def _expand_tokens_with_subtokens(self, tokens: Set[str]) -> Set[str]:
+        freq = {}
+        for token in tokens:
+            if len(token.strip()) < 2 or token.lower() in default_tfidf.stop_words:
+                continue
+            freq[token] = freq.get(token, 0.0) + 1.0
+
+        weights = {token: count * default_tfidf.idf_freq.get(token, default_tfidf.median_idf)
+                   for token, count in freq.items()}
+        keywords = sorted(weights, key=weights.__getitem__, reverse=True)[:max_keywords_per_chunk]
+
+        return self._count_keywords(tokens, self._expand_tokens_with_subtokens(keywords))
+
+    def batch_extract_keywords_with_term_frequencies(self, texts: List[str], max_keywords_per_chunk: int = 10,
+                                                     max_workers: Optional[int] = None) -> List[Dict[str, int]]:
+        """Extract keywords of many texts, fanned out across a process pool since jieba is CPU-bound."""
+        if not max_workers or max_workers <= 1 or len(texts) < self.PARALLEL_EXTRACT_MIN_TEXTS \
+                or not self._can_start_workers():
+            return [self.extract_keywords_with_term_frequencies(text, max_keywords_per_chunk) for text in texts]
+
+        # spawned workers, forking is not safe under gevent monkey patching (the default celery pool)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_initialize_worker) as executor:
+            return list(executor.map(
+                _extract_keywords_with_term_frequencies,
+                texts,
+                repeat(max_keywords_per_chunk),
+                chunksize=max(1, len(texts) // (max_workers * 4))
+            ))
+
+    @classmethod
+    def _can_start_workers(cls) -> bool:
+        """Daemonic processes (prefork celery workers) are not allowed to have children."""
+        if multiprocessing.current_process().daemon:
+            if not cls._serial_extract_warned:
+                cls._serial_extract_warned = True
+                logging.warning('Parallel keyword extraction is not available in daemonic processes, '
+                                'fallback to serial extraction.')
+            return False
+
+        return True
+
+    def get_term_frequencies(self, text: str, keywords: Iterable[str]) -> Dict[str, int]:
+        """Count the tokens of text matching each of the given keywords, at least 1 for each."""
+        return self._count_keywords(jieba.cut(text), keywords)
+
+    @staticmethod
+    def _count_keywords(tokens: Iterable[str], keywords: Iterable[str]) -> Dict[str, int]:
+        token_counts = Counter()
+        for token in tokens:
+            token_counts[token] += 1
+            # keywords also include the subtokens of extracted tokens, see _expand_tokens_with_subtokens
+            sub_tokens = re.findall(r"\w+", token)
+            if len(sub_tokens) > 1:
+                token_counts.update(sub_tokens)
+
+        return {keyword: max(token_counts[keyword], 1) for keyword in set(keywords)}
+
+    def _expand_tokens_with_subtokens(self, tokens: Iterable[str]) -> Set[str]:
         """Get subtokens from a list of tokens., filtering for stopwords."""
         results = set()
         for token in tokens:
@@ -30,4 +97,13 @@ class JiebaKeywordTableHandler:
             if len(sub_tokens) > 1:
                 results.update({w for w in sub_tokens if w not in list(STOPWORDS)})
 
-        return results
\ No newline at end of file
+        return results
+
+
+def _extract_keywords_with_term_frequencies(text: str, max_keywords_per_chunk: int) -> Dict[str, int]:
+    return JiebaKeywordTableHandler().extract_keywords_with_term_frequencies(text, max_keywords_per_chunk)
+
+
+def _initialize_worker():
+    # load the dictionary once per worker, not on its first text
+    jieba.initialize()
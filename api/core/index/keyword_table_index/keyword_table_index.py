@@ -1,18 +1,38 @@
 import json
+import threading
 from collections import defaultdict
-from typing import Any, List, Optional, Dict
+from typing import Any, List, Dict, Optional, Tuple
 
+import numpy as np
+from cachetools import TTLCache
 from langchain.schema import Document, BaseRetriever
 from pydantic import BaseModel, Field, Extra
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 
 from core.index.base import BaseIndex
 from core.index.keyword_table_index.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from extensions.ext_database import db
-from models.dataset import Dataset, DocumentSegment, DatasetKeywordTable
+from models.dataset import Dataset, DocumentSegment, DatasetKeywordPosting, DatasetKeywordTable
 
 
 class KeywordTableConfig(BaseModel):
     max_keywords_per_chunk: int = 10
+    postings_batch_size: int = 1000
+    # max worker processes used to extract keywords of large batches of texts, 1 to extract serially
+    extract_max_workers: int = 1
+    # bm25 or keyword_count (rank by the number of matched keywords)
+    scoring_mode: str = 'bm25'
+    bm25_k1: float = 1.5
+    bm25_b: float = 0.75
+
+
+# datasets whose legacy keyword table blob has already been moved into postings in this process
+_migrated_dataset_ids = set()
+
+# dataset id -> (indexed segment count, average segment length) used by bm25 scoring
+_dataset_statistics_cache = TTLCache(maxsize=1000, ttl=60)
+_dataset_statistics_lock = threading.Lock()
 
 
 class KeywordTableIndex(BaseIndex):
@@ -21,91 +41,44 @@ class KeywordTableIndex(BaseIndex):
         self._config = config
 
     def create(self, texts: list[Document], **kwargs) -> BaseIndex:
-        keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = {}
-        for text in texts:
-            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
-            self._update_segment_keywords(self.dataset.id, text.metadata['doc_id'], list(keywords))
-            keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata['doc_id'], list(keywords))
-
-        dataset_keyword_table = DatasetKeywordTable(
-            dataset_id=self.dataset.id,
-            keyword_table=json.dumps({
-                '__type__': 'keyword_table',
-                '__data__': {
-                    "index_id": self.dataset.id,
-                    "summary": None,
-                    "table": {}
-                }
-            }, cls=SetEncoder)
-        )
-        db.session.add(dataset_keyword_table)
-        db.session.commit()
-
-        self._save_dataset_keyword_table(keyword_table)
+        self._migrate_legacy_keyword_table()
+        self._index_texts(texts)
 
         return self
 
     def create_with_collection_name(self, texts: list[Document], collection_name: str, **kwargs) -> BaseIndex:
-        keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = {}
-        for text in texts:
-            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
-            self._update_segment_keywords(self.dataset.id, text.metadata['doc_id'], list(keywords))
-            keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata['doc_id'], list(keywords))
-
-        dataset_keyword_table = DatasetKeywordTable(
-            dataset_id=self.dataset.id,
-            keyword_table=json.dumps({
-                '__type__': 'keyword_table',
-                '__data__': {
-                    "index_id": self.dataset.id,
-                    "summary": None,
-                    "table": {}
-                }
-            }, cls=SetEncoder)
-        )
-        db.session.add(dataset_keyword_table)
-        db.session.commit()
-
-        self._save_dataset_keyword_table(keyword_table)
-
-        return self
+        return self.create(texts, **kwargs)
 
     def add_texts(self, texts: list[Document], **kwargs):
-        keyword_table_handler = JiebaKeywordTableHandler()
+        self._migrate_legacy_keyword_table()
+        self._index_texts(texts)
 
-        keyword_table = self._get_dataset_keyword_table()
-        for text in texts:
-            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
-            self._update_segment_keywords(self.dataset.id, text.metadata['doc_id'], list(keywords))
-            keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata['doc_id'], list(keywords))
+    def text_exists(self, id: str) -> bool:
+        self._migrate_legacy_keyword_table()
 
-        self._save_dataset_keyword_table(keyword_table)
+        posting = db.session.query(DatasetKeywordPosting.id).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id,
+            DatasetKeywordPosting.index_node_id == id
+        ).first()
 
-    def text_exists(self, id: str) -> bool:
-        keyword_table = self._get_dataset_keyword_table()
-        return id in set.union(*keyword_table.values())
+        return posting is not None
 
     def delete_by_ids(self, ids: list[str]) -> None:
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
-
-        self._save_dataset_keyword_table(keyword_table)
+        self._migrate_legacy_keyword_table()
+        self._delete_postings(ids)
 
     def delete_by_document_id(self, document_id: str):
+        self._migrate_legacy_keyword_table()
+
         # get segment ids by document_id
-        segments = db.session.query(DocumentSegment).filter(
+        segments = db.session.query(DocumentSegment.index_node_id).filter(
             DocumentSegment.dataset_id == self.dataset.id,
             DocumentSegment.document_id == document_id
         ).all()
 
         ids = [segment.index_node_id for segment in segments]
 
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
-
-        self._save_dataset_keyword_table(keyword_table)
+        self._delete_postings(ids)
 
     def get_retriever(self, **kwargs: Any) -> BaseRetriever:
         return KeywordTableRetriever(index=self, **kwargs)
@@ -114,20 +87,35 @@ class KeywordTableIndex(BaseIndex):
             self, query: str,
             **kwargs: Any
     ) -> List[Document]:
-        keyword_table = self._get_dataset_keyword_table()
+        self._migrate_legacy_keyword_table()
 
         search_kwargs = kwargs.get('search_kwargs') if kwargs.get('search_kwargs') else {}
         k = search_kwargs.get('k') if search_kwargs.get('k') else 4
 
-        sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table, query, k)
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords = keyword_table_handler.extract_keywords(query)
+
+        # only load the postings of the query keywords
+        postings = self._get_keyword_postings(list(keywords))
+
+        if self._config.scoring_mode == 'bm25':
+            sorted_chunk_indices = self._retrieve_ids_by_bm25(postings, k)
+        else:
+            keyword_table = defaultdict(set)
+            for keyword, node_id, _, _ in postings:
+                keyword_table[keyword].add(node_id)
+
+            sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table, list(keywords), k)
+
+        segments = db.session.query(DocumentSegment).filter(
+            DocumentSegment.dataset_id == self.dataset.id,
+            DocumentSegment.index_node_id.in_(sorted_chunk_indices)
+        ).all() if sorted_chunk_indices else []
+        segment_map = {segment.index_node_id: segment for segment in segments}
 
         documents = []
         for chunk_index in sorted_chunk_indices:
-            segment = db.session.query(DocumentSegment).filter(
-                DocumentSegment.dataset_id == self.dataset.id,
-                DocumentSegment.index_node_id == chunk_index
-            ).first()
-
+            segment = segment_map.get(chunk_index)
             if segment:
                 documents.append(Document(
                     page_content=segment.content,
@@ -141,84 +129,200 @@ class KeywordTableIndex(BaseIndex):
         return documents
 
     def delete(self) -> None:
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        if dataset_keyword_table:
-            db.session.delete(dataset_keyword_table)
-            db.session.commit()
+        db.session.query(DatasetKeywordPosting).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id
+        ).delete()
+
+        # a bulk delete does not fail if a concurrent migration already dropped the legacy blob
+        db.session.query(DatasetKeywordTable).filter(
+            DatasetKeywordTable.dataset_id == self.dataset.id
+        ).delete(synchronize_session=False)
+
+        db.session.commit()
 
     def delete_by_group_id(self, group_id: str) -> None:
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        if dataset_keyword_table:
-            db.session.delete(dataset_keyword_table)
-            db.session.commit()
+        self.delete()
+
+    def _index_texts(self, texts: list[Document]):
+        keyword_table_handler = JiebaKeywordTableHandler()
+        term_frequencies_list = keyword_table_handler.batch_extract_keywords_with_term_frequencies(
+            [text.page_content for text in texts],
+            self._config.max_keywords_per_chunk,
+            self._config.extract_max_workers
+        )
+
+        segment_keywords = {}
+        node_keywords = {}
+        for text, term_frequencies in zip(texts, term_frequencies_list):
+            segment_keywords[text.metadata['doc_id']] = list(term_frequencies)
+            node_keywords[text.metadata['doc_id']] = term_frequencies
+
+        self._update_segments_keywords(segment_keywords)
+        self._add_postings(node_keywords)
+
+    def _update_segments_keywords(self, segment_keywords: Dict[str, List[str]]):
+        """Write keywords of many segments with one UPDATE ... FROM (VALUES ...) per batch."""
+        items = list(segment_keywords.items())
+        for i in range(0, len(items), self._config.postings_batch_size):
+            batch = items[i:i + self._config.postings_batch_size]
+
+            params = {'dataset_id': self.dataset.id}
+            values = []
+            for j, (node_id, keywords) in enumerate(batch):
+                params[f'node_id_{j}'] = node_id
+                params[f'keywords_{j}'] = json.dumps(keywords)
+                values.append(f'(:node_id_{j}, :keywords_{j})')
+
+            db.session.execute(db.text(
+                'UPDATE document_segments SET keywords = CAST(v.keywords AS json) '
+                f'FROM (VALUES {", ".join(values)}) AS v(index_node_id, keywords) '
+                'WHERE document_segments.dataset_id = :dataset_id '
+                'AND document_segments.index_node_id = v.index_node_id'
+            ), params)
 
-    def _save_dataset_keyword_table(self, keyword_table):
-        keyword_table_dict = {
-            '__type__': 'keyword_table',
-            '__data__': {
-                "index_id": self.dataset.id,
-                "summary": None,
-                "table": keyword_table
-            }
-        }
-        self.dataset.dataset_keyword_table.keyword_table = json.dumps(keyword_table_dict, cls=SetEncoder)
         db.session.commit()
 
-    def _get_dataset_keyword_table(self) -> Optional[dict]:
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        if dataset_keyword_table:
-            if dataset_keyword_table.keyword_table_dict:
-                return dataset_keyword_table.keyword_table_dict['__data__']['table']
-        else:
-            dataset_keyword_table = DatasetKeywordTable(
-                dataset_id=self.dataset.id,
-                keyword_table=json.dumps({
-                    '__type__': 'keyword_table',
-                    '__data__': {
-                        "index_id": self.dataset.id,
-                        "summary": None,
-                        "table": {}
-                    }
-                }, cls=SetEncoder)
+    def _add_postings(self, node_keywords: Dict[str, Dict[str, int]]):
+        """
+        Incrementally insert (keyword, node) postings, ignoring the ones that already exist.
+        :param node_keywords: index node id -> {keyword: term frequency in the node}
+        """
+        self._insert_postings(node_keywords)
+        db.session.commit()
+
+    def _insert_postings(self, node_keywords: Dict[str, Dict[str, int]]):
+        values = [{
+            'dataset_id': self.dataset.id,
+            'keyword': keyword,
+            'index_node_id': node_id,
+            'term_frequency': term_frequency
+        } for node_id, keywords in node_keywords.items() for keyword, term_frequency in keywords.items()]
+
+        for i in range(0, len(values), self._config.postings_batch_size):
+            stmt = insert(DatasetKeywordPosting).values(
+                values[i:i + self._config.postings_batch_size]
+            ).on_conflict_do_nothing(index_elements=['dataset_id', 'keyword', 'index_node_id'])
+            db.session.execute(stmt)
+
+    def _delete_postings(self, ids: list[str]):
+        for i in range(0, len(ids), self._config.postings_batch_size):
+            db.session.query(DatasetKeywordPosting).filter(
+                DatasetKeywordPosting.dataset_id == self.dataset.id,
+                DatasetKeywordPosting.index_node_id.in_(ids[i:i + self._config.postings_batch_size])
+            ).delete(synchronize_session=False)
+
+        db.session.commit()
+
+    def _get_keyword_postings(self, keywords: List[str]) -> List[tuple]:
+        """Get (keyword, node id, term frequency, node length) of the postings of the given keywords."""
+        if not keywords:
+            return []
+
+        return db.session.query(
+            DatasetKeywordPosting.keyword,
+            DatasetKeywordPosting.index_node_id,
+            DatasetKeywordPosting.term_frequency,
+            DocumentSegment.word_count
+        ).outerjoin(
+            DocumentSegment,
+            db.and_(
+                DocumentSegment.dataset_id == DatasetKeywordPosting.dataset_id,
+                DocumentSegment.index_node_id == DatasetKeywordPosting.index_node_id
             )
-            db.session.add(dataset_keyword_table)
-            db.session.commit()
+        ).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id,
+            DatasetKeywordPosting.keyword.in_(keywords)
+        ).all()
 
-        return {}
+    def _get_dataset_statistics(self) -> Tuple[int, float]:
+        """Get the number of indexed segments and their average length, cached briefly per dataset."""
+        with _dataset_statistics_lock:
+            statistics = _dataset_statistics_cache.get(self.dataset.id)
 
-    def _add_text_to_keyword_table(self, keyword_table: dict, id: str, keywords: list[str]) -> dict:
-        for keyword in keywords:
-            if keyword not in keyword_table:
-                keyword_table[keyword] = set()
-            keyword_table[keyword].add(id)
-        return keyword_table
-
-    def _delete_ids_from_keyword_table(self, keyword_table: dict, ids: list[str]) -> dict:
-        # get set of ids that correspond to node
-        node_idxs_to_delete = set(ids)
-
-        # delete node_idxs from keyword to node idxs mapping
-        keywords_to_delete = set()
-        for keyword, node_idxs in keyword_table.items():
-            if node_idxs_to_delete.intersection(node_idxs):
-                keyword_table[keyword] = node_idxs.difference(
-                    node_idxs_to_delete
-                )
-                if not keyword_table[keyword]:
-                    keywords_to_delete.add(keyword)
-
-        for keyword in keywords_to_delete:
-            del keyword_table[keyword]
-
-        return keyword_table
-
-    def _retrieve_ids_by_query(self, keyword_table: dict, query: str, k: int = 4):
-        keyword_table_handler = JiebaKeywordTableHandler()
-        keywords = keyword_table_handler.extract_keywords(query)
+        if statistics is None:
+            segment_count, average_length = db.session.query(
+                func.count(DocumentSegment.id),
+                func.avg(DocumentSegment.word_count)
+            ).filter(
+                DocumentSegment.dataset_id == self.dataset.id,
+                DocumentSegment.status == 'completed',
+                DocumentSegment.enabled == True
+            ).one()
+
+            statistics = (int(segment_count or 0), float(average_length or 0))
+            with _dataset_statistics_lock:
+                _dataset_statistics_cache[self.dataset.id] = statistics
 
+        return statistics
+
+    def _retrieve_ids_by_bm25(self, postings: List[tuple], k: int = 4) -> List[str]:
+        if not postings:
+            return []
+
+        keywords, node_ids, term_frequencies, node_lengths = zip(*postings)
+
+        unique_node_ids, node_indices = np.unique(np.array(node_ids, dtype=object), return_inverse=True)
+        _, keyword_indices, document_frequencies = np.unique(
+            np.array(keywords, dtype=object), return_inverse=True, return_counts=True
+        )
+
+        segment_count, average_length = self._get_dataset_statistics()
+        segment_count = max(segment_count, int(document_frequencies.max()))
+
+        term_frequencies = np.asarray(term_frequencies, dtype=np.float64)
+        # nodes without a known length are not length normalized
+        node_lengths = np.array([length or np.nan for length in node_lengths], dtype=np.float64)
+        if not average_length:
+            average_length = float(np.nanmean(node_lengths)) if not np.isnan(node_lengths).all() else 1.0
+        node_lengths = np.where(np.isnan(node_lengths), average_length, node_lengths)
+
+        k1, b = self._config.bm25_k1, self._config.bm25_b
+        idf = np.log(1 + (segment_count - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        scores = idf[keyword_indices] * term_frequencies * (k1 + 1) / (
+            term_frequencies + k1 * (1 - b + b * node_lengths / average_length)
+        )
+
+        node_scores = np.bincount(node_indices, weights=scores)
+        top_indices = np.argsort(-node_scores, kind='stable')[:k]
+
+        return [unique_node_ids[i] for i in top_indices]
+
+    def _migrate_legacy_keyword_table(self):
+        """
+        Move the keyword table of the dataset from the legacy single JSON blob in
+        DatasetKeywordTable into per-keyword postings, the blob is dropped afterwards.
+        """
+        if self.dataset.id in _migrated_dataset_ids:
+            return
+
+        # locked until the commit, concurrent workers wait and then find the blob gone
+        dataset_keyword_table = db.session.query(DatasetKeywordTable).filter(
+            DatasetKeywordTable.dataset_id == self.dataset.id
+        ).with_for_update().first()
+
+        if dataset_keyword_table:
+            keyword_table_dict = dataset_keyword_table.keyword_table_dict
+            keyword_table = keyword_table_dict['__data__']['table'] if keyword_table_dict else {}
+
+            node_keywords = defaultdict(dict)
+            for keyword, node_idxs in keyword_table.items():
+                for node_id in node_idxs:
+                    node_keywords[node_id][keyword] = 1
+
+            self._insert_postings(node_keywords)
+
+            db.session.query(DatasetKeywordTable).filter(
+                DatasetKeywordTable.id == dataset_keyword_table.id
+            ).delete(synchronize_session=False)
+
+        db.session.commit()
+
+        _migrated_dataset_ids.add(self.dataset.id)
+
+    def _retrieve_ids_by_query(self, keyword_table: dict, keywords: List[str], k: int = 4):
         # go through text chunks in order of most matching keywords
         chunk_indices_count: Dict[str, int] = defaultdict(int)
-        keywords = [keyword for keyword in keywords if keyword in set(keyword_table.keys())]
+        keywords = [keyword for keyword in keywords if keyword in keyword_table]
         for keyword in keywords:
             for node_id in keyword_table[keyword]:
                 chunk_indices_count[node_id] += 1
@@ -231,7 +335,7 @@ class KeywordTableIndex(BaseIndex):
 
         return sorted_chunk_indices[: k]
 
-    def _update_segment_keywords(self, dataset_id: str, node_id: str, keywords: List[str]):
+    def _update_segment_keywords(self, dataset_id: str, node_id: str, keywords: List[str]) -> Optional[DocumentSegment]:
         document_segment = db.session.query(DocumentSegment).filter(
             DocumentSegment.dataset_id == dataset_id,
             DocumentSegment.index_node_id == node_id
@@ -240,32 +344,55 @@ class KeywordTableIndex(BaseIndex):
             document_segment.keywords = keywords
             db.session.commit()
 
+        return document_segment
+
     def create_segment_keywords(self, node_id: str, keywords: List[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        self._update_segment_keywords(self.dataset.id, node_id, keywords)
-        keyword_table = self._add_text_to_keyword_table(keyword_table, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._migrate_legacy_keyword_table()
+        document_segment = self._update_segment_keywords(self.dataset.id, node_id, keywords)
+        content = document_segment.content if document_segment else ''
+        self._add_postings({node_id: JiebaKeywordTableHandler().get_term_frequencies(content, keywords)})
 
     def multi_create_segment_keywords(self, pre_segment_data_list: list):
+        self._migrate_legacy_keyword_table()
+
         keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = self._get_dataset_keyword_table()
+
+        # extract keywords of the segments without given keywords in one batch
+        segments_to_extract = [pre_segment_data['segment'] for pre_segment_data in pre_segment_data_list
+                               if not pre_segment_data['keywords']]
+        extracted_term_frequencies = keyword_table_handler.batch_extract_keywords_with_term_frequencies(
+            [segment.content for segment in segments_to_extract],
+            self._config.max_keywords_per_chunk,
+            self._config.extract_max_workers
+        )
+        extracted_term_frequencies = {segment.index_node_id: term_frequencies for segment, term_frequencies
+                                      in zip(segments_to_extract, extracted_term_frequencies)}
+
+        node_keywords = {}
         for pre_segment_data in pre_segment_data_list:
             segment = pre_segment_data['segment']
             if pre_segment_data['keywords']:
-                segment.keywords = pre_segment_data['keywords']
-                keyword_table = self._add_text_to_keyword_table(keyword_table, segment.index_node_id,
-                                                                pre_segment_data['keywords'])
+                # given keywords are counted in the content, extracted ones come with their counts
+                keywords = pre_segment_data['keywords']
+                node_keywords[segment.index_node_id] = keyword_table_handler.get_term_frequencies(
+                    segment.content, keywords)
             else:
-                keywords = keyword_table_handler.extract_keywords(segment.content,
-                                                                  self._config.max_keywords_per_chunk)
-                segment.keywords = list(keywords)
-                keyword_table = self._add_text_to_keyword_table(keyword_table, segment.index_node_id, list(keywords))
-        self._save_dataset_keyword_table(keyword_table)
+                node_keywords[segment.index_node_id] = extracted_term_frequencies[segment.index_node_id]
+                keywords = list(node_keywords[segment.index_node_id])
+
+            segment.keywords = keywords
+
+        self._add_postings(node_keywords)
 
     def update_segment_keywords_index(self, node_id: str, keywords: List[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._add_text_to_keyword_table(keyword_table, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._migrate_legacy_keyword_table()
+
+        document_segment = db.session.query(DocumentSegment.content).filter(
+            DocumentSegment.dataset_id == self.dataset.id,
+            DocumentSegment.index_node_id == node_id
+        ).first()
+        content = document_segment.content if document_segment else ''
+        self._add_postings({node_id: JiebaKeywordTableHandler().get_term_frequencies(content, keywords)})
 
 
 class KeywordTableRetriever(BaseRetriever, BaseModel):
@@ -292,9 +419,3 @@ class KeywordTableRetriever(BaseRetriever, BaseModel):
     async def aget_relevant_documents(self, query: str) -> List[Document]:
         raise NotImplementedError("KeywordTableRetriever does not support async")
 
-
-class SetEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, set):
-            return list(obj)
-        return super().default(obj)
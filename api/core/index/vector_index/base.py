@@ -74,6 +74,39 @@ class BaseVectorIndex(BaseIndex):
             search_kwargs=search_kwargs
         ).get_relevant_documents(query)
 
+    def search_by_vector(
+            self, embedding: List[float],
+            **kwargs: Any
+    ) -> List[Document]:
+        """
+        Like a similarity_score_threshold search, with a query embedded by the caller,
+        so a query searched in several datasets is only embedded once.
+
+        :param embedding: the query vector, from the embeddings of the dataset
+        :param search_kwargs: k, score_threshold and filter, as for search
+        :param with_vectors: put the vector of each document in its metadata['vector'],
+                             when the vector store returns them
+        """
+        vector_store = self._get_vector_store()
+        vector_store = cast(self._get_vector_store_class(), vector_store)
+
+        search_kwargs = dict(kwargs.get('search_kwargs') or {})
+        score_threshold = search_kwargs.pop('score_threshold', None)
+        if (score_threshold is None) or (not isinstance(score_threshold, float)):
+            score_threshold = .0
+
+        docs_with_similarity = vector_store.similarity_search_with_relevance_scores_by_vector(
+            embedding, with_vectors=kwargs.get('with_vectors', False), **search_kwargs
+        )
+
+        docs = []
+        for doc, similarity in docs_with_similarity:
+            if similarity >= score_threshold:
+                doc.metadata['score'] = similarity
+                docs.append(doc)
+
+        return docs
+
     def get_retriever(self, **kwargs: Any) -> BaseRetriever:
         vector_store = self._get_vector_store()
         vector_store = cast(self._get_vector_store_class(), vector_store)
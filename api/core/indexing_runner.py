@@ -2,24 +2,30 @@ import os
 import datetime
 import json
 import logging
+import queue
 import re
 import threading
 import time
 import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, List, cast
 
 from flask import current_app, Flask
 from flask_login import current_user
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
+from sqlalchemy import func
 from sqlalchemy.orm.exc import ObjectDeletedError
 
 from core.data_loader.file_extractor import FileExtractor
 from core.data_loader.loader.notion import NotionLoader
 from core.docstore.dataset_docstore import DatesetDocumentStore
+from core.embedding.cached_embedding import CacheEmbedding
 from core.generator.llm_generator import LLMGenerator
 from core.index.index import IndexBuilder
-from core.model_providers.error import ProviderTokenNotInitError
+from core.model_providers.error import ProviderTokenNotInitError, LLMRateLimitError, LLMAPIConnectionError, \
+    LLMAPIUnavailableError
 from core.model_providers.model_factory import ModelFactory
 from core.model_providers.models.entity.message import MessageType
 from core.spiltter.fixed_text_splitter import FixedRecursiveCharacterTextSplitter
@@ -35,61 +41,79 @@ from utils.lark_download.download import LarkWiki2Md
 from utils.doc_splitter.splitter import MD2HtmlSplitter
 
 class IndexingRunner:
+    # shared by all runners of the process to bound concurrent QA formatting LLM calls
+    _qa_executor = None
+    _qa_executor_lock = threading.Lock()
 
     def __init__(self):
         self.storage = storage
 
-    def run(self, dataset_documents: List[DatasetDocument]):
-        """Run the indexing process."""
-        for dataset_document in dataset_documents:
-            try:
-                # get dataset
-                dataset = Dataset.query.filter_by(
-                    id=dataset_document.dataset_id
-                ).first()
-
-                if not dataset:
-                    raise ValueError("no dataset found")
-
-                # load file
-                text_docs = self._load_data(dataset_document)
-
-                # get the process rule
-                processing_rule = db.session.query(DatasetProcessRule). \
-                    filter(DatasetProcessRule.id == dataset_document.dataset_process_rule_id). \
-                    first()
-
-                # get splitter
-                splitter = self._get_splitter(processing_rule)
+    def run(self, dataset_documents: List[DatasetDocument], incremental: bool = False):
+        """
+        Run the indexing process.
 
-                # split to documents
-                documents = self._step_split(
-                    text_docs=text_docs,
-                    splitter=splitter,
-                    dataset=dataset,
-                    dataset_document=dataset_document,
-                    processing_rule=processing_rule
-                )
-                self._build_index(
-                    dataset=dataset,
-                    dataset_document=dataset_document,
-                    documents=documents
-                )
-            except DocumentIsPausedException:
-                raise DocumentIsPausedException('Document paused, document id: {}'.format(dataset_document.id))
-            except ProviderTokenNotInitError as e:
-                dataset_document.indexing_status = 'error'
-                dataset_document.error = str(e.description)
-                dataset_document.stopped_at = datetime.datetime.utcnow()
-                db.session.commit()
-            except ObjectDeletedError:
-                logging.warning('Document deleted, document id: {}'.format(dataset_document.id))
-            except Exception as e:
-                logging.exception("consume document failed")
-                dataset_document.indexing_status = 'error'
-                dataset_document.error = str(e)
-                dataset_document.stopped_at = datetime.datetime.utcnow()
-                db.session.commit()
+        :param dataset_documents: documents to index
+        :param incremental: keep the existing segments whose content is unchanged and only
+                            index new chunks, instead of expecting the document to be cleaned
+        """
+        # documents are loaded and split here while the chunks of the previous
+        # documents are embedded and written to the indexes by the pipeline
+        pipeline = IndexingPipeline(self, current_app._get_current_object())
+        try:
+            for dataset_document in dataset_documents:
+                try:
+                    # get dataset
+                    dataset = Dataset.query.filter_by(
+                        id=dataset_document.dataset_id
+                    ).first()
+
+                    if not dataset:
+                        raise ValueError("no dataset found")
+
+                    # load file
+                    text_docs = self._load_data(dataset_document)
+
+                    # get the process rule
+                    processing_rule = db.session.query(DatasetProcessRule). \
+                        filter(DatasetProcessRule.id == dataset_document.dataset_process_rule_id). \
+                        first()
+
+                    # get splitter
+                    splitter = self._get_splitter(processing_rule)
+
+                    # split to documents
+                    step_split = self._step_split_incremental if incremental else self._step_split
+                    documents = step_split(
+                        text_docs=text_docs,
+                        splitter=splitter,
+                        dataset=dataset,
+                        dataset_document=dataset_document,
+                        processing_rule=processing_rule
+                    )
+                    pipeline.submit(
+                        dataset=dataset,
+                        dataset_document=dataset_document,
+                        documents=documents,
+                        # the document tokens also count the kept segments, only new chunks are embedded
+                        kept_tokens=self._get_kept_segment_tokens(dataset_document, documents) if incremental else 0
+                    )
+                except DocumentIsPausedException:
+                    raise DocumentIsPausedException('Document paused, document id: {}'.format(dataset_document.id))
+                except ProviderTokenNotInitError as e:
+                    dataset_document.indexing_status = 'error'
+                    dataset_document.error = str(e.description)
+                    dataset_document.stopped_at = datetime.datetime.utcnow()
+                    db.session.commit()
+                except ObjectDeletedError:
+                    logging.warning('Document deleted, document id: {}'.format(dataset_document.id))
+                except Exception as e:
+                    logging.exception("consume document failed")
+                    dataset_document.indexing_status = 'error'
+                    dataset_document.error = str(e)
+                    dataset_document.stopped_at = datetime.datetime.utcnow()
+                    db.session.commit()
+        finally:
+            pipeline.join()
 
     def run_in_splitting_status(self, dataset_document: DatasetDocument):
         """Run the indexing process when the index_status is splitting."""
@@ -562,7 +586,8 @@ class IndexingRunner:
             processing_rule=processing_rule,
             tenant_id=dataset.tenant_id,
             document_form=dataset_document.doc_form,
-            document_language=dataset_document.doc_language
+            document_language=dataset_document.doc_language,
+            document_id=dataset_document.id
         )
 
         # save node to document segment
@@ -597,14 +622,134 @@ class IndexingRunner:
 
         return documents
 
+    def _step_split_incremental(self, text_docs: List[Document], splitter: TextSplitter,
+                                dataset: Dataset, dataset_document: DatasetDocument,
+                                processing_rule: DatasetProcessRule) -> List[Document]:
+        """
+        Split the text documents and diff the chunks against the existing document segments by content hash.
+        Unchanged segments are kept as they are, vanished ones are removed from the indexes,
+        and only the new chunks are saved and returned for indexing.
+        """
+        documents = self._split_to_documents(
+            text_docs=text_docs,
+            splitter=splitter,
+            processing_rule=processing_rule,
+            tenant_id=dataset.tenant_id,
+            document_form=dataset_document.doc_form,
+            document_language=dataset_document.doc_language,
+            document_id=dataset_document.id
+        )
+
+        existing_segments = db.session.query(DocumentSegment).filter(
+            DocumentSegment.dataset_id == dataset.id,
+            DocumentSegment.document_id == dataset_document.id
+        ).order_by(DocumentSegment.position).all()
+
+        # only completely indexed segments can be reused
+        reusable_segments = defaultdict(list)
+        for segment in existing_segments:
+            if segment.status == 'completed' and segment.index_node_hash:
+                reusable_segments[segment.index_node_hash].append(segment)
+
+        ordered_node_ids = []
+        new_documents = []
+        for document in documents:
+            segments = reusable_segments.get(document.metadata['doc_hash'])
+            if segments:
+                ordered_node_ids.append(segments.pop(0).index_node_id)
+            else:
+                new_documents.append(document)
+                ordered_node_ids.append(document.metadata['doc_id'])
+
+        kept_node_ids = set(ordered_node_ids)
+        vanished_node_ids = [segment.index_node_id for segment in existing_segments
+                             if segment.index_node_id not in kept_node_ids]
+
+        # delete vanished segments and their index nodes
+        if vanished_node_ids:
+            vector_index = IndexBuilder.get_index(dataset, 'high_quality')
+            if vector_index:
+                vector_index.delete_by_ids(vanished_node_ids)
+
+            keyword_table_index = IndexBuilder.get_index(dataset, 'economy')
+            keyword_table_index.delete_by_ids(vanished_node_ids)
+
+            db.session.query(DocumentSegment).filter(
+                DocumentSegment.dataset_id == dataset.id,
+                DocumentSegment.document_id == dataset_document.id,
+                DocumentSegment.index_node_id.in_(vanished_node_ids)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+        logging.info('Incremental indexing document: {}, kept: {}, added: {}, deleted: {}'.format(
+            dataset_document.id, len(ordered_node_ids) - len(new_documents), len(new_documents),
+            len(vanished_node_ids)))
+
+        # save new nodes to document segment
+        doc_store = DatesetDocumentStore(
+            dataset=dataset,
+            user_id=dataset_document.created_by,
+            document_id=dataset_document.id
+        )
+        doc_store.add_documents(new_documents)
+
+        # reorder all segments of the document to the new split order
+        segment_ids = dict(db.session.query(DocumentSegment.index_node_id, DocumentSegment.id).filter(
+            DocumentSegment.dataset_id == dataset.id,
+            DocumentSegment.document_id == dataset_document.id
+        ).all())
+        db.session.bulk_update_mappings(DocumentSegment, [
+            {'id': segment_ids[node_id], 'position': position}
+            for position, node_id in enumerate(ordered_node_ids, start=1) if node_id in segment_ids
+        ])
+        db.session.commit()
+
+        # update document status to indexing
+        cur_time = datetime.datetime.utcnow()
+        self._update_document_index_status(
+            document_id=dataset_document.id,
+            after_indexing_status="indexing",
+            extra_update_params={
+                DatasetDocument.cleaning_completed_at: cur_time,
+                DatasetDocument.splitting_completed_at: cur_time,
+            }
+        )
+
+        # update new segment status to indexing
+        new_node_ids = [document.metadata['doc_id'] for document in new_documents]
+        if new_node_ids:
+            DocumentSegment.query.filter(
+                DocumentSegment.document_id == dataset_document.id,
+                DocumentSegment.index_node_id.in_(new_node_ids)
+            ).update({
+                DocumentSegment.status: "indexing",
+                DocumentSegment.indexing_at: datetime.datetime.utcnow()
+            }, synchronize_session=False)
+            db.session.commit()
+
+        return new_documents
+
+    @staticmethod
+    def _get_kept_segment_tokens(dataset_document: DatasetDocument, new_documents: List[Document]) -> int:
+        """Sum the tokens of the segments kept by an incremental split, the deleted ones are already gone."""
+        new_node_ids = [document.metadata['doc_id'] for document in new_documents]
+        query = db.session.query(func.coalesce(func.sum(DocumentSegment.tokens), 0)).filter(
+            DocumentSegment.dataset_id == dataset_document.dataset_id,
+            DocumentSegment.document_id == dataset_document.id
+        )
+        if new_node_ids:
+            query = query.filter(DocumentSegment.index_node_id.notin_(new_node_ids))
+
+        return int(query.scalar())
+
     def _split_to_documents(self, text_docs: List[Document], splitter: TextSplitter,
                             processing_rule: DatasetProcessRule, tenant_id: str,
-                            document_form: str, document_language: str) -> List[Document]:
+                            document_form: str, document_language: str,
+                            document_id: Optional[str] = None) -> List[Document]:
         """
         Split the text documents into nodes.
         """
         all_documents = []
-        all_qa_documents = []
         for text_doc in text_docs:
             # document clean
             document_text = self._document_clean(text_doc.page_content, processing_rule)
@@ -624,44 +769,103 @@ class IndexingRunner:
             all_documents.extend(split_documents)
         # processing qa document
         if document_form == 'qa_model':
-            for i in range(0, len(all_documents), 10):
-                threads = []
-                sub_documents = all_documents[i:i + 10]
-                for doc in sub_documents:
-                    document_format_thread = threading.Thread(target=self.format_qa_document, kwargs={
-                        'flask_app': current_app._get_current_object(),
-                        'tenant_id': tenant_id, 'document_node': doc, 'all_qa_documents': all_qa_documents,
-                        'document_language': document_language})
-                    threads.append(document_format_thread)
-                    document_format_thread.start()
-                for thread in threads:
-                    thread.join()
-            return all_qa_documents
+            return self._format_qa_documents(all_documents, tenant_id, document_language, document_id)
         return all_documents
 
-    def format_qa_document(self, flask_app: Flask, tenant_id: str, document_node, all_qa_documents, document_language):
-        format_documents = []
+    def _format_qa_documents(self, documents: List[Document], tenant_id: str, document_language: str,
+                             document_id: Optional[str] = None) -> List[Document]:
+        """
+        Format the nodes into QA documents on the shared bounded QA executor.
+        A new chunk starts as soon as any worker frees up, progress is reported per finished chunk.
+        """
+        flask_app = current_app._get_current_object()
+        executor = self._get_qa_executor()
+
+        futures = [executor.submit(self.format_qa_document, flask_app, tenant_id, document_node, document_language)
+                   for document_node in documents]
+        try:
+            completed_count = 0
+            for future in as_completed(futures):
+                # a non transient error fails the document, the pending chunks are cancelled right away
+                future.result()
+                completed_count += 1
+                if document_id:
+                    self._update_qa_progress(document_id, completed_count, len(futures))
+                    # check document is paused
+                    self._check_document_paused_status(document_id)
+        finally:
+            for future in futures:
+                future.cancel()
+
+            if document_id:
+                redis_client.delete(self._get_qa_progress_key(document_id))
+
+        all_qa_documents = []
+        for future in futures:
+            all_qa_documents.extend(future.result())
+
+        return all_qa_documents
+
+    @classmethod
+    def _get_qa_executor(cls) -> ThreadPoolExecutor:
+        with cls._qa_executor_lock:
+            if cls._qa_executor is None:
+                cls._qa_executor = ThreadPoolExecutor(
+                    max_workers=int(current_app.config.get('QA_DOCUMENT_FORMAT_CONCURRENCY', 10)),
+                    thread_name_prefix='qa_document_format'
+                )
+
+        return cls._qa_executor
+
+    @staticmethod
+    def _get_qa_progress_key(document_id: str) -> str:
+        return 'document_{}_qa_formatting_progress'.format(document_id)
+
+    def _update_qa_progress(self, document_id: str, completed_count: int, total_count: int):
+        redis_client.setex(self._get_qa_progress_key(document_id), 600, json.dumps({
+            'completed': completed_count,
+            'total': total_count
+        }))
+
+    @classmethod
+    def get_qa_formatting_progress(cls, document_id: str) -> Optional[dict]:
+        """Get the QA formatting progress of a document being split, None if not formatting."""
+        progress = redis_client.get(cls._get_qa_progress_key(document_id))
+        return json.loads(progress) if progress else None
+
+    def format_qa_document(self, flask_app: Flask, tenant_id: str, document_node: Document,
+                           document_language: str) -> List[Document]:
         if document_node.page_content is None or not document_node.page_content.strip():
-            return
+            return []
         with flask_app.app_context():
-            try:
-                # qa model document
-                response = LLMGenerator.generate_qa_document(tenant_id, document_node.page_content, document_language)
-                document_qa_list = self.format_split_text(response)
-                qa_documents = []
-                for result in document_qa_list:
-                    qa_document = Document(page_content=result['question'], metadata=document_node.metadata.copy())
-                    doc_id = str(uuid.uuid4())
-                    hash = helper.generate_text_hash(result['question'])
-                    qa_document.metadata['answer'] = result['answer']
-                    qa_document.metadata['doc_id'] = doc_id
-                    qa_document.metadata['doc_hash'] = hash
-                    qa_documents.append(qa_document)
-                format_documents.extend(qa_documents)
-            except Exception as e:
-                logging.exception(e)
+            max_retries = int(flask_app.config.get('QA_DOCUMENT_FORMAT_MAX_RETRIES', 2))
+            for attempt in range(max_retries + 1):
+                try:
+                    # qa model document
+                    response = LLMGenerator.generate_qa_document(tenant_id, document_node.page_content,
+                                                                 document_language)
+                    break
+                except (LLMRateLimitError, LLMAPIConnectionError, LLMAPIUnavailableError) as e:
+                    # only transient errors are retried, the others fail the indexing right away
+                    if attempt >= max_retries:
+                        logging.exception(e)
+                        return []
+
+                    # exponential backoff before retrying this chunk
+                    time.sleep(2 ** attempt)
+
+            document_qa_list = self.format_split_text(response)
+            qa_documents = []
+            for result in document_qa_list:
+                qa_document = Document(page_content=result['question'], metadata=document_node.metadata.copy())
+                doc_id = str(uuid.uuid4())
+                hash = helper.generate_text_hash(result['question'])
+                qa_document.metadata['answer'] = result['answer']
+                qa_document.metadata['doc_id'] = doc_id
+                qa_document.metadata['doc_hash'] = hash
+                qa_documents.append(qa_document)
 
-            all_qa_documents.extend(format_documents)
+            return qa_documents
 
     def _split_to_documents_for_estimate(self, text_docs: List[Document], splitter: TextSplitter,
                                          processing_rule: DatasetProcessRule) -> List[Document]:
@@ -764,62 +968,15 @@ class IndexingRunner:
         """
         Build the index for the document.
         """
-        vector_index = IndexBuilder.get_index(dataset, 'high_quality')
-        keyword_table_index = IndexBuilder.get_index(dataset, 'economy')
-        embedding_model = None
-        if dataset.indexing_technique == 'high_quality':
-            embedding_model = ModelFactory.get_embedding_model(
-                tenant_id=dataset.tenant_id,
-                model_provider_name=dataset.embedding_model_provider,
-                model_name=dataset.embedding_model
+        pipeline = IndexingPipeline(self, current_app._get_current_object())
+        try:
+            pipeline.submit(
+                dataset=dataset,
+                dataset_document=dataset_document,
+                documents=documents
             )
-
-        # chunk nodes by chunk size
-        indexing_start_at = time.perf_counter()
-        tokens = 0
-        chunk_size = 100
-        for i in range(0, len(documents), chunk_size):
-            # check document is paused
-            self._check_document_paused_status(dataset_document.id)
-            chunk_documents = documents[i:i + chunk_size]
-            if dataset.indexing_technique == 'high_quality' or embedding_model:
-                tokens += sum(
-                    embedding_model.get_num_tokens(document.page_content)
-                    for document in chunk_documents
-                )
-
-            # save vector index
-            if vector_index:
-                vector_index.add_texts(chunk_documents)
-
-            # save keyword index
-            keyword_table_index.add_texts(chunk_documents)
-
-            document_ids = [document.metadata['doc_id'] for document in chunk_documents]
-            db.session.query(DocumentSegment).filter(
-                DocumentSegment.document_id == dataset_document.id,
-                DocumentSegment.index_node_id.in_(document_ids),
-                DocumentSegment.status == "indexing"
-            ).update({
-                DocumentSegment.status: "completed",
-                DocumentSegment.enabled: True,
-                DocumentSegment.completed_at: datetime.datetime.utcnow()
-            })
-
-            db.session.commit()
-
-        indexing_end_at = time.perf_counter()
-
-        # update document status to completed
-        self._update_document_index_status(
-            document_id=dataset_document.id,
-            after_indexing_status="completed",
-            extra_update_params={
-                DatasetDocument.tokens: tokens,
-                DatasetDocument.completed_at: datetime.datetime.utcnow(),
-                DatasetDocument.indexing_latency: indexing_end_at - indexing_start_at,
-            }
-        )
+        finally:
+            pipeline.join()
 
     def _check_document_paused_status(self, document_id: str):
         indexing_cache_key = 'document_{}_is_paused'.format(document_id)
@@ -889,3 +1046,268 @@ class DocumentIsPausedException(Exception):
 
 class DocumentIsDeletedPausedException(Exception):
     pass
+
+
+class IndexingJob:
+    """Indexing progress of one document flowing through the IndexingPipeline."""
+
+    def __init__(self, dataset: Dataset, dataset_document: DatasetDocument, chunk_count: int,
+                 kept_tokens: int = 0):
+        # plain values only, the ORM objects belong to the submitting thread's session
+        self.dataset_id = dataset.id
+        self.tenant_id = dataset.tenant_id
+        self.indexing_technique = dataset.indexing_technique
+        self.embedding_model_provider = dataset.embedding_model_provider
+        self.embedding_model = dataset.embedding_model
+        self.document_id = dataset_document.id
+
+        self.remaining_chunks = chunk_count
+        # tokens of the segments kept from a previous indexing, not embedded again
+        self.tokens = kept_tokens
+        self.started_at = time.perf_counter()
+        self.paused = False
+        self.failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def stopped(self) -> bool:
+        return self.paused or self.failed
+
+    def add_tokens(self, tokens: int):
+        with self._lock:
+            self.tokens += tokens
+
+    def finish_chunk(self) -> bool:
+        """Return True when the last chunk of the job is finished."""
+        with self._lock:
+            self.remaining_chunks -= 1
+            return self.remaining_chunks == 0
+
+    def stop(self, paused: bool = False) -> bool:
+        """Return False if the job was already stopped."""
+        with self._lock:
+            if self.stopped:
+                return False
+
+            if paused:
+                self.paused = True
+            else:
+                self.failed = True
+
+            return True
+
+
+class IndexingPipeline:
+    """
+    Embeds and writes document chunks in stages running concurrently with the caller.
+
+    Submitted documents are cut into chunks that flow through bounded queues, so the
+    caller blocks (back-pressure) instead of buffering when the later stages lag behind:
+    embedding workers compute the chunk embeddings into the embedding cache, with a
+    per-provider concurrency limit, and a single writer adds the chunks to the vector
+    and keyword indexes, which then read the embeddings back from the cache.
+    """
+
+    _provider_semaphores = {}
+    _provider_semaphores_lock = threading.Lock()
+
+    def __init__(self, runner: IndexingRunner, flask_app: Flask, chunk_size: int = 100):
+        self._runner = runner
+        self._flask_app = flask_app
+        self._chunk_size = chunk_size
+        self._embedding_concurrency = int(flask_app.config.get('INDEXING_EMBEDDING_CONCURRENCY', 2))
+
+        queue_size = int(flask_app.config.get('INDEXING_PIPELINE_QUEUE_SIZE', 4))
+        self._embed_queue = queue.Queue(maxsize=queue_size)
+        self._write_queue = queue.Queue(maxsize=queue_size)
+        self._jobs = []
+
+        self._embed_threads = [threading.Thread(target=self._embed_worker, daemon=True)
+                               for _ in range(self._embedding_concurrency)]
+        self._write_thread = threading.Thread(target=self._write_worker, daemon=True)
+
+        for thread in self._embed_threads:
+            thread.start()
+        self._write_thread.start()
+
+    def submit(self, dataset: Dataset, dataset_document: DatasetDocument, documents: List[Document],
+               kept_tokens: int = 0):
+        chunks = [documents[i:i + self._chunk_size] for i in range(0, len(documents), self._chunk_size)]
+        # a document without chunks still needs to be completed by the writer
+        chunks = chunks or [[]]
+
+        job = IndexingJob(dataset, dataset_document, len(chunks), kept_tokens)
+        self._jobs.append(job)
+
+        for chunk_documents in chunks:
+            self._embed_queue.put((job, chunk_documents))
+
+    def join(self):
+        for _ in self._embed_threads:
+            self._embed_queue.put(None)
+        for thread in self._embed_threads:
+            thread.join()
+
+        self._write_queue.put(None)
+        self._write_thread.join()
+
+        paused_jobs = [job for job in self._jobs if job.paused]
+        if paused_jobs:
+            raise DocumentIsPausedException('Document paused, document id: {}'.format(paused_jobs[0].document_id))
+
+    @classmethod
+    def _get_provider_semaphore(cls, provider_name: str, concurrency: int) -> threading.Semaphore:
+        with cls._provider_semaphores_lock:
+            if provider_name not in cls._provider_semaphores:
+                cls._provider_semaphores[provider_name] = threading.BoundedSemaphore(concurrency)
+
+            return cls._provider_semaphores[provider_name]
+
+    def _embed_worker(self):
+        with self._flask_app.app_context():
+            embedding_models = {}
+            while True:
+                item = self._embed_queue.get()
+                if item is None:
+                    break
+
+                job, chunk_documents = item
+                if not job.stopped and chunk_documents:
+                    try:
+                        # check document is paused
+                        self._runner._check_document_paused_status(job.document_id)
+
+                        if job.indexing_technique == 'high_quality':
+                            if job.dataset_id not in embedding_models:
+                                embedding_models[job.dataset_id] = ModelFactory.get_embedding_model(
+                                    tenant_id=job.tenant_id,
+                                    model_provider_name=job.embedding_model_provider,
+                                    model_name=job.embedding_model
+                                )
+                            embedding_model = embedding_models[job.dataset_id]
+
+                            texts = [document.page_content for document in chunk_documents]
+                            semaphore = self._get_provider_semaphore(
+                                embedding_model.model_provider.provider_name,
+                                self._embedding_concurrency
+                            )
+                            with semaphore:
+                                CacheEmbedding(embedding_model).embed_documents(texts)
+
+                            job.add_tokens(sum(embedding_model.get_num_tokens(text) for text in texts))
+                    except Exception as e:
+                        self._handle_job_error(job, e)
+
+                # always forwarded, the writer completes the job once all of its chunks went through
+                self._write_queue.put(item)
+
+    def _write_worker(self):
+        with self._flask_app.app_context():
+            indexes = {}
+            while True:
+                item = self._write_queue.get()
+                if item is None:
+                    break
+
+                job, chunk_documents = item
+                if not job.stopped and chunk_documents:
+                    try:
+                        # check document is paused
+                        self._runner._check_document_paused_status(job.document_id)
+
+                        if job.dataset_id not in indexes:
+                            dataset = db.session.query(Dataset).filter(Dataset.id == job.dataset_id).first()
+                            if not dataset:
+                                raise ValueError("no dataset found")
+
+                            indexes[job.dataset_id] = (
+                                IndexBuilder.get_index(dataset, 'high_quality'),
+                                IndexBuilder.get_index(dataset, 'economy')
+                            )
+                        vector_index, keyword_table_index = indexes[job.dataset_id]
+
+                        self._write_chunk(job, chunk_documents, vector_index, keyword_table_index)
+                    except Exception as e:
+                        self._handle_job_error(job, e)
+
+                if job.finish_chunk():
+                    if not job.stopped:
+                        try:
+                            self._complete_job(job)
+                        except Exception as e:
+                            self._handle_job_error(job, e)
+
+    def _write_chunk(self, job: IndexingJob, chunk_documents: List[Document], vector_index, keyword_table_index):
+        # save vector index
+        if vector_index:
+            vector_index.add_texts(chunk_documents)
+
+        # save keyword index
+        keyword_table_index.add_texts(chunk_documents)
+
+        document_ids = [document.metadata['doc_id'] for document in chunk_documents]
+        db.session.query(DocumentSegment).filter(
+            DocumentSegment.document_id == job.document_id,
+            DocumentSegment.index_node_id.in_(document_ids),
+            DocumentSegment.status == "indexing"
+        ).update({
+            DocumentSegment.status: "completed",
+            DocumentSegment.enabled: True,
+            DocumentSegment.completed_at: datetime.datetime.utcnow()
+        })
+
+        db.session.commit()
+
+    def _complete_job(self, job: IndexingJob):
+        # update document status to completed
+        self._runner._update_document_index_status(
+            document_id=job.document_id,
+            after_indexing_status="completed",
+            extra_update_params={
+                DatasetDocument.tokens: job.tokens,
+                DatasetDocument.completed_at: datetime.datetime.utcnow(),
+                DatasetDocument.indexing_latency: time.perf_counter() - job.started_at,
+            }
+        )
+
+    def _handle_job_error(self, job: IndexingJob, e: Exception):
+        """
+        Stop the job and record its error, never raises so the stage threads keep draining
+        their queues and the pipeline can still shut down.
+        """
+        try:
+            self._record_job_error(job, e)
+        except Exception:
+            logging.exception('Failed to record indexing error, document id: {}'.format(job.document_id))
+            job.stop()
+            try:
+                db.session.rollback()
+            except Exception:
+                logging.exception('Failed to rollback indexing session')
+
+    def _record_job_error(self, job: IndexingJob, e: Exception):
+        db.session.rollback()
+
+        if isinstance(e, DocumentIsPausedException):
+            job.stop(paused=True)
+            return
+
+        if not job.stop():
+            return
+
+        if isinstance(e, (ObjectDeletedError, DocumentIsDeletedPausedException)):
+            logging.warning('Document deleted, document id: {}'.format(job.document_id))
+            return
+
+        if isinstance(e, ProviderTokenNotInitError):
+            error = str(e.description)
+        else:
+            logging.exception("consume document failed")
+            error = str(e)
+
+        DatasetDocument.query.filter_by(id=job.document_id).update({
+            DatasetDocument.indexing_status: 'error',
+            DatasetDocument.error: error,
+            DatasetDocument.stopped_at: datetime.datetime.utcnow()
+        })
+        db.session.commit()
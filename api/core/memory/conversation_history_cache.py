@@ -0,0 +1,156 @@
+import json
+import logging
+from typing import List, Optional, Dict
+
+from flask import current_app
+from redis.exceptions import WatchError
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.model import Message, MessageFile
+
+
+class ConversationHistoryCache:
+    """
+    Rolling window of the latest answered messages of each conversation, kept in redis.
+
+    Entries only hold the plain message fields (id, query, answer and whether it has files),
+    files are resolved at read time because the prompt data of a file (signed urls, base64 data)
+    must not outlive its own expiry. The window is seeded from the database on a miss and
+    appended to whenever a message is saved, a version key guards seeding against a
+    concurrent save so a stale window is never written back.
+    """
+
+    def get_messages(self, conversation_id: str, message_limit: int) -> List[dict]:
+        """
+        Get the last message_limit answered messages of a conversation, oldest first.
+        """
+        capacity = int(current_app.config.get('CONVERSATION_HISTORY_CACHE_SIZE'))
+        if message_limit > capacity:
+            return self._query_messages(conversation_id, message_limit)
+
+        try:
+            cached_entries = redis_client.lrange(self._get_cache_key(conversation_id), -message_limit, -1)
+            if cached_entries:
+                return [json.loads(entry) for entry in cached_entries]
+
+            version = redis_client.get(self._get_version_key(conversation_id))
+        except Exception:
+            logging.exception('Failed to get conversation history from redis cache')
+            return self._query_messages(conversation_id, message_limit)
+
+        entries = self._query_messages(conversation_id, capacity)
+        if entries:
+            self._seed(conversation_id, version, entries)
+
+        return entries[-message_limit:]
+
+    def append_message(self, message: Message, has_files: bool):
+        """
+        Push a newly answered message to the window of its conversation, if the window is cached.
+        """
+        if not message.answer_tokens or message.answer_tokens <= 0:
+            return
+
+        cache_key = self._get_cache_key(message.conversation_id)
+        version_key = self._get_version_key(message.conversation_id)
+        capacity = int(current_app.config.get('CONVERSATION_HISTORY_CACHE_SIZE'))
+        ttl = int(current_app.config.get('CONVERSATION_HISTORY_CACHE_TTL'))
+
+        try:
+            pipeline = redis_client.pipeline()
+            pipeline.incr(version_key)
+            pipeline.expire(version_key, ttl)
+            pipeline.rpushx(cache_key, json.dumps(self._to_entry(message, has_files)))
+            pipeline.ltrim(cache_key, -capacity, -1)
+            pipeline.expire(cache_key, ttl)
+            pipeline.execute()
+        except Exception:
+            logging.exception('Failed to append conversation history to redis cache')
+            self.invalidate(message.conversation_id)
+
+    def invalidate(self, conversation_id: str):
+        try:
+            redis_client.delete(self._get_cache_key(conversation_id))
+        except Exception:
+            logging.exception('Failed to invalidate conversation history cache')
+
+    @staticmethod
+    def get_message_files(entries: List[dict]) -> Dict[str, List[MessageFile]]:
+        """
+        Load the files of the given entries with a single query, grouped by message id.
+        """
+        message_ids = [entry['id'] for entry in entries if entry['has_files']]
+        if not message_ids:
+            return {}
+
+        message_files = db.session.query(MessageFile) \
+            .filter(MessageFile.message_id.in_(message_ids)) \
+            .order_by(MessageFile.created_at.asc()) \
+            .all()
+
+        files_by_message_id = {}
+        for message_file in message_files:
+            files_by_message_id.setdefault(str(message_file.message_id), []).append(message_file)
+
+        return files_by_message_id
+
+    def _seed(self, conversation_id: str, version: Optional[bytes], entries: List[dict]):
+        cache_key = self._get_cache_key(conversation_id)
+        version_key = self._get_version_key(conversation_id)
+        ttl = int(current_app.config.get('CONVERSATION_HISTORY_CACHE_TTL'))
+
+        try:
+            with redis_client.pipeline() as pipeline:
+                pipeline.watch(version_key)
+                if pipeline.get(version_key) != version:
+                    # a message was saved since the window was read from the database
+                    return
+
+                pipeline.multi()
+                pipeline.delete(cache_key)
+                pipeline.rpush(cache_key, *[json.dumps(entry) for entry in entries])
+                pipeline.expire(cache_key, ttl)
+                pipeline.execute()
+        except WatchError:
+            pass
+        except Exception:
+            logging.exception('Failed to set conversation history to redis cache')
+
+    def _query_messages(self, conversation_id: str, limit: int) -> List[dict]:
+        messages = db.session.query(Message.id, Message.query, Message.answer, Message.answer_tokens).filter(
+            Message.conversation_id == conversation_id,
+            Message.answer_tokens > 0
+        ).order_by(Message.created_at.desc()).limit(limit).all()
+
+        if not messages:
+            return []
+
+        message_ids_with_files = {
+            str(message_id) for message_id, in db.session.query(MessageFile.message_id).filter(
+                MessageFile.message_id.in_([message.id for message in messages])
+            ).distinct().all()
+        }
+
+        return [self._to_entry(message, str(message.id) in message_ids_with_files)
+                for message in reversed(messages)]
+
+    @staticmethod
+    def _to_entry(message, has_files: bool) -> dict:
+        return {
+            'id': str(message.id),
+            'query': message.query,
+            'answer': message.answer,
+            'has_files': has_files
+        }
+
+    @staticmethod
+    def _get_cache_key(conversation_id: str) -> str:
+        return 'conversation_history:{}'.format(conversation_id)
+
+    @staticmethod
+    def _get_version_key(conversation_id: str) -> str:
+        return 'conversation_history_version:{}'.format(conversation_id)
+
+
+conversation_history_cache = ConversationHistoryCache()
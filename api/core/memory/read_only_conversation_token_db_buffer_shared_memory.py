@@ -4,10 +4,12 @@ from langchain.memory.chat_memory import BaseChatMemory
 from langchain.schema import get_buffer_string, BaseMessage
 
 from core.file.message_file_parser import MessageFileParser
+from core.memory.conversation_history_cache import conversation_history_cache
+from core.memory.token_counter import prompt_message_token_counter
 from core.model_providers.models.entity.message import PromptMessage, MessageType, to_lc_messages
 from core.model_providers.models.llm.base import BaseLLM
 from extensions.ext_database import db
-from models.model import Conversation, Message
+from models.model import Conversation, AppModelConfig
 
 
 class ReadOnlyConversationTokenDBBufferSharedMemory(BaseChatMemory):
@@ -24,44 +26,42 @@ class ReadOnlyConversationTokenDBBufferSharedMemory(BaseChatMemory):
         """String buffer of memory."""
         app_model = self.conversation.app
 
-        # fetch limited messages desc, and return reversed
-        messages = db.session.query(Message).filter(
-            Message.conversation_id == self.conversation.id,
-            Message.answer_tokens > 0
-        ).order_by(Message.created_at.desc()).limit(self.message_limit).all()
+        # fetch limited messages, oldest first
+        messages = conversation_history_cache.get_messages(self.conversation.id, self.message_limit)
+        files_by_message_id = conversation_history_cache.get_message_files(messages)
+
+        app_model_config = None
+        if files_by_message_id:
+            app_model_config = db.session.query(AppModelConfig).filter(
+                AppModelConfig.id == self.conversation.app_model_config_id
+            ).first()
 
-        messages = list(reversed(messages))
         message_file_parser = MessageFileParser(tenant_id=app_model.tenant_id, app_id=self.conversation.app_id)
 
         chat_messages: List[PromptMessage] = []
         for message in messages:
-            files = message.message_files
+            files = files_by_message_id.get(message['id'])
             if files:
                 file_objs = message_file_parser.transform_message_files(
-                    files, message.app_model_config
+                    files, app_model_config
                 )
 
                 prompt_message_files = [file_obj.prompt_message_file for file_obj in file_objs]
                 chat_messages.append(PromptMessage(
-                    content=message.query,
+                    content=message['query'],
                     type=MessageType.USER,
                     files=prompt_message_files
                 ))
             else:
-                chat_messages.append(PromptMessage(content=message.query, type=MessageType.USER))
+                chat_messages.append(PromptMessage(content=message['query'], type=MessageType.USER))
 
-            chat_messages.append(PromptMessage(content=message.answer, type=MessageType.ASSISTANT))
+            chat_messages.append(PromptMessage(content=message['answer'], type=MessageType.ASSISTANT))
 
         if not chat_messages:
             return []
 
         # prune the chat message if it exceeds the max token limit
-        curr_buffer_length = self.model_instance.get_num_tokens(chat_messages)
-        if curr_buffer_length > self.max_token_limit:
-            pruned_memory = []
-            while curr_buffer_length > self.max_token_limit and chat_messages:
-                pruned_memory.append(chat_messages.pop(0))
-                curr_buffer_length = self.model_instance.get_num_tokens(chat_messages)
+        chat_messages = prompt_message_token_counter.prune(self.model_instance, chat_messages, self.max_token_limit)
 
         return to_lc_messages(chat_messages)
 
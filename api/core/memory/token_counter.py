@@ -0,0 +1,114 @@
+import hashlib
+import threading
+from typing import List
+
+from cachetools import LRUCache
+from flask import current_app
+
+from core.model_providers.models.entity.message import PromptMessage
+from core.model_providers.models.llm.base import BaseLLM
+
+
+class PromptMessageTokenCounter:
+    """
+    Counts tokens of prompt messages one message at a time, memoized per model and message content.
+
+    Messages of a conversation history are the same from one turn to the next, so each of them is
+    only tokenized once per process instead of re-tokenizing the whole history on every request.
+    """
+
+    # share of max_token_limit below which the pruned messages are counted again as a whole
+    PRUNE_SAFETY_MARGIN = 0.05
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = None
+
+    def get_num_tokens(self, model_instance: BaseLLM, message: PromptMessage) -> int:
+        cache_key = self._get_cache_key(model_instance, message)
+        cache = self._get_cache()
+
+        with self._lock:
+            num_tokens = cache.get(cache_key)
+
+        if num_tokens is None:
+            num_tokens = model_instance.get_num_tokens([message])
+            with self._lock:
+                cache[cache_key] = num_tokens
+
+        return num_tokens
+
+    def get_num_tokens_list(self, model_instance: BaseLLM, messages: List[PromptMessage]) -> List[int]:
+        return [self.get_num_tokens(model_instance, message) for message in messages]
+
+    def prune(self, model_instance: BaseLLM, messages: List[PromptMessage], max_token_limit: int) \
+            -> List[PromptMessage]:
+        """
+        Drop the oldest messages until the rest fits in max_token_limit.
+
+        The cut is found in a single pass over the suffix sums of the per message counts. Each per
+        message count includes the per request overhead some tokenizers add (e.g. the reply priming
+        tokens of chat models), it is only charged once for the whole list. The model's own count of
+        the kept messages, which can differ slightly from the sum, is only checked when the sum comes
+        within PRUNE_SAFETY_MARGIN of the limit.
+        """
+        if not messages:
+            return messages
+
+        overhead_tokens = self.get_overhead_tokens(model_instance)
+        num_tokens_list = [max(num_tokens - overhead_tokens, 0)
+                           for num_tokens in self.get_num_tokens_list(model_instance, messages)]
+
+        start = len(messages)
+        total_tokens = overhead_tokens
+        while start > 0 and total_tokens + num_tokens_list[start - 1] <= max_token_limit:
+            start -= 1
+            total_tokens += num_tokens_list[start]
+
+        messages = messages[start:]
+        if max_token_limit - total_tokens < max_token_limit * self.PRUNE_SAFETY_MARGIN:
+            while messages and model_instance.get_num_tokens(messages) > max_token_limit:
+                messages = messages[1:]
+
+        return messages
+
+    def get_overhead_tokens(self, model_instance: BaseLLM) -> int:
+        """Tokens a model counts for a request without messages, memoized per model."""
+        cache_key = '{}:{}:overhead'.format(model_instance.model_provider.provider_name, model_instance.name)
+        cache = self._get_cache()
+
+        with self._lock:
+            overhead_tokens = cache.get(cache_key)
+
+        if overhead_tokens is None:
+            try:
+                overhead_tokens = max(model_instance.get_num_tokens([]), 0)
+            except Exception:
+                # some tokenizers reject an empty prompt, no overhead is assumed
+                overhead_tokens = 0
+
+            with self._lock:
+                cache[cache_key] = overhead_tokens
+
+        return overhead_tokens
+
+    def clear(self):
+        with self._lock:
+            if self._cache is not None:
+                self._cache.clear()
+
+    def _get_cache(self) -> LRUCache:
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = LRUCache(maxsize=int(current_app.config.get('PROMPT_TOKEN_COUNT_CACHE_SIZE')))
+
+        return self._cache
+
+    @staticmethod
+    def _get_cache_key(model_instance: BaseLLM, message: PromptMessage) -> str:
+        content_hash = hashlib.sha256(message.json().encode('utf-8')).hexdigest()
+        return '{}:{}:{}'.format(model_instance.model_provider.provider_name, model_instance.name, content_hash)
+
+
+prompt_message_token_counter = PromptMessageTokenCounter()
@@ -3,6 +3,7 @@ from typing import Type
 from sqlalchemy.exc import IntegrityError
 
 from core.model_providers.models.entity.model_params import ModelType
+from core.model_providers.preferred_provider_cache import preferred_provider_cache
 from core.model_providers.providers.base import BaseModelProvider
 from core.model_providers.rules import provider_rules
 from extensions.ext_database import db
@@ -108,7 +109,11 @@ class ModelProviderFactory:
         :return:
         """
         # get preferred provider
-        preferred_provider = cls._get_preferred_provider(tenant_id, model_provider_name)
+        preferred_provider = preferred_provider_cache.get_or_resolve(
+            tenant_id,
+            model_provider_name,
+            lambda: cls._get_preferred_provider(tenant_id, model_provider_name)
+        )
         if not preferred_provider or not preferred_provider.is_valid:
             return None
 
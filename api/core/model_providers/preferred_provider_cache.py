@@ -0,0 +1,109 @@
+import logging
+import threading
+from typing import Optional, Callable
+
+from cachetools import TTLCache
+from flask import current_app
+
+from extensions.ext_redis import redis_client
+from models.provider import Provider
+
+
+class PreferredProviderCache:
+    """
+    Short lived in-process cache of the preferred provider resolved for a tenant and provider name.
+
+    Resolving a provider takes several queries (preferred type, providers, and sometimes inserts),
+    and it is done for every model instance of every request. Cached entries are detached copies
+    of the provider row, tagged with a per tenant version kept in redis, so a change made by any
+    process (credentials, preferred type, quota) invalidates the entries of every other process
+    on their next lookup instead of waiting for the TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local_cache = None
+
+    def get_or_resolve(self, tenant_id: str, provider_name: str,
+                       resolve: Callable[[], Optional[Provider]]) -> Optional[Provider]:
+        """
+        Get the cached preferred provider, or resolve it and cache it when it is valid.
+
+        The version is read before resolving, so a change committed in the meantime
+        leaves the new entry already outdated rather than hiding the change.
+        """
+        version = self._get_version(tenant_id)
+        if version is None:
+            return resolve()
+
+        cache_key = (tenant_id, provider_name)
+        local_cache = self._get_local_cache()
+
+        with self._lock:
+            entry = local_cache.get(cache_key)
+
+        if entry is not None and entry[0] == version:
+            return self._copy(entry[1])
+
+        provider = resolve()
+        if provider and provider.is_valid:
+            with self._lock:
+                local_cache[cache_key] = (version, self._copy(provider))
+
+        return provider
+
+    def invalidate(self, tenant_id: str):
+        """
+        Invalidate the cached providers of a tenant in all processes.
+        """
+        try:
+            redis_client.incr(self._get_version_key(tenant_id))
+        except Exception:
+            logging.exception('Failed to invalidate preferred provider cache')
+
+        if self._local_cache is not None:
+            with self._lock:
+                for key in [key for key in self._local_cache.keys() if key[0] == tenant_id]:
+                    self._local_cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            if self._local_cache is not None:
+                self._local_cache.clear()
+
+    def _get_version(self, tenant_id: str) -> Optional[bytes]:
+        """
+        Get the current version of the tenant, None when it can not be read,
+        in which case nothing is served from or written to the cache.
+        """
+        try:
+            return redis_client.get(self._get_version_key(tenant_id)) or b'0'
+        except Exception:
+            logging.exception('Failed to get preferred provider cache version from redis')
+            return None
+
+    def _get_local_cache(self) -> TTLCache:
+        if self._local_cache is None:
+            with self._lock:
+                if self._local_cache is None:
+                    self._local_cache = TTLCache(
+                        maxsize=int(current_app.config.get('PREFERRED_PROVIDER_CACHE_SIZE')),
+                        ttl=int(current_app.config.get('PREFERRED_PROVIDER_CACHE_TTL'))
+                    )
+
+        return self._local_cache
+
+    @staticmethod
+    def _copy(provider: Provider) -> Provider:
+        """
+        Copy the column values of a provider into a new transient instance,
+        which is never bound to (or expired by) a session.
+        """
+        return Provider(**{column.key: getattr(provider, column.key) for column in Provider.__table__.columns})
+
+    @staticmethod
+    def _get_version_key(tenant_id: str) -> str:
+        return 'preferred_provider_version:{}'.format(tenant_id)
+
+
+preferred_provider_cache = PreferredProviderCache()
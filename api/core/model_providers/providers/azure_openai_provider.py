@@ -15,11 +15,12 @@ from core.model_providers.models.embedding.azure_openai_embedding import AzureOp
 from core.model_providers.models.entity.model_params import ModelType, ModelKwargsRules, KwargRule, ModelMode
 from core.model_providers.models.entity.provider import ModelFeature
 from core.model_providers.models.llm.azure_openai_model import AzureOpenAIModel
+from core.model_providers.preferred_provider_cache import preferred_provider_cache
 from core.model_providers.providers.base import BaseModelProvider, CredentialsValidateFailedError
 from core.model_providers.providers.hosted import hosted_model_providers
 from core.third_party.langchain.llms.azure_chat_open_ai import EnhanceAzureChatOpenAI
 from extensions.ext_database import db
-from models.provider import ProviderType, ProviderModel, ProviderQuotaType
+from models.provider import ProviderType, ProviderModel, ProviderQuotaType, Provider
 
 BASE_MODELS = [
     'gpt-4',
@@ -388,9 +389,16 @@ class AzureOpenAIProvider(BaseModelProvider):
                 provider_credentials=credentials
             )
 
+            # the provider may be a detached copy from the preferred provider cache, update the row itself
             self.provider.encrypted_config = None
+            db.session.query(Provider).filter(Provider.id == self.provider.id).update(
+                {Provider.encrypted_config: None}, synchronize_session=False
+            )
             db.session.commit()
 
+            # cached copies still carry the legacy config and would convert it again
+            preferred_provider_cache.invalidate(self.provider.tenant_id)
+
     def _add_provider_model(self, model_name: str, model_type: ModelType, provider_credentials: dict):
         credentials = provider_credentials.copy()
         credentials['base_model_name'] = model_name
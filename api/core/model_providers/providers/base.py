@@ -9,6 +9,7 @@ from core.model_providers.error import QuotaExceededError, LLMBadRequestError
 from extensions.ext_database import db
 from core.model_providers.models.entity.model_params import ModelType, ModelKwargsRules
 from core.model_providers.models.entity.provider import ProviderQuotaUnit
+from core.model_providers.preferred_provider_cache import preferred_provider_cache
 from core.model_providers.rules import provider_rules
 from models.provider import Provider, ProviderType, ProviderModel
 
@@ -213,6 +214,8 @@ class BaseModelProvider(BaseModel, ABC):
         ).first()
 
         if not provider:
+            # the quota may have run out since the provider was resolved, resolve it again next time
+            preferred_provider_cache.invalidate(self.provider.tenant_id)
             raise QuotaExceededError()
 
     def deduct_quota(self, used_tokens: int = 0) -> None:
@@ -0,0 +1,122 @@
+import threading
+from typing import Optional, List, Tuple, NamedTuple
+
+from cachetools import TTLCache
+from flask import current_app
+
+from extensions.ext_database import db
+from models.dataset import Dataset, DocumentSegment, Document
+
+
+class DatasetMetadataCache:
+    """
+    Short lived in-process cache of the datasets queried by the dataset retriever tools.
+
+    A dataset row is read for every retrieval of every chat turn, while its name, indexing technique,
+    embedding model and index struct rarely change. Lookups return transient copies of the row, never
+    bound to (or expired by) a session, so they can be used from any thread. A change is seen after
+    DATASET_METADATA_CACHE_TTL seconds at most.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local_cache = None
+
+    def get(self, tenant_id: str, dataset_id: str) -> Optional[Dataset]:
+        cache_key = (tenant_id, dataset_id)
+        local_cache = self._get_local_cache()
+
+        with self._lock:
+            dataset = local_cache.get(cache_key)
+
+        if dataset is not None:
+            return self._copy(dataset)
+
+        dataset = db.session.query(Dataset).filter(
+            Dataset.tenant_id == tenant_id,
+            Dataset.id == dataset_id
+        ).first()
+
+        if not dataset:
+            return None
+
+        with self._lock:
+            local_cache[cache_key] = self._copy(dataset)
+
+        return self._copy(dataset)
+
+    def clear(self):
+        with self._lock:
+            if self._local_cache is not None:
+                self._local_cache.clear()
+
+    def _get_local_cache(self) -> TTLCache:
+        if self._local_cache is None:
+            with self._lock:
+                if self._local_cache is None:
+                    self._local_cache = TTLCache(
+                        maxsize=int(current_app.config.get('DATASET_METADATA_CACHE_SIZE')),
+                        ttl=int(current_app.config.get('DATASET_METADATA_CACHE_TTL'))
+                    )
+
+        return self._local_cache
+
+    @staticmethod
+    def _copy(dataset: Dataset) -> Dataset:
+        return Dataset(**{column.key: getattr(dataset, column.key) for column in Dataset.__table__.columns})
+
+
+dataset_metadata_cache = DatasetMetadataCache()
+
+
+class SegmentDocument(NamedTuple):
+    id: str
+    name: str
+    data_source_type: str
+
+
+def hydrate_segments(dataset_ids: List[str], index_node_ids: List[str],
+                     with_documents: bool = False) -> List[Tuple[DocumentSegment, Optional[SegmentDocument]]]:
+    """
+    Load the available segments of the retrieved index nodes in the order of index_node_ids,
+    with one query whatever the number of nodes.
+
+    :param dataset_ids: datasets the nodes were retrieved from
+    :param index_node_ids: retrieved index node ids, best match first
+    :param with_documents: also load the id, name and data source type of the document of each segment,
+                           None for the segments of a disabled or archived document
+    :return: (segment, document) pairs, document is always None when with_documents is False
+    """
+    if not index_node_ids:
+        return []
+
+    filters = [
+        DocumentSegment.dataset_id.in_(dataset_ids),
+        DocumentSegment.completed_at.isnot(None),
+        DocumentSegment.status == 'completed',
+        DocumentSegment.enabled == True,
+        DocumentSegment.index_node_id.in_(index_node_ids)
+    ]
+
+    if with_documents:
+        rows = db.session.query(
+            DocumentSegment,
+            Document.id.label('document_id'),
+            Document.name.label('document_name'),
+            Document.data_source_type.label('document_data_source_type')
+        ).outerjoin(Document, db.and_(
+            Document.id == DocumentSegment.document_id,
+            Document.enabled == True,
+            Document.archived == False
+        )).filter(*filters).all()
+
+        results = [(
+            row.DocumentSegment,
+            SegmentDocument(row.document_id, row.document_name, row.document_data_source_type)
+            if row.document_id else None
+        ) for row in rows]
+    else:
+        results = [(segment, None) for segment in db.session.query(DocumentSegment).filter(*filters).all()]
+
+    index_node_id_to_position = {index_node_id: position for position, index_node_id in enumerate(index_node_ids)}
+    return sorted(results, key=lambda result: index_node_id_to_position.get(result[0].index_node_id, float('inf')))
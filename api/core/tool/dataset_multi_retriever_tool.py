@@ -0,0 +1,149 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Type, List, Optional, Tuple
+
+from flask import current_app, Flask
+from langchain.schema import Document
+from langchain.tools import BaseTool
+from pydantic import BaseModel
+
+from core.callback_handler.dataset_tool_callback_handler import DatasetToolCallbackHandler
+from core.callback_handler.entity.dataset_query import DatasetQueryObj
+from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
+from core.conversation_message_task import ConversationMessageTask
+from core.embedding.query_embedding_context import QueryEmbeddingContext
+from core.model_providers.error import LLMBadRequestError, ProviderTokenNotInitError
+from core.tool.dataset_hydrator import dataset_metadata_cache, hydrate_segments
+from core.tool.dataset_retriever_tool import DatasetRetrieverTool, DatasetRetrieverToolInput
+from models.dataset import Dataset
+
+
+class DatasetMultiRetrieverTool(BaseTool):
+    """
+    Tool for querying all the datasets of an app at once.
+
+    The datasets are searched concurrently and their results merged into a single top k by normalized
+    score, instead of asking the model which dataset to query first. High quality datasets are scored
+    by the relevance their vector store reports, normalized to [0, 1] by the store. Economy datasets
+    have no similarity score, their results get a rank based score spread over the range of the
+    relevance scores of the query, so the best keyword match ranks with the best vector match rather
+    than above every one of them.
+    """
+    name: str = "dataset-multi"
+    args_schema: Type[BaseModel] = DatasetRetrieverToolInput
+    description: str = "use this to retrieve all the datasets. "
+
+    tools: List[DatasetRetrieverTool]
+    top_k: int = 2
+    conversation_message_task: ConversationMessageTask
+    return_resource: bool
+    retriever_from: str
+
+    @classmethod
+    def from_tools(cls, tools: List[DatasetRetrieverTool], **kwargs):
+        """
+        Merge the dataset retriever tools of an app, the smallest top k wins as it was
+        adjusted to the tokens left for the context.
+        """
+        callbacks = [callback for callback in tools[0].callbacks or []
+                     if not isinstance(callback, DatasetToolCallbackHandler)]
+
+        return cls(
+            tools=tools,
+            top_k=min(tool.top_k for tool in tools),
+            conversation_message_task=tools[0].conversation_message_task,
+            return_resource=tools[0].return_resource,
+            retriever_from=tools[0].retriever_from,
+            callbacks=callbacks,
+            **kwargs
+        )
+
+    def _run(self, query: str) -> str:
+        flask_app = current_app._get_current_object()
+        embedding_context = QueryEmbeddingContext()
+        with ThreadPoolExecutor(max_workers=len(self.tools), thread_name_prefix='dataset-retriever') as executor:
+            futures = [executor.submit(self._retrieve, flask_app, tool, query, embedding_context)
+                       for tool in self.tools]
+            results = [(dataset, documents) for dataset, documents in (future.result() for future in futures)
+                       if dataset]
+
+        datasets = {}
+        for dataset, _ in results:
+            datasets[dataset.id] = dataset
+            self.conversation_message_task.on_dataset_query_end(DatasetQueryObj(dataset_id=dataset.id, query=query))
+
+        scored_documents = self._merge_by_normalized_score(results)[:self.top_k]
+
+        for dataset_id in datasets:
+            DatasetIndexToolCallbackHandler(dataset_id, self.conversation_message_task).on_tool_end(
+                [document for _, _, document_dataset_id, document in scored_documents
+                 if document_dataset_id == dataset_id]
+            )
+
+        document_score_list = {document.metadata['doc_id']: score for _, score, _, document in scored_documents}
+        index_node_ids = [document.metadata['doc_id'] for _, _, _, document in scored_documents]
+        segments = hydrate_segments(list(datasets.keys()), index_node_ids, with_documents=self.return_resource)
+
+        document_context_list = [DatasetRetrieverTool.to_context(segment) for segment, _ in segments]
+        if segments and self.return_resource:
+            context_list = []
+            resource_number = 1
+            for segment, document in segments:
+                if document:
+                    context_list.append(DatasetRetrieverTool.to_resource(
+                        resource_number, datasets[segment.dataset_id], segment, document,
+                        document_score_list.get(segment.index_node_id), self.retriever_from
+                    ))
+                resource_number += 1
+
+            self.conversation_message_task.on_dataset_query_finish(context_list)
+
+        return str("\n".join(document_context_list))
+
+    @staticmethod
+    def _merge_by_normalized_score(results: List[Tuple[Dataset, List[Document]]]) \
+            -> List[Tuple[float, Optional[float], str, Document]]:
+        """
+        :return: (normalized score, relevance score, dataset id, document) of all the results, best first,
+                 the relevance score is None for economy datasets
+        """
+        relevance_scores = [min(max(document.metadata['score'], 0.0), 1.0)
+                            for dataset, documents in results if dataset.indexing_technique != "economy"
+                            for document in documents]
+        # economy ranks are spread over the relevance scores of the query, [0, 1] without any
+        max_score = max(relevance_scores, default=1.0)
+        min_score = min(relevance_scores, default=0.0)
+
+        scored_documents = []
+        for dataset, documents in results:
+            for rank, document in enumerate(documents):
+                if dataset.indexing_technique == "economy":
+                    score = None
+                    normalized_score = max_score - (max_score - min_score) * rank / max(len(documents) - 1, 1)
+                else:
+                    score = document.metadata['score']
+                    normalized_score = min(max(score, 0.0), 1.0)
+
+                scored_documents.append((normalized_score, score, dataset.id, document))
+
+        # on equal normalized scores, vector matches first
+        return sorted(scored_documents, key=lambda item: (item[0], item[1] is not None), reverse=True)
+
+    @staticmethod
+    def _retrieve(flask_app: Flask, tool: DatasetRetrieverTool, query: str,
+                  embedding_context: QueryEmbeddingContext) -> Tuple[Optional[Dataset], List[Document]]:
+        with flask_app.app_context():
+            dataset = dataset_metadata_cache.get(tool.tenant_id, tool.dataset_id)
+            if not dataset:
+                return None, []
+
+            try:
+                return dataset, tool.retrieve(dataset, query, embedding_context)
+            except (LLMBadRequestError, ProviderTokenNotInitError):
+                return dataset, []
+            except Exception:
+                logging.exception("retrieve dataset %s failed", dataset.id)
+                return dataset, []
+
+    async def _arun(self, tool_input: str) -> str:
+        raise NotImplementedError()
@@ -1,19 +1,21 @@
 import json
-from typing import Type, Optional
+from typing import Type, Optional, List
 
 from flask import current_app
+from langchain.schema import Document
 from langchain.tools import BaseTool
 from pydantic import Field, BaseModel
 
 from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
 from core.conversation_message_task import ConversationMessageTask
 from core.embedding.cached_embedding import CacheEmbedding
+from core.embedding.query_embedding_context import QueryEmbeddingContext
 from core.index.keyword_table_index.keyword_table_index import KeywordTableIndex, KeywordTableConfig
 from core.index.vector_index.vector_index import VectorIndex
 from core.model_providers.error import LLMBadRequestError, ProviderTokenNotInitError
 from core.model_providers.model_factory import ModelFactory
-from extensions.ext_database import db
-from models.dataset import Dataset, DocumentSegment, Document
+from core.tool.dataset_hydrator import dataset_metadata_cache, hydrate_segments, SegmentDocument
+from models.dataset import Dataset, DocumentSegment
 
 
 class DatasetRetrieverToolInput(BaseModel):
@@ -50,60 +52,22 @@ class DatasetRetrieverTool(BaseTool):
         )
 
     def _run(self, query: str) -> str:
-        dataset = db.session.query(Dataset).filter(
-            Dataset.tenant_id == self.tenant_id,
-            Dataset.id == self.dataset_id
-        ).first()
+        dataset = dataset_metadata_cache.get(self.tenant_id, self.dataset_id)
 
         if not dataset:
             return f'[{self.name} failed to find dataset with id {self.dataset_id}.]'
 
         if dataset.indexing_technique == "economy":
-            # use keyword table query
-            kw_table_index = KeywordTableIndex(
-                dataset=dataset,
-                config=KeywordTableConfig(
-                    max_keywords_per_chunk=5
-                )
-            )
-
-            documents = kw_table_index.search(query, search_kwargs={'k': self.top_k})
+            documents = self.retrieve(dataset, query)
             return str("\n".join([document.page_content for document in documents]))
         else:
-
             try:
-                embedding_model = ModelFactory.get_embedding_model(
-                    tenant_id=dataset.tenant_id,
-                    model_provider_name=dataset.embedding_model_provider,
-                    model_name=dataset.embedding_model
-                )
+                documents = self.retrieve(dataset, query)
             except LLMBadRequestError:
                 return ''
             except ProviderTokenNotInitError:
                 return ''
 
-            embeddings = CacheEmbedding(embedding_model)
-            vector_index = VectorIndex(
-                dataset=dataset,
-                config=current_app.config,
-                embeddings=embeddings
-            )
-
-            if self.top_k > 0:
-                documents = vector_index.search(
-                    query,
-                    search_type='similarity_score_threshold',
-                    search_kwargs={
-                        'k': self.top_k,
-                        'score_threshold': self.score_threshold,
-                        'filter': {
-                            'group_id': [dataset.id]
-                        }
-                    }
-                )
-            else:
-                documents = []
-
             hit_callback = DatasetIndexToolCallbackHandler(dataset.id, self.conversation_message_task)
             hit_callback.on_tool_end(documents)
             document_score_list = {}
@@ -112,59 +76,105 @@ class DatasetRetrieverTool(BaseTool):
                     document_score_list[item.metadata['doc_id']] = item.metadata['score']
             document_context_list = []
             index_node_ids = [document.metadata['doc_id'] for document in documents]
-            segments = DocumentSegment.query.filter(DocumentSegment.dataset_id == self.dataset_id,
-                                                    DocumentSegment.completed_at.isnot(None),
-                                                    DocumentSegment.status == 'completed',
-                                                    DocumentSegment.enabled == True,
-                                                    DocumentSegment.index_node_id.in_(index_node_ids)
-                                                    ).all()
+            segments = hydrate_segments([self.dataset_id], index_node_ids, with_documents=self.return_resource)
 
             if segments:
-                index_node_id_to_position = {id: position for position, id in enumerate(index_node_ids)}
-                sorted_segments = sorted(segments,
-                                         key=lambda segment: index_node_id_to_position.get(segment.index_node_id,
-                                                                                           float('inf')))
-                for segment in sorted_segments:
-                    if segment.answer:
-                        document_context_list.append(f'question:{segment.content} answer:{segment.answer}')
-                    else:
-                        document_context_list.append(segment.content)
+                for segment, _ in segments:
+                    document_context_list.append(self.to_context(segment))
                 if self.return_resource:
                     context_list = []
                     resource_number = 1
-                    for segment in sorted_segments:
-                        context = {}
-                        document = Document.query.filter(Document.id == segment.document_id,
-                                                         Document.enabled == True,
-                                                         Document.archived == False,
-                                                         ).first()
-                        if dataset and document:
-                            source = {
-                                'position': resource_number,
-                                'dataset_id': dataset.id,
-                                'dataset_name': dataset.name,
-                                'document_id': document.id,
-                                'document_name': document.name,
-                                'data_source_type': document.data_source_type,
-                                'segment_id': segment.id,
-                                'retriever_from': self.retriever_from
-                            }
-                            if dataset.indexing_technique != "economy":
-                                source['score'] = document_score_list.get(segment.index_node_id)
-                            if self.retriever_from == 'dev':
-                                source['hit_count'] = segment.hit_count
-                                source['word_count'] = segment.word_count
-                                source['segment_position'] = segment.position
-                                source['index_node_hash'] = segment.index_node_hash
-                            if segment.answer:
-                                source['content'] = f'question:{segment.content} \nanswer:{segment.answer}'
-                            else:
-                                source['content'] = segment.content
-                            context_list.append(source)
+                    for segment, document in segments:
+                        if document:
+                            context_list.append(self.to_resource(
+                                resource_number, dataset, segment, document,
+                                document_score_list.get(segment.index_node_id), self.retriever_from
+                            ))
                         resource_number += 1
                     hit_callback.return_retriever_resource_info(context_list)
 
             return str("\n".join(document_context_list))
 
+    def retrieve(self, dataset: Dataset, query: str,
+                 embedding_context: Optional[QueryEmbeddingContext] = None) -> List[Document]:
+        """
+        Search the index of the dataset, best match first.
+        Documents of a high quality dataset carry their similarity in metadata['score'].
+
+        :param embedding_context: query vectors shared with the searches of other datasets in the same request
+        """
+        if dataset.indexing_technique == "economy":
+            # use keyword table query
+            kw_table_index = KeywordTableIndex(
+                dataset=dataset,
+                config=KeywordTableConfig(
+                    max_keywords_per_chunk=5
+                )
+            )
+
+            return kw_table_index.search(query, search_kwargs={'k': self.top_k})
+
+        embedding_model = ModelFactory.get_embedding_model(
+            tenant_id=dataset.tenant_id,
+            model_provider_name=dataset.embedding_model_provider,
+            model_name=dataset.embedding_model
+        )
+
+        embeddings = CacheEmbedding(embedding_model)
+        vector_index = VectorIndex(
+            dataset=dataset,
+            config=current_app.config,
+            embeddings=embeddings
+        )
+
+        if self.top_k <= 0:
+            return []
+
+        embedding_context = embedding_context or QueryEmbeddingContext()
+        return vector_index.search_by_vector(
+            embedding_context.embed_query(embeddings, query),
+            search_kwargs={
+                'k': self.top_k,
+                'score_threshold': self.score_threshold,
+                'filter': {
+                    'group_id': [dataset.id]
+                }
+            }
+        )
+
+    @staticmethod
+    def to_context(segment: DocumentSegment) -> str:
+        if segment.answer:
+            return f'question:{segment.content} answer:{segment.answer}'
+
+        return segment.content
+
+    @staticmethod
+    def to_resource(position: int, dataset: Dataset, segment: DocumentSegment, document: SegmentDocument,
+                    score: Optional[float], retriever_from: str) -> dict:
+        source = {
+            'position': position,
+            'dataset_id': dataset.id,
+            'dataset_name': dataset.name,
+            'document_id': document.id,
+            'document_name': document.name,
+            'data_source_type': document.data_source_type,
+            'segment_id': segment.id,
+            'retriever_from': retriever_from
+        }
+        if dataset.indexing_technique != "economy":
+            source['score'] = score
+        if retriever_from == 'dev':
+            source['hit_count'] = segment.hit_count
+            source['word_count'] = segment.word_count
+            source['segment_position'] = segment.position
+            source['index_node_hash'] = segment.index_node_hash
+        if segment.answer:
+            source['content'] = f'question:{segment.content} \nanswer:{segment.answer}'
+        else:
+            source['content'] = segment.content
+
+        return source
+
     async def _arun(self, tool_input: str) -> str:
         raise NotImplementedError()
@@ -1,7 +1,24 @@
+from typing import List, Any, Tuple
+
+from langchain.schema import Document
+
 from core.index.vector_index.milvus import Milvus
 
 
 class MilvusVectorStore(Milvus):
+    def similarity_search_with_relevance_scores_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            with_vectors: bool = False,
+            **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search with an embedded query, scores are the ones similarity_search_with_relevance_scores returns.
+        Vectors are not returned by milvus searches, with_vectors is ignored.
+        """
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
     def del_texts(self, where_filter: dict):
         if not where_filter:
             raise ValueError('where_filter must not be empty')
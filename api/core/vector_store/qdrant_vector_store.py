@@ -1,4 +1,4 @@
-from typing import cast, Any
+from typing import cast, Any, List, Tuple, Optional
 
 from langchain.schema import Document
 from qdrant_client.http.models import Filter, PointIdsList, FilterSelector
@@ -51,6 +51,45 @@ class QdrantVectorStore(Qdrant):
 
         self.client.delete_collection(collection_name=self.collection_name)
 
+    def similarity_search_with_relevance_scores_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            filter: Optional[Any] = None,
+            with_vectors: bool = False,
+            **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search with an embedded query, scores are the ones similarity_search_with_relevance_scores returns.
+        The vector of each document is put in its metadata['vector'] when with_vectors is set.
+        """
+        if isinstance(filter, dict):
+            filter = self._qdrant_filter_from_dict(filter)
+
+        query_vector = embedding
+        if self.vector_name is not None:
+            query_vector = (self.vector_name, embedding)
+
+        results = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=query_vector,
+            query_filter=filter,
+            limit=k,
+            with_payload=True,
+            with_vectors=with_vectors,
+            **kwargs
+        )
+
+        docs_and_scores = []
+        for result in results:
+            doc = self._document_from_scored_point(result, self.content_payload_key, self.metadata_payload_key)
+            if with_vectors:
+                doc.metadata['vector'] = result.vector[self.vector_name] if self.vector_name else result.vector
+
+            docs_and_scores.append((doc, result.score))
+
+        return docs_and_scores
+
     @classmethod
     def _document_from_scored_point(
             cls,
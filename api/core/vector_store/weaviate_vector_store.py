@@ -1,3 +1,7 @@
+from typing import List, Any, Tuple
+
+import numpy as np
+from langchain.schema import Document
 from langchain.vectorstores import Weaviate
 
 
@@ -36,3 +40,37 @@ class WeaviateVectorStore(Weaviate):
 
     def delete(self):
         self._client.schema.delete_class(self._index_name)
+
+    def similarity_search_with_relevance_scores_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            with_vectors: bool = False,
+            **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search with an embedded query, scores are the ones similarity_search_with_relevance_scores returns.
+        The vector of each document is put in its metadata['vector'] when with_vectors is set.
+        """
+        query_obj = self._client.query.get(self._index_name, self._query_attrs)
+        if kwargs.get("where_filter"):
+            query_obj = query_obj.with_where(kwargs.get("where_filter"))
+
+        result = query_obj.with_near_vector({"vector": embedding}).with_limit(k).with_additional("vector").do()
+        if "errors" in result:
+            raise ValueError(f"Error during query: {result['errors']}")
+
+        relevance_score_fn = self._select_relevance_score_fn()
+        docs_and_scores = []
+        for res in result["data"]["Get"][self._index_name]:
+            text = res.pop(self._text_key)
+            vector = res.pop("_additional")["vector"]
+            if with_vectors:
+                res['vector'] = vector
+
+            docs_and_scores.append((
+                Document(page_content=text, metadata=res),
+                relevance_score_fn(np.dot(vector, embedding))
+            ))
+
+        return docs_and_scores
@@ -69,6 +69,8 @@ document_status_fields = {
     'stopped_at': TimestampField,
     'completed_segments': fields.Integer,
     'total_segments': fields.Integer,
+    'qa_completed_chunks': fields.Integer,
+    'qa_total_chunks': fields.Integer,
 }
 
 document_status_fields_list = {
@@ -0,0 +1,93 @@
+# -*- coding:utf-8 -*-
+from typing import Any
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict, used for parsed json values that are shared between callers.
+
+    It is still a dict, so it can be passed to json.dumps or pydantic models as is,
+    copy() returns a mutable deep copy for callers that need to change it.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('{} is read-only, use copy() to get a mutable copy'.format(type(self).__name__))
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def copy(self) -> dict:
+        return thaw(self)
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo) -> dict:
+        return thaw(self)
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """
+    Read-only list, see FrozenDict.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('{} is read-only, use copy() to get a mutable copy'.format(type(self).__name__))
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __iadd__ = _readonly
+    __imul__ = _readonly
+    append = _readonly
+    clear = _readonly
+    extend = _readonly
+    insert = _readonly
+    pop = _readonly
+    remove = _readonly
+    reverse = _readonly
+    sort = _readonly
+
+    def copy(self) -> list:
+        return thaw(self)
+
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __deepcopy__(self, memo) -> list:
+        return thaw(self)
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(value: Any) -> Any:
+    """
+    Recursively convert the dicts and lists of a parsed json value to their read-only variants.
+    """
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    elif isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """
+    Recursively copy a (frozen) json value into plain, mutable dicts and lists.
+    """
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [thaw(item) for item in value]
+
+    return value
@@ -1,7 +1,36 @@
 # -*- coding:utf-8 -*-
+from typing import Optional
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
 
 class InfiniteScrollPagination:
     def __init__(self, data, limit, has_more):
         self.data = data
         self.limit = limit
         self.has_more = has_more
+
+    @classmethod
+    def paginate(cls, query: Query, model, limit: int, cursor: Optional[object] = None) -> 'InfiniteScrollPagination':
+        """
+        Keyset pagination over (created_at, id) in descending order, newest first.
+
+        Rows older than the cursor row are fetched with limit + 1, the extra row only tells
+        whether there is a next page, so no COUNT over the remaining rows is needed.
+
+        :param query: base query of model, with all filters applied
+        :param model: model with created_at and id columns
+        :param limit: page size
+        :param cursor: last row of the previous page, None for the first page
+        """
+        if cursor is not None:
+            query = query.filter(tuple_(model.created_at, model.id) < tuple_(cursor.created_at, cursor.id))
+
+        items = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+        return cls(
+            data=items[:limit],
+            limit=limit,
+            has_more=len(items) > limit
+        )
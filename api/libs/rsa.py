@@ -1,13 +1,20 @@
 # -*- coding:utf-8 -*-
 import hashlib
+import threading
 
+from cachetools import TTLCache
 from Crypto.Cipher import PKCS1_OAEP, AES
 from Crypto.PublicKey import RSA
 from Crypto.Random import get_random_bytes
+from flask import current_app
 
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
 
+_cache_lock = threading.Lock()
+_private_key_cache = None
+_decrypted_text_cache = None
+
 
 def generate_key_pair(tenant_id):
     private_key = RSA.generate(2048)
@@ -16,9 +23,10 @@ def generate_key_pair(tenant_id):
     pem_private = private_key.export_key()
     pem_public = public_key.export_key()
 
-    filepath = "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
+    filepath = _get_private_key_filepath(tenant_id)
 
     storage.save(filepath, pem_private)
+    _drop_private_key(tenant_id)
 
     return pem_public.decode()
 
@@ -46,19 +54,43 @@ def encrypt(text, public_key):
 
 
 def decrypt(encrypted_text, tenant_id):
-    filepath = "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
+    return decrypt_batch([encrypted_text], tenant_id)[0]
+
+
+def decrypt_batch(encrypted_texts, tenant_id):
+    """
+    Decrypt several texts of a tenant at once, the private key is loaded at most once
+    and texts decrypted recently are served from the in-process cache.
+    """
+    cache = _get_decrypted_text_cache()
+    cache_keys = [_get_decrypted_text_cache_key(encrypted_text, tenant_id) for encrypted_text in encrypted_texts]
+
+    with _cache_lock:
+        decrypted_texts = [cache.get(cache_key) for cache_key in cache_keys]
+
+    rsa_key = None
+    for i, encrypted_text in enumerate(encrypted_texts):
+        if decrypted_texts[i] is not None:
+            continue
+
+        if rsa_key is None:
+            rsa_key = _get_private_key(tenant_id)
 
-    cache_key = 'tenant_privkey:{hash}'.format(hash=hashlib.sha3_256(filepath.encode()).hexdigest())
-    private_key = redis_client.get(cache_key)
-    if not private_key:
         try:
-            private_key = storage.load(filepath)
-        except FileNotFoundError:
-            raise PrivkeyNotFoundError("Private key not found, tenant_id: {tenant_id}".format(tenant_id=tenant_id))
+            decrypted_texts[i] = _decrypt(encrypted_text, rsa_key)
+        except ValueError:
+            # the key pair may have been reset since the private key was cached
+            _drop_private_key(tenant_id)
+            rsa_key = _get_private_key(tenant_id)
+            decrypted_texts[i] = _decrypt(encrypted_text, rsa_key)
 
-        redis_client.setex(cache_key, 120, private_key)
+        with _cache_lock:
+            cache[cache_keys[i]] = decrypted_texts[i]
 
-    rsa_key = RSA.import_key(private_key)
+    return decrypted_texts
+
+
+def _decrypt(encrypted_text, rsa_key):
     cipher_rsa = PKCS1_OAEP.new(rsa_key)
 
     if encrypted_text.startswith(prefix_hybrid):
@@ -79,5 +111,83 @@ def decrypt(encrypted_text, tenant_id):
     return decrypted_text.decode()
 
 
+def _get_private_key(tenant_id):
+    cache = _get_private_key_cache()
+
+    with _cache_lock:
+        rsa_key = cache.get(tenant_id)
+
+    if rsa_key is not None:
+        return rsa_key
+
+    cache_key = _get_private_key_redis_cache_key(tenant_id)
+    private_key = redis_client.get(cache_key)
+    if not private_key:
+        try:
+            private_key = storage.load(_get_private_key_filepath(tenant_id))
+        except FileNotFoundError:
+            raise PrivkeyNotFoundError("Private key not found, tenant_id: {tenant_id}".format(tenant_id=tenant_id))
+
+        redis_client.setex(cache_key, 120, private_key)
+
+    rsa_key = RSA.import_key(private_key)
+
+    with _cache_lock:
+        cache[tenant_id] = rsa_key
+
+    return rsa_key
+
+
+def _drop_private_key(tenant_id):
+    redis_client.delete(_get_private_key_redis_cache_key(tenant_id))
+
+    with _cache_lock:
+        if _private_key_cache is not None:
+            _private_key_cache.pop(tenant_id, None)
+
+
+def _get_private_key_cache() -> TTLCache:
+    global _private_key_cache
+
+    if _private_key_cache is None:
+        with _cache_lock:
+            if _private_key_cache is None:
+                _private_key_cache = TTLCache(
+                    maxsize=int(current_app.config.get('RSA_PRIVATE_KEY_CACHE_SIZE')),
+                    ttl=int(current_app.config.get('RSA_PRIVATE_KEY_CACHE_TTL'))
+                )
+
+    return _private_key_cache
+
+
+def _get_decrypted_text_cache() -> TTLCache:
+    global _decrypted_text_cache
+
+    if _decrypted_text_cache is None:
+        with _cache_lock:
+            if _decrypted_text_cache is None:
+                _decrypted_text_cache = TTLCache(
+                    maxsize=int(current_app.config.get('DECRYPTED_TOKEN_CACHE_SIZE')),
+                    ttl=int(current_app.config.get('DECRYPTED_TOKEN_CACHE_TTL'))
+                )
+
+    return _decrypted_text_cache
+
+
+def _get_decrypted_text_cache_key(encrypted_text, tenant_id):
+    # only a digest of the ciphertext is kept, the tenant is part of the key so
+    # a ciphertext can never be served to a tenant whose key did not encrypt it
+    return tenant_id, hashlib.sha256(encrypted_text).digest()
+
+
+def _get_private_key_filepath(tenant_id):
+    return "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
+
+
+def _get_private_key_redis_cache_key(tenant_id):
+    filepath = _get_private_key_filepath(tenant_id)
+    return 'tenant_privkey:{hash}'.format(hash=hashlib.sha3_256(filepath.encode()).hexdigest())
+
+
 class PrivkeyNotFoundError(Exception):
     pass
@@ -2,6 +2,7 @@ import json
 import pickle
 from json import JSONDecodeError
 
+import numpy as np
 from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -430,6 +431,22 @@ class DatasetKeywordTable(db.Model):
         return json.loads(self.keyword_table, cls=SetDecoder) if self.keyword_table else None
 
 
+class DatasetKeywordPosting(db.Model):
+    __tablename__ = 'dataset_keyword_postings'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='dataset_keyword_posting_pkey'),
+        db.UniqueConstraint('dataset_id', 'keyword', 'index_node_id', name='dataset_keyword_posting_unique_idx'),
+        db.Index('dataset_keyword_posting_node_idx', 'dataset_id', 'index_node_id'),
+    )
+
+    id = db.Column(UUID, primary_key=True, server_default=db.text('uuid_generate_v4()'))
+    dataset_id = db.Column(UUID, nullable=False)
+    keyword = db.Column(db.String(255), nullable=False)
+    index_node_id = db.Column(db.String(255), nullable=False)
+    term_frequency = db.Column(db.Integer, nullable=False, server_default=db.text('1'))
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
 class Embedding(db.Model):
     __tablename__ = 'embeddings'
     __table_args__ = (
@@ -444,11 +461,44 @@ class Embedding(db.Model):
     embedding = db.Column(db.LargeBinary, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
 
-    def set_embedding(self, embedding_data: list[float]):
-        self.embedding = pickle.dumps(embedding_data, protocol=pickle.HIGHEST_PROTOCOL)
+    # The first byte of the stored embedding is the storage format version,
+    # followed by the raw little-endian vector. Legacy rows hold pickled lists,
+    # which always start with the pickle PROTO opcode (0x80).
+    STORAGE_FORMAT_VERSIONS = {
+        'float32': (1, '<f4'),
+        'float16': (2, '<f2'),
+    }
+    STORAGE_FORMAT_DTYPES = {version: dtype for version, dtype in STORAGE_FORMAT_VERSIONS.values()}
+    LEGACY_PICKLE_PREFIX = 0x80
+
+    def set_embedding(self, embedding_data: list[float], storage_format: str = 'float32'):
+        self.embedding = self.encode_embedding(embedding_data, storage_format)
 
     def get_embedding(self) -> list[float]:
-        return pickle.loads(self.embedding)
+        return self.get_embedding_array().tolist()
+
+    def get_embedding_array(self) -> np.ndarray:
+        return self.decode_embedding(self.embedding)
+
+    @property
+    def is_legacy_format(self) -> bool:
+        return self.embedding[0] == self.LEGACY_PICKLE_PREFIX
+
+    @classmethod
+    def encode_embedding(cls, embedding_data, storage_format: str = 'float32') -> bytes:
+        if storage_format not in cls.STORAGE_FORMAT_VERSIONS:
+            raise ValueError('Unsupported embedding storage format: {}'.format(storage_format))
+
+        version, dtype = cls.STORAGE_FORMAT_VERSIONS[storage_format]
+        return bytes([version]) + np.asarray(embedding_data, dtype=dtype).tobytes()
+
+    @classmethod
+    def decode_embedding(cls, data: bytes) -> np.ndarray:
+        dtype = cls.STORAGE_FORMAT_DTYPES.get(data[0])
+        if dtype is None:
+            return np.asarray(pickle.loads(data))
+
+        return np.frombuffer(data, dtype=dtype, offset=1).astype(np.float32, copy=False)
 
 
 class DatasetCollectionBinding(db.Model):
@@ -1,15 +1,51 @@
+import functools
 import json
+import threading
+from collections import defaultdict
 
+from cachetools import LRUCache
 from flask import current_app, request
 from flask_login import UserMixin
 from sqlalchemy.dialects.postgresql import UUID
 
 from core.file.upload_file_parser import UploadFileParser
+from libs.frozen import freeze, thaw
 from libs.helper import generate_string
 from extensions.ext_database import db
 from .account import Account, Tenant
 
 
+def preloadable(func):
+    """
+    Make a per row property return the value set by a batched loader, if any,
+    instead of running its own query. See Message.preload_properties and Conversation.preload_properties.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self):
+        preloaded_properties = self.__dict__.get('_preloaded_properties')
+        if preloaded_properties is not None and name in preloaded_properties:
+            return preloaded_properties[name]
+
+        return func(self)
+
+    return wrapper
+
+
+def set_preloaded_property(instance, name: str, value):
+    instance.__dict__.setdefault('_preloaded_properties', {})[name] = value
+
+
+def _get_accounts_by_ids(account_ids: list) -> dict:
+    account_ids = {account_id for account_id in account_ids if account_id}
+    if not account_ids:
+        return {}
+
+    return {str(account.id): account for account in
+            db.session.query(Account).filter(Account.id.in_(account_ids)).all()}
+
+
 class DifySetup(db.Model):
     __tablename__ = 'dify_setups'
     __table_args__ = (
@@ -67,6 +103,10 @@ class App(db.Model):
         return tenant
 
 
+_parsed_app_model_config_cache = None
+_parsed_app_model_config_cache_lock = threading.Lock()
+
+
 class AppModelConfig(db.Model):
     __tablename__ = 'app_model_configs'
     __table_args__ = (
@@ -105,69 +145,99 @@ class AppModelConfig(db.Model):
         app = db.session.query(App).filter(App.id == self.app_id).first()
         return app
 
+    def _get_parsed_column(self, column: str, default):
+        """
+        Parse a json column once per process and share the read-only result.
+
+        App model configs are append-only versions, so the parsed value is cached per (id, column).
+        The raw text is kept with the entry because unsaved and override configs may reuse an id
+        with a different content, those never hit a stale entry.
+        """
+        global _parsed_app_model_config_cache
+
+        raw = getattr(self, column)
+        if not raw:
+            return freeze(default)
+
+        if _parsed_app_model_config_cache is None:
+            with _parsed_app_model_config_cache_lock:
+                if _parsed_app_model_config_cache is None:
+                    _parsed_app_model_config_cache = LRUCache(
+                        maxsize=int(current_app.config.get('APP_MODEL_CONFIG_CACHE_SIZE'))
+                    )
+
+        cache_key = (self.id, column)
+        with _parsed_app_model_config_cache_lock:
+            cached = _parsed_app_model_config_cache.get(cache_key)
+
+        if cached is not None and cached[0] == raw:
+            return cached[1]
+
+        value = freeze(json.loads(raw))
+        if self.id:
+            with _parsed_app_model_config_cache_lock:
+                _parsed_app_model_config_cache[cache_key] = (raw, value)
+
+        return value
+
     @property
     def model_dict(self) -> dict:
-        return json.loads(self.model) if self.model else None
+        return self._get_parsed_column('model', None)
 
     @property
     def suggested_questions_list(self) -> list:
-        return json.loads(self.suggested_questions) if self.suggested_questions else []
+        return self._get_parsed_column('suggested_questions', [])
 
     @property
     def suggested_questions_after_answer_dict(self) -> dict:
-        return json.loads(self.suggested_questions_after_answer) if self.suggested_questions_after_answer \
-            else {"enabled": False}
+        return self._get_parsed_column('suggested_questions_after_answer', {"enabled": False})
 
     @property
     def speech_to_text_dict(self) -> dict:
-        return json.loads(self.speech_to_text) if self.speech_to_text \
-            else {"enabled": False}
+        return self._get_parsed_column('speech_to_text', {"enabled": False})
 
     @property
     def retriever_resource_dict(self) -> dict:
-        return json.loads(self.retriever_resource) if self.retriever_resource \
-            else {"enabled": False}
+        return self._get_parsed_column('retriever_resource', {"enabled": False})
 
     @property
     def more_like_this_dict(self) -> dict:
-        return json.loads(self.more_like_this) if self.more_like_this else {"enabled": False}
+        return self._get_parsed_column('more_like_this', {"enabled": False})
 
     @property
     def sensitive_word_avoidance_dict(self) -> dict:
-        return json.loads(self.sensitive_word_avoidance) if self.sensitive_word_avoidance \
-            else {"enabled": False, "type": "", "configs": []}
+        return self._get_parsed_column('sensitive_word_avoidance', {"enabled": False, "type": "", "configs": []})
 
     @property
     def external_data_tools_list(self) -> list[dict]:
-        return json.loads(self.external_data_tools) if self.external_data_tools \
-            else []
+        return self._get_parsed_column('external_data_tools', [])
 
     @property
     def user_input_form_list(self) -> dict:
-        return json.loads(self.user_input_form) if self.user_input_form else []
+        return self._get_parsed_column('user_input_form', [])
 
     @property
     def agent_mode_dict(self) -> dict:
-        return json.loads(self.agent_mode) if self.agent_mode else {"enabled": False, "strategy": None, "tools": []}
+        return self._get_parsed_column('agent_mode', {"enabled": False, "strategy": None, "tools": []})
 
     @property
     def chat_prompt_config_dict(self) -> dict:
-        return json.loads(self.chat_prompt_config) if self.chat_prompt_config else {}
+        return self._get_parsed_column('chat_prompt_config', {})
 
     @property
     def completion_prompt_config_dict(self) -> dict:
-        return json.loads(self.completion_prompt_config) if self.completion_prompt_config else {}
+        return self._get_parsed_column('completion_prompt_config', {})
 
     @property
     def dataset_configs_dict(self) -> dict:
-        return json.loads(self.dataset_configs) if self.dataset_configs else {"top_k": 2, "score_threshold": {"enable": False}}
+        return self._get_parsed_column('dataset_configs', {"top_k": 2, "score_threshold": {"enable": False}})
 
     @property
     def file_upload_dict(self) -> dict:
-        return json.loads(self.file_upload) if self.file_upload else {"image": {"enabled": False, "number_limits": 3, "detail": "high", "transfer_methods": ["remote_url", "local_file"]}}
+        return self._get_parsed_column('file_upload', {"image": {"enabled": False, "number_limits": 3, "detail": "high", "transfer_methods": ["remote_url", "local_file"]}})
 
     def to_dict(self) -> dict:
-        return {
+        return thaw({
             "provider": "",
             "model_id": "",
             "configs": {},
@@ -189,7 +259,7 @@ class AppModelConfig(db.Model):
             "completion_prompt_config": self.completion_prompt_config_dict,
             "dataset_configs": self.dataset_configs_dict,
             "file_upload": self.file_upload_dict
-        }
+        })
 
     def from_model_config_dict(self, model_config: dict):
         self.provider = ""
@@ -345,7 +415,16 @@ class Conversation(db.Model):
     is_deleted = db.Column(db.Boolean, nullable=False, server_default=db.text('false'))
 
     @property
+    @preloadable
     def model_config(self):
+        app_model_config = None
+        if not self.override_model_configs:
+            app_model_config = db.session.query(AppModelConfig).filter(
+                AppModelConfig.id == self.app_model_config_id).first()
+
+        return self._build_model_config(app_model_config)
+
+    def _build_model_config(self, app_model_config: 'AppModelConfig') -> dict:
         model_config = {}
         if self.override_model_configs:
             override_model_configs = json.loads(self.override_model_configs)
@@ -357,9 +436,6 @@ class Conversation(db.Model):
             else:
                 model_config['configs'] = override_model_configs
         else:
-            app_model_config = db.session.query(AppModelConfig).filter(
-                AppModelConfig.id == self.app_model_config_id).first()
-
             model_config = app_model_config.to_dict()
 
         model_config['model_id'] = self.model_id
@@ -379,18 +455,22 @@ class Conversation(db.Model):
                 return ''
 
     @property
+    @preloadable
     def annotated(self):
         return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).count() > 0
 
     @property
+    @preloadable
     def annotation(self):
         return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).first()
 
     @property
+    @preloadable
     def message_count(self):
         return db.session.query(Message).filter(Message.conversation_id == self.id).count()
 
     @property
+    @preloadable
     def user_feedback_stats(self):
         like = db.session.query(MessageFeedback) \
             .filter(MessageFeedback.conversation_id == self.id,
@@ -405,6 +485,7 @@ class Conversation(db.Model):
         return {'like': like, 'dislike': dislike}
 
     @property
+    @preloadable
     def admin_feedback_stats(self):
         like = db.session.query(MessageFeedback) \
             .filter(MessageFeedback.conversation_id == self.id,
@@ -419,6 +500,7 @@ class Conversation(db.Model):
         return {'like': like, 'dislike': dislike}
 
     @property
+    @preloadable
     def first_message(self):
         return db.session.query(Message).filter(Message.conversation_id == self.id).first()
 
@@ -427,6 +509,7 @@ class Conversation(db.Model):
         return db.session.query(App).filter(App.id == self.app_id).first()
 
     @property
+    @preloadable
     def from_end_user_session_id(self):
         if self.from_end_user_id:
             end_user = db.session.query(EndUser).filter(EndUser.id == self.from_end_user_id).first()
@@ -439,6 +522,93 @@ class Conversation(db.Model):
     def in_debug_mode(self):
         return self.override_model_configs is not None
 
+    @classmethod
+    def preload_properties(cls, conversations: list['Conversation']):
+        """
+        Load the per conversation properties used by the conversation list apis with one query per relation,
+        so that serializing a page does not run a set of queries for every conversation.
+        """
+        if not conversations:
+            return
+
+        conversation_ids = [conversation.id for conversation in conversations]
+
+        annotations = {}
+        for annotation in db.session.query(MessageAnnotation) \
+                .filter(MessageAnnotation.conversation_id.in_(conversation_ids)).all():
+            annotations.setdefault(str(annotation.conversation_id), annotation)
+
+        MessageAnnotation.preload_properties(list(annotations.values()))
+
+        message_counts = {
+            str(conversation_id): count for conversation_id, count in
+            db.session.query(Message.conversation_id, db.func.count(Message.id))
+            .filter(Message.conversation_id.in_(conversation_ids))
+            .group_by(Message.conversation_id).all()
+        }
+
+        feedback_counts = db.session.query(
+            MessageFeedback.conversation_id, MessageFeedback.from_source, MessageFeedback.rating,
+            db.func.count(MessageFeedback.id)
+        ).filter(MessageFeedback.conversation_id.in_(conversation_ids)) \
+            .group_by(MessageFeedback.conversation_id, MessageFeedback.from_source, MessageFeedback.rating).all()
+
+        feedback_stats = defaultdict(lambda: {'like': 0, 'dislike': 0})
+        for conversation_id, from_source, rating, count in feedback_counts:
+            if rating in ('like', 'dislike'):
+                feedback_stats[(str(conversation_id), from_source)][rating] = count
+
+        first_message_created_at = db.session.query(
+            Message.conversation_id, db.func.min(Message.created_at).label('created_at')
+        ).filter(Message.conversation_id.in_(conversation_ids)).group_by(Message.conversation_id).subquery()
+
+        first_messages = {}
+        for message in db.session.query(Message).join(
+                first_message_created_at,
+                db.and_(Message.conversation_id == first_message_created_at.c.conversation_id,
+                        Message.created_at == first_message_created_at.c.created_at)
+        ).all():
+            first_messages.setdefault(str(message.conversation_id), message)
+
+        app_model_config_ids = {conversation.app_model_config_id for conversation in conversations
+                                if not conversation.override_model_configs}
+        app_model_configs = {}
+        if app_model_config_ids:
+            app_model_configs = {
+                str(app_model_config.id): app_model_config for app_model_config in
+                db.session.query(AppModelConfig).filter(AppModelConfig.id.in_(app_model_config_ids)).all()
+            }
+
+        end_user_ids = {conversation.from_end_user_id for conversation in conversations
+                        if conversation.from_end_user_id}
+        end_user_session_ids = {}
+        if end_user_ids:
+            end_user_session_ids = {
+                str(end_user_id): session_id for end_user_id, session_id in
+                db.session.query(EndUser.id, EndUser.session_id).filter(EndUser.id.in_(end_user_ids)).all()
+            }
+
+        for conversation in conversations:
+            conversation_id = str(conversation.id)
+            annotation = annotations.get(conversation_id)
+
+            set_preloaded_property(conversation, 'annotation', annotation)
+            set_preloaded_property(conversation, 'annotated', annotation is not None)
+            set_preloaded_property(conversation, 'message_count', message_counts.get(conversation_id, 0))
+            set_preloaded_property(conversation, 'user_feedback_stats',
+                                   dict(feedback_stats[(conversation_id, 'user')]))
+            set_preloaded_property(conversation, 'admin_feedback_stats',
+                                   dict(feedback_stats[(conversation_id, 'admin')]))
+            set_preloaded_property(conversation, 'first_message', first_messages.get(conversation_id))
+            set_preloaded_property(conversation, 'from_end_user_session_id',
+                                   end_user_session_ids.get(str(conversation.from_end_user_id)))
+
+            if conversation.override_model_configs \
+                    or str(conversation.app_model_config_id) in app_model_configs:
+                set_preloaded_property(conversation, 'model_config', conversation._build_model_config(
+                    app_model_configs.get(str(conversation.app_model_config_id))
+                ))
+
 
 class Message(db.Model):
     __tablename__ = 'messages'
@@ -477,23 +647,27 @@ class Message(db.Model):
     agent_based = db.Column(db.Boolean, nullable=False, server_default=db.text('false'))
 
     @property
+    @preloadable
     def user_feedback(self):
         feedback = db.session.query(MessageFeedback).filter(MessageFeedback.message_id == self.id,
                                                             MessageFeedback.from_source == 'user').first()
         return feedback
 
     @property
+    @preloadable
     def admin_feedback(self):
         feedback = db.session.query(MessageFeedback).filter(MessageFeedback.message_id == self.id,
                                                             MessageFeedback.from_source == 'admin').first()
         return feedback
 
     @property
+    @preloadable
     def feedbacks(self):
         feedbacks = db.session.query(MessageFeedback).filter(MessageFeedback.message_id == self.id).all()
         return feedbacks
 
     @property
+    @preloadable
     def annotation(self):
         annotation = db.session.query(MessageAnnotation).filter(MessageAnnotation.message_id == self.id).first()
         return annotation
@@ -512,35 +686,47 @@ class Message(db.Model):
         return self.override_model_configs is not None
 
     @property
+    @preloadable
     def agent_thoughts(self):
         return db.session.query(MessageAgentThought).filter(MessageAgentThought.message_id == self.id) \
             .order_by(MessageAgentThought.position.asc()).all()
 
     @property
+    @preloadable
     def retriever_resources(self):
         return db.session.query(DatasetRetrieverResource).filter(DatasetRetrieverResource.message_id == self.id) \
             .order_by(DatasetRetrieverResource.position.asc()).all()
 
     @property
+    @preloadable
     def message_files(self):
         return db.session.query(MessageFile).filter(MessageFile.message_id == self.id).all()
 
     @property
+    @preloadable
     def files(self):
         message_files = self.message_files
 
+        upload_file_ids = [message_file.upload_file_id for message_file in message_files
+                           if message_file.type == 'image' and message_file.transfer_method == 'local_file']
+        upload_files = {}
+        if upload_file_ids:
+            upload_files = {
+                str(upload_file.id): upload_file for upload_file in
+                db.session.query(UploadFile).filter(UploadFile.id.in_(upload_file_ids)).all()
+            }
+
+        return self._build_files(message_files, upload_files)
+
+    @staticmethod
+    def _build_files(message_files: list['MessageFile'], upload_files: dict) -> list[dict]:
         files = []
         for message_file in message_files:
             url = message_file.url
             if message_file.type == 'image':
                 if message_file.transfer_method == 'local_file':
-                    upload_file = (db.session.query(UploadFile)
-                                   .filter(
-                        UploadFile.id == message_file.upload_file_id
-                    ).first())
-
                     url = UploadFileParser.get_image_data(
-                        upload_file=upload_file,
+                        upload_file=upload_files.get(str(message_file.upload_file_id)),
                         force_url=True
                     )
 
@@ -552,6 +738,76 @@ class Message(db.Model):
 
         return files
 
+    @classmethod
+    def preload_properties(cls, messages: list['Message']):
+        """
+        Load the per message properties used by the message list apis with one query per relation,
+        so that serializing a page does not run a set of queries for every message.
+        """
+        if not messages:
+            return
+
+        message_ids = [message.id for message in messages]
+
+        def group_by_message_id(items) -> dict:
+            grouped = defaultdict(list)
+            for item in items:
+                grouped[str(item.message_id)].append(item)
+
+            return grouped
+
+        feedbacks = db.session.query(MessageFeedback) \
+            .filter(MessageFeedback.message_id.in_(message_ids)) \
+            .order_by(MessageFeedback.created_at.asc()).all()
+        MessageFeedback.preload_properties(feedbacks)
+        feedbacks = group_by_message_id(feedbacks)
+
+        annotations = db.session.query(MessageAnnotation) \
+            .filter(MessageAnnotation.message_id.in_(message_ids)).all()
+        MessageAnnotation.preload_properties(annotations)
+        annotations = group_by_message_id(annotations)
+
+        agent_thoughts = group_by_message_id(
+            db.session.query(MessageAgentThought)
+            .filter(MessageAgentThought.message_id.in_(message_ids))
+            .order_by(MessageAgentThought.position.asc()).all()
+        )
+
+        retriever_resources = group_by_message_id(
+            db.session.query(DatasetRetrieverResource)
+            .filter(DatasetRetrieverResource.message_id.in_(message_ids))
+            .order_by(DatasetRetrieverResource.position.asc()).all()
+        )
+
+        message_files = db.session.query(MessageFile).filter(MessageFile.message_id.in_(message_ids)).all()
+        upload_file_ids = [message_file.upload_file_id for message_file in message_files
+                           if message_file.type == 'image' and message_file.transfer_method == 'local_file']
+        upload_files = {}
+        if upload_file_ids:
+            upload_files = {
+                str(upload_file.id): upload_file for upload_file in
+                db.session.query(UploadFile).filter(UploadFile.id.in_(upload_file_ids)).all()
+            }
+
+        message_files = group_by_message_id(message_files)
+
+        for message in messages:
+            message_id = str(message.id)
+            message_feedbacks = feedbacks.get(message_id, [])
+            message_annotations = annotations.get(message_id)
+
+            set_preloaded_property(message, 'feedbacks', message_feedbacks)
+            set_preloaded_property(message, 'user_feedback', next(
+                (feedback for feedback in message_feedbacks if feedback.from_source == 'user'), None))
+            set_preloaded_property(message, 'admin_feedback', next(
+                (feedback for feedback in message_feedbacks if feedback.from_source == 'admin'), None))
+            set_preloaded_property(message, 'annotation', message_annotations[0] if message_annotations else None)
+            set_preloaded_property(message, 'agent_thoughts', agent_thoughts.get(message_id, []))
+            set_preloaded_property(message, 'retriever_resources', retriever_resources.get(message_id, []))
+            set_preloaded_property(message, 'message_files', message_files.get(message_id, []))
+            set_preloaded_property(message, 'files', cls._build_files(message_files.get(message_id, []),
+                                                                      upload_files))
+
 
 class MessageFeedback(db.Model):
     __tablename__ = 'message_feedbacks'
@@ -575,10 +831,17 @@ class MessageFeedback(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
 
     @property
+    @preloadable
     def from_account(self):
         account = db.session.query(Account).filter(Account.id == self.from_account_id).first()
         return account
 
+    @classmethod
+    def preload_properties(cls, feedbacks: list['MessageFeedback']):
+        accounts = _get_accounts_by_ids([feedback.from_account_id for feedback in feedbacks])
+        for feedback in feedbacks:
+            set_preloaded_property(feedback, 'from_account', accounts.get(str(feedback.from_account_id)))
+
 
 class MessageFile(db.Model):
     __tablename__ = 'message_files'
@@ -618,10 +881,17 @@ class MessageAnnotation(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
 
     @property
+    @preloadable
     def account(self):
         account = db.session.query(Account).filter(Account.id == self.account_id).first()
         return account
 
+    @classmethod
+    def preload_properties(cls, annotations: list['MessageAnnotation']):
+        accounts = _get_accounts_by_ids([annotation.account_id for annotation in annotations])
+        for annotation in annotations:
+            set_preloaded_property(annotation, 'account', accounts.get(str(annotation.account_id)))
+
 
 class OperationLog(db.Model):
     __tablename__ = 'operation_logs'
@@ -1,6 +1,6 @@
 from extensions.ext_database import db
 from models.api_based_extension import APIBasedExtension, APIBasedExtensionPoint
-from core.helper.encrypter import encrypt_token, decrypt_token
+from core.helper.encrypter import encrypt_token, decrypt_token, batch_decrypt_token
 from core.extension.api_based_extension_requestor import APIBasedExtensionRequestor
 
 
@@ -13,8 +13,9 @@ class APIBasedExtensionService:
                     .order_by(APIBasedExtension.created_at.desc()) \
                     .all()
 
-        for extension in extension_list:
-            extension.api_key = decrypt_token(extension.tenant_id, extension.api_key)
+        api_keys = batch_decrypt_token(tenant_id, [extension.api_key for extension in extension_list])
+        for extension, api_key in zip(extension_list, api_keys):
+            extension.api_key = api_key
 
         return extension_list
 
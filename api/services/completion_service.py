@@ -1,18 +1,21 @@
 import json
 import logging
+import queue
+import re
 import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Generator, Union, Any, Optional, List
 
 from flask import current_app, Flask
-from redis.client import PubSub
 from sqlalchemy import and_
 
 from core.completion import Completion
 from core.conversation_message_task import PubHandler, ConversationTaskStoppedException, \
     ConversationTaskInterruptException
 from core.file.message_file_parser import MessageFileParser
+from core.generate_event_dispatcher import generate_event_dispatcher
 from core.model_providers.error import LLMBadRequestError, LLMAPIConnectionError, LLMAPIUnavailableError, \
     LLMRateLimitError, \
     LLMAuthorizationError, ProviderTokenNotInitError, QuotaExceededError, ModelCurrentlyNotSupportError
@@ -28,6 +31,10 @@ from services.errors.conversation import ConversationNotExistsError, Conversatio
 from services.errors.message import MessageNotExistsError
 
 
+_generate_executor = None
+_generate_executor_lock = threading.Lock()
+
+
 class CompletionService:
 
     @classmethod
@@ -100,7 +107,7 @@ class CompletionService:
                     model_name=app_model_config.model_dict["name"]
                 )
 
-                app_model_config_model = app_model_config.model_dict
+                app_model_config_model = app_model_config.model_dict.copy()
                 app_model_config_model['completion_params'] = completion_params
                 app_model_config.retriever_resource = json.dumps({'enabled': True})
 
@@ -147,12 +154,9 @@ class CompletionService:
 
         generate_task_id = str(uuid.uuid4())
 
-        pubsub = redis_client.pubsub()
-        pubsub.subscribe(PubHandler.generate_channel_name(user, generate_task_id))
-
         user = cls.get_real_user_instead_of_proxy_obj(user)
 
-        generate_worker_thread = threading.Thread(target=cls.generate_worker, kwargs={
+        cls.get_generate_executor().submit(cls.generate_worker, **{
             'flask_app': current_app._get_current_object(),
             'generate_task_id': generate_task_id,
             'detached_app_model': app_model,
@@ -168,13 +172,7 @@ class CompletionService:
             'auto_generate_name': auto_generate_name
         })
 
-        generate_worker_thread.start()
-
-        # wait for 10 minutes to close the thread
-        cls.countdown_and_close(current_app._get_current_object(), generate_worker_thread, pubsub, user,
-                                generate_task_id)
-
-        return cls.compact_response(pubsub, streaming)
+        return cls.compact_response(user, generate_task_id, streaming)
 
     @classmethod
     def get_real_user_instead_of_proxy_obj(cls, user: Union[Account, EndUser]):
@@ -187,6 +185,24 @@ class CompletionService:
 
         return user
 
+    @classmethod
+    def get_generate_executor(cls) -> ThreadPoolExecutor:
+        """
+        Bounded pool running the generate workers of this process, instead of a new thread per request.
+        Requests beyond COMPLETION_GENERATE_MAX_WORKERS wait in its queue, their streams keep receiving pings.
+        """
+        global _generate_executor
+
+        if _generate_executor is None:
+            with _generate_executor_lock:
+                if _generate_executor is None:
+                    _generate_executor = ThreadPoolExecutor(
+                        max_workers=int(current_app.config.get('COMPLETION_GENERATE_MAX_WORKERS')),
+                        thread_name_prefix='generate-worker'
+                    )
+
+        return _generate_executor
+
     @classmethod
     def generate_worker(cls, flask_app: Flask, generate_task_id: str, detached_app_model: App,
                         app_model_config: AppModelConfig,
@@ -234,36 +250,6 @@ class CompletionService:
             finally:
                 db.session.commit()
 
-    @classmethod
-    def countdown_and_close(cls, flask_app: Flask, worker_thread, pubsub, detached_user,
-                            generate_task_id) -> threading.Thread:
-        # wait for 10 minutes to close the thread
-        timeout = 600
-
-        def close_pubsub():
-            with flask_app.app_context():
-                user = db.session.merge(detached_user)
-
-                sleep_iterations = 0
-                while sleep_iterations < timeout and worker_thread.is_alive():
-                    if sleep_iterations > 0 and sleep_iterations % 10 == 0:
-                        PubHandler.ping(user, generate_task_id)
-
-                    time.sleep(1)
-                    sleep_iterations += 1
-
-                if worker_thread.is_alive():
-                    PubHandler.stop(user, generate_task_id)
-                    try:
-                        pubsub.close()
-                    except Exception:
-                        pass
-
-        countdown_thread = threading.Thread(target=close_pubsub)
-        countdown_thread.start()
-
-        return countdown_thread
-
     @classmethod
     def generate_more_like_this(cls, app_model: App, user: Union[Account, EndUser],
                                 message_id: str, streaming: bool = True,
@@ -289,7 +275,7 @@ class CompletionService:
             raise MoreLikeThisDisabledError()
 
         app_model_config = message.app_model_config
-        model_dict = app_model_config.model_dict
+        model_dict = app_model_config.model_dict.copy()
         completion_params = model_dict.get('completion_params')
         completion_params['temperature'] = 0.9
         model_dict['completion_params'] = completion_params
@@ -303,12 +289,9 @@ class CompletionService:
 
         generate_task_id = str(uuid.uuid4())
 
-        pubsub = redis_client.pubsub()
-        pubsub.subscribe(PubHandler.generate_channel_name(user, generate_task_id))
-
         user = cls.get_real_user_instead_of_proxy_obj(user)
 
-        generate_worker_thread = threading.Thread(target=cls.generate_worker, kwargs={
+        cls.get_generate_executor().submit(cls.generate_worker, **{
             'flask_app': current_app._get_current_object(),
             'generate_task_id': generate_task_id,
             'detached_app_model': app_model,
@@ -324,13 +307,7 @@ class CompletionService:
             'auto_generate_name': False
         })
 
-        generate_worker_thread.start()
-
-        # wait for 10 minutes to close the thread
-        cls.countdown_and_close(current_app._get_current_object(), generate_worker_thread, pubsub, user,
-                                generate_task_id)
-
-        return cls.compact_response(pubsub, streaming)
+        return cls.compact_response(user, generate_task_id, streaming)
 
     @classmethod
     def get_cleaned_inputs(cls, user_inputs: dict, app_model_config: AppModelConfig):
@@ -371,80 +348,112 @@ class CompletionService:
         return filtered_inputs
 
     @classmethod
-    def compact_response(cls, pubsub: PubSub, streaming: bool = False) -> Union[dict, Generator]:
-        generate_channel = list(pubsub.channels.keys())[0].decode('utf-8')
+    def compact_response(cls, user: Union[Account, EndUser], task_id: str, streaming: bool = False,
+                         last_event_id: str = '0') -> Union[dict, Generator]:
         if not streaming:
             try:
                 message_result = {}
-                for message in pubsub.listen():
-                    if message["type"] == "message":
-                        result = message["data"].decode('utf-8')
-                        result = json.loads(result)
-                        if result.get('error'):
-                            cls.handle_error(result)
-                        if result['event'] == 'message' and 'data' in result:
-                            message_result['message'] = result.get('data')
-                        if result['event'] == 'message_end' and 'data' in result:
-                            message_result['message_end'] = result.get('data')
-                            return cls.get_blocking_message_response_data(message_result)
-            except ValueError as e:
-                if e.args[0] != "I/O operation on closed file.":  # ignore this error
-                    raise CompletionStoppedError()
-                else:
-                    logging.exception(e)
-                    raise
+                for _, result in cls.read_generate_events(user, task_id, last_event_id):
+                    if result.get('error'):
+                        cls.handle_error(result)
+                    if result['event'] == 'message' and 'data' in result:
+                        message_result['message'] = result.get('data')
+                    if result['event'] == 'message_end' and 'data' in result:
+                        message_result['message_end'] = result.get('data')
+                        return cls.get_blocking_message_response_data(message_result)
+
+                raise CompletionStoppedError()
             finally:
                 db.session.commit()
-
-                try:
-                    pubsub.unsubscribe(generate_channel)
-                except ConnectionError:
-                    pass
         else:
             def generate() -> Generator:
                 try:
-                    for message in pubsub.listen():
-                        if message["type"] == "message":
-                            result = message["data"].decode('utf-8')
-                            result = json.loads(result)
-                            if result.get('error'):
-                                cls.handle_error(result)
-
-                            event = result.get('event')
-                            if event == "end":
-                                logging.debug("{} finished".format(generate_channel))
-                                break
-                            if event == 'message':
-                                yield "data: " + json.dumps(cls.get_message_response_data(result.get('data'))) + "\n\n"
-                            elif event == 'message_replace':
-                                yield "data: " + json.dumps(
-                                    cls.get_message_replace_response_data(result.get('data'))) + "\n\n"
-                            elif event == 'chain':
-                                yield "data: " + json.dumps(cls.get_chain_response_data(result.get('data'))) + "\n\n"
-                            elif event == 'agent_thought':
-                                yield "data: " + json.dumps(
-                                    cls.get_agent_thought_response_data(result.get('data'))) + "\n\n"
-                            elif event == 'message_end':
-                                yield "data: " + json.dumps(
-                                    cls.get_message_end_data(result.get('data'))) + "\n\n"
-                            elif event == 'ping':
-                                yield "event: ping\n\n"
-                            else:
-                                yield "data: " + json.dumps(result) + "\n\n"
-                except ValueError as e:
-                    if e.args[0] != "I/O operation on closed file.":  # ignore this error
-                        logging.exception(e)
-                        raise
+                    for event_id, result in cls.read_generate_events(user, task_id, last_event_id):
+                        if result.get('error'):
+                            cls.handle_error(result)
+
+                        event = result.get('event')
+                        if event == "end":
+                            logging.debug("{} finished".format(task_id))
+                            break
+                        if event == 'ping':
+                            yield "event: ping\n\n"
+                            continue
+
+                        if event == 'message':
+                            response_data = cls.get_message_response_data(result.get('data'))
+                        elif event == 'message_replace':
+                            response_data = cls.get_message_replace_response_data(result.get('data'))
+                        elif event == 'chain':
+                            response_data = cls.get_chain_response_data(result.get('data'))
+                        elif event == 'agent_thought':
+                            response_data = cls.get_agent_thought_response_data(result.get('data'))
+                        elif event == 'message_end':
+                            response_data = cls.get_message_end_data(result.get('data'))
+                        else:
+                            response_data = result
+
+                        yield "id: " + event_id + "\n" + "data: " + json.dumps(response_data) + "\n\n"
                 finally:
                     db.session.commit()
 
-                    try:
-                        pubsub.unsubscribe(generate_channel)
-                    except ConnectionError:
-                        pass
-
             return generate()
 
+    @classmethod
+    def resume_stream(cls, user: Union[Account, EndUser], task_id: str,
+                      last_event_id: Optional[str] = None) -> Generator:
+        """
+        Replay the events of a generate task after last_event_id, then keep following it until it ends.
+        Used by clients reconnecting to a stream they lost, with the id of the last event they received.
+        """
+        if last_event_id and not re.fullmatch(r'\d+(-\d+)?', last_event_id):
+            raise ValueError('Invalid last event id.')
+
+        channel = PubHandler.generate_channel_name(user, task_id)
+        if not redis_client.exists(channel):
+            raise ValueError('Task not exists or already expired.')
+
+        return cls.compact_response(user, task_id, streaming=True, last_event_id=last_event_id or '0')
+
+    @classmethod
+    def read_generate_events(cls, user: Union[Account, EndUser], task_id: str,
+                             last_event_id: str = '0') -> Generator:
+        """
+        Follow the events of a generate task from its redis stream, starting after last_event_id.
+
+        Yields (event_id, event) pairs. A local ping event is yielded when the stream has been idle for
+        a while, and the task is stopped once it outlives COMPLETION_STREAM_TIMEOUT.
+        """
+        channel = PubHandler.generate_channel_name(user, task_id)
+        timeout = int(current_app.config.get('COMPLETION_STREAM_TIMEOUT'))
+        block = int(current_app.config.get('COMPLETION_STREAM_READ_BLOCK'))
+        ping_interval = 10
+
+        started_at = time.perf_counter()
+        subscription = generate_event_dispatcher.subscribe(channel, last_event_id, block)
+        try:
+            while True:
+                try:
+                    event_id, result = subscription.get(timeout=ping_interval)
+                except queue.Empty:
+                    result = None
+                else:
+                    last_event_id = event_id
+                    yield event_id, result
+
+                    if result.get('error') or result.get('event') == 'end':
+                        return
+
+                # also checked between events, a task streaming without end is stopped as well
+                if time.perf_counter() - started_at > timeout:
+                    PubHandler.stop(user, task_id)
+                    return
+
+                if result is None:
+                    yield last_event_id, {'event': 'ping'}
+        finally:
+            generate_event_dispatcher.unsubscribe(subscription)
+
     @classmethod
     def get_message_response_data(cls, data: dict):
         response_data = {
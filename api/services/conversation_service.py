@@ -35,6 +35,7 @@ class ConversationService:
         if exclude_debug_conversation:
             base_query = base_query.filter(Conversation.override_model_configs == None)
 
+        last_conversation = None
         if last_id:
             last_conversation = base_query.filter(
                 Conversation.id == last_id,
@@ -43,29 +44,7 @@ class ConversationService:
             if not last_conversation:
                 raise LastConversationNotExistsError()
 
-            conversations = base_query.filter(
-                Conversation.created_at < last_conversation.created_at,
-                Conversation.id != last_conversation.id
-            ).order_by(Conversation.created_at.desc()).limit(limit).all()
-        else:
-            conversations = base_query.order_by(Conversation.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(conversations) == limit:
-            current_page_first_conversation = conversations[-1]
-            rest_count = base_query.filter(
-                Conversation.created_at < current_page_first_conversation.created_at,
-                Conversation.id != current_page_first_conversation.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
-
-        return InfiniteScrollPagination(
-            data=conversations,
-            limit=limit,
-            has_more=has_more
-        )
+        return InfiniteScrollPagination.paginate(base_query, Conversation, limit, cursor=last_conversation)
 
     @classmethod
     def rename(cls, app_model: App, conversation_id: str,
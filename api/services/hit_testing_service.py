@@ -1,17 +1,19 @@
+import hashlib
+import json
 import logging
 import time
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 from flask import current_app
 from langchain.embeddings.base import Embeddings
 from langchain.schema import Document
-from sklearn.manifold import TSNE
 
 from core.embedding.cached_embedding import CacheEmbedding
 from core.index.vector_index.vector_index import VectorIndex
 from core.model_providers.model_factory import ModelFactory
 from extensions.ext_database import db
+from extensions.ext_redis import redis_client
 from models.account import Account
 from models.dataset import Dataset, DocumentSegment, DatasetQuery
 
@@ -43,15 +45,16 @@ class HitTestingService:
         )
 
         start = time.perf_counter()
-        documents = vector_index.search(
-            query,
-            search_type='similarity_score_threshold',
+        query_vector = embeddings.embed_query(query)
+        documents = vector_index.search_by_vector(
+            query_vector,
             search_kwargs={
                 'k': 10,
                 'filter': {
                     'group_id': [dataset.id]
                 }
-            }
+            },
+            with_vectors=True
         )
         end = time.perf_counter()
         logging.debug(f"Hit testing retrieve in {end - start:0.4f} seconds")
@@ -67,17 +70,21 @@ class HitTestingService:
         db.session.add(dataset_query)
         db.session.commit()
 
-        return cls.compact_retrieve_response(dataset, embeddings, query, documents)
+        return cls.compact_retrieve_response(dataset, embeddings, query, query_vector, documents)
 
     @classmethod
-    def compact_retrieve_response(cls, dataset: Dataset, embeddings: Embeddings, query: str, documents: List[Document]):
-        text_embeddings = [
-            embeddings.embed_query(query)
-        ]
+    def compact_retrieve_response(cls, dataset: Dataset, embeddings: Embeddings, query: str,
+                                  query_vector: List[float], documents: List[Document]):
+        projection_method = current_app.config.get('HIT_TESTING_PROJECTION_METHOD')
+        cache_key = cls._get_positions_cache_key(dataset, query, documents, projection_method)
 
-        text_embeddings.extend(embeddings.embed_documents([document.page_content for document in documents]))
+        tsne_position_data = cls._get_cached_positions(cache_key)
+        if tsne_position_data is None:
+            text_embeddings = [query_vector]
+            text_embeddings.extend(cls.get_document_embeddings(embeddings, documents))
 
-        tsne_position_data = cls.get_tsne_positions_from_embeddings(text_embeddings)
+            tsne_position_data = cls.get_positions_from_embeddings(text_embeddings, projection_method)
+            cls._set_cached_positions(cache_key, tsne_position_data)
 
         query_position = tsne_position_data.pop(0)
 
@@ -115,6 +122,96 @@ class HitTestingService:
             "records": records
         }
 
+    @classmethod
+    def get_document_embeddings(cls, embeddings: Embeddings, documents: List[Document]) -> List[List[float]]:
+        """
+        Vectors of the retrieved documents, as returned by the vector store,
+        only the documents it returned no vector for are embedded again.
+        """
+        missing_texts = [document.page_content for document in documents if document.metadata.get('vector') is None]
+        missing_embeddings = iter(embeddings.embed_documents(missing_texts) if missing_texts else [])
+
+        return [
+            document.metadata['vector'] if document.metadata.get('vector') is not None else next(missing_embeddings)
+            for document in documents
+        ]
+
+    @classmethod
+    def get_positions_from_embeddings(cls, embeddings: list, method: str = 'pca') -> List[dict]:
+        """
+        Project the query and document vectors on a plane for the hit testing visualisation.
+
+        :param embeddings: the query vector first, then the document vectors
+        :param method: pca or random_projection, both linear and computed in milliseconds,
+                       or tsne, a slower non linear fit taking seconds
+        """
+        if method == 'tsne':
+            return cls.get_tsne_positions_from_embeddings(embeddings)
+        elif method == 'random_projection':
+            return cls.get_random_projection_positions_from_embeddings(embeddings)
+        elif method == 'pca':
+            return cls.get_pca_positions_from_embeddings(embeddings)
+
+        raise ValueError(f"Hit testing projection method {method} is not supported.")
+
+    @classmethod
+    def get_pca_positions_from_embeddings(cls, embeddings: list) -> List[dict]:
+        embedding_length = len(embeddings)
+        if embedding_length <= 1:
+            return [{'x': 0, 'y': 0}]
+
+        data = np.array(embeddings, dtype=np.float64).reshape(embedding_length, -1)
+        data = data - data.mean(axis=0)
+
+        # principal axes are the right singular vectors, their sign is arbitrary,
+        # make the largest loading positive so repeated runs draw the same picture
+        _, _, vt = np.linalg.svd(data, full_matrices=False)
+        components = vt[:2]
+        signs = np.sign(components[np.arange(len(components)), np.argmax(np.abs(components), axis=1)])
+        components = components * np.where(signs == 0, 1, signs)[:, np.newaxis]
+
+        positions = data @ components.T
+
+        return [{'x': float(x), 'y': float(y)} for x, y in positions]
+
+    @classmethod
+    def get_random_projection_positions_from_embeddings(cls, embeddings: list) -> List[dict]:
+        embedding_length = len(embeddings)
+        if embedding_length <= 1:
+            return [{'x': 0, 'y': 0}]
+
+        data = np.array(embeddings, dtype=np.float64).reshape(embedding_length, -1)
+
+        # a fixed seed keeps the projection of a given embedding size the same across requests
+        projection = np.random.default_rng(0).standard_normal((data.shape[1], 2)) / np.sqrt(2)
+        positions = (data - data.mean(axis=0)) @ projection
+
+        return [{'x': float(x), 'y': float(y)} for x, y in positions]
+
+    @staticmethod
+    def _get_positions_cache_key(dataset: Dataset, query: str, documents: List[Document], method: str) -> str:
+        index_node_ids = [document.metadata['doc_id'] for document in documents]
+        digest = hashlib.sha256('\n'.join([query] + index_node_ids).encode('utf-8')).hexdigest()
+        return 'hit_testing_positions:{}:{}:{}'.format(dataset.id, method, digest)
+
+    @staticmethod
+    def _get_cached_positions(cache_key: str) -> Optional[List[dict]]:
+        try:
+            positions = redis_client.get(cache_key)
+        except Exception:
+            logging.exception('Failed to get hit testing positions from redis')
+            return None
+
+        return json.loads(positions) if positions else None
+
+    @staticmethod
+    def _set_cached_positions(cache_key: str, positions: List[dict]):
+        try:
+            redis_client.setex(cache_key, int(current_app.config.get('HIT_TESTING_POSITION_CACHE_TTL')),
+                               json.dumps(positions))
+        except Exception:
+            logging.exception('Failed to cache hit testing positions in redis')
+
     @classmethod
     def get_tsne_positions_from_embeddings(cls, embeddings: list):
         embedding_length = len(embeddings)
@@ -128,6 +225,8 @@ class HitTestingService:
         if perplexity >= embedding_length:
             perplexity = max(embedding_length - 1, 1)
 
+        from sklearn.manifold import TSNE
+
         tsne = TSNE(n_components=2, perplexity=perplexity, early_exaggeration=12.0)
         data_tsne = tsne.fit_transform(concatenate_data)
 
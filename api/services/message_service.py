@@ -30,42 +30,21 @@ class MessageService:
             conversation_id=conversation_id
         )
 
+        base_query = db.session.query(Message).filter(Message.conversation_id == conversation.id)
+
+        first_message = None
         if first_id:
-            first_message = db.session.query(Message) \
-                .filter(Message.conversation_id == conversation.id, Message.id == first_id).first()
+            first_message = base_query.filter(Message.id == first_id).first()
 
             if not first_message:
                 raise FirstMessageNotExistsError()
 
-            history_messages = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < first_message.created_at,
-                Message.id != first_message.id
-            ) \
-                .order_by(Message.created_at.desc()).limit(limit).all()
-        else:
-            history_messages = db.session.query(Message).filter(Message.conversation_id == conversation.id) \
-                .order_by(Message.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(history_messages) == limit:
-            current_page_first_message = history_messages[-1]
-            rest_count = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
-
-        history_messages = list(reversed(history_messages))
-
-        return InfiniteScrollPagination(
-            data=history_messages,
-            limit=limit,
-            has_more=has_more
-        )
+        pagination = InfiniteScrollPagination.paginate(base_query, Message, limit, cursor=first_message)
+
+        pagination.data = list(reversed(pagination.data))
+        Message.preload_properties(pagination.data)
+
+        return pagination
 
     @classmethod
     def pagination_by_last_id(cls, app_model: App, user: Optional[Union[Account | EndUser]],
@@ -88,35 +67,18 @@ class MessageService:
         if include_ids is not None:
             base_query = base_query.filter(Message.id.in_(include_ids))
 
+        last_message = None
         if last_id:
             last_message = base_query.filter(Message.id == last_id).first()
 
             if not last_message:
                 raise LastMessageNotExistsError()
 
-            history_messages = base_query.filter(
-                Message.created_at < last_message.created_at,
-                Message.id != last_message.id
-            ).order_by(Message.created_at.desc()).limit(limit).all()
-        else:
-            history_messages = base_query.order_by(Message.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(history_messages) == limit:
-            current_page_first_message = history_messages[-1]
-            rest_count = base_query.filter(
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
-
-        return InfiniteScrollPagination(
-            data=history_messages,
-            limit=limit,
-            has_more=has_more
-        )
+        pagination = InfiniteScrollPagination.paginate(base_query, Message, limit, cursor=last_message)
+
+        Message.preload_properties(pagination.data)
+
+        return pagination
 
     @classmethod
     def create_feedback(cls, app_model: App, message_id: str, user: Optional[Union[Account | EndUser]],
@@ -10,6 +10,7 @@ import requests
 from core.model_providers.model_factory import ModelFactory
 from extensions.ext_database import db
 from core.model_providers.model_provider_factory import ModelProviderFactory
+from core.model_providers.preferred_provider_cache import preferred_provider_cache
 from core.model_providers.models.entity.model_params import ModelType, ModelKwargsRules
 from models.provider import Provider, ProviderModel, TenantPreferredModelProvider, ProviderType, ProviderQuotaType, \
     TenantDefaultModel
@@ -229,6 +230,8 @@ class ProviderService:
             db.session.add(provider)
             db.session.commit()
 
+        preferred_provider_cache.invalidate(tenant_id)
+
     def delete_custom_provider(self, tenant_id: str, provider_name: str) -> None:
         """
         delete custom provider.
@@ -254,6 +257,8 @@ class ProviderService:
             db.session.delete(provider)
             db.session.commit()
 
+            preferred_provider_cache.invalidate(tenant_id)
+
     def custom_provider_model_config_validate(self,
                                               provider_name: str,
                                               model_name: str,
@@ -358,6 +363,8 @@ class ProviderService:
             db.session.add(provider_model)
             db.session.commit()
 
+        preferred_provider_cache.invalidate(tenant_id)
+
     def delete_custom_provider_model(self,
                                      tenant_id: str,
                                      provider_name: str,
@@ -385,6 +392,8 @@ class ProviderService:
             db.session.delete(provider_model)
             db.session.commit()
 
+            preferred_provider_cache.invalidate(tenant_id)
+
     def switch_preferred_provider(self, tenant_id: str, provider_name: str, preferred_provider_type: str) -> None:
         """
         switch preferred provider.
@@ -425,6 +434,8 @@ class ProviderService:
 
         db.session.commit()
 
+        preferred_provider_cache.invalidate(tenant_id)
+
     def get_default_model_of_model_type(self, tenant_id: str, model_type: str) -> Optional[TenantDefaultModel]:
         """
         get default model of model type.
@@ -36,38 +36,42 @@ def document_indexing_update_task(dataset_id: str, document_id: str):
     document.processing_started_at = datetime.datetime.utcnow()
     db.session.commit()
 
-    # delete all document segment and index
-    try:
-        dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
-        if not dataset:
-            raise Exception('Dataset not found')
+    # QA documents are regenerated by the LLM on every split, so their chunks can not be diffed
+    # by content hash, other documents only re-index the chunks whose content changed.
+    incremental = document.doc_form != 'qa_model'
+    if not incremental:
+        # delete all document segment and index
+        try:
+            dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+            if not dataset:
+                raise Exception('Dataset not found')
 
-        vector_index = IndexBuilder.get_index(dataset, 'high_quality')
-        kw_index = IndexBuilder.get_index(dataset, 'economy')
+            vector_index = IndexBuilder.get_index(dataset, 'high_quality')
+            kw_index = IndexBuilder.get_index(dataset, 'economy')
 
-        segments = db.session.query(DocumentSegment).filter(DocumentSegment.document_id == document_id).all()
-        index_node_ids = [segment.index_node_id for segment in segments]
+            segments = db.session.query(DocumentSegment).filter(DocumentSegment.document_id == document_id).all()
+            index_node_ids = [segment.index_node_id for segment in segments]
 
-        # delete from vector index
-        if vector_index:
-            vector_index.delete_by_ids(index_node_ids)
+            # delete from vector index
+            if vector_index:
+                vector_index.delete_by_ids(index_node_ids)
 
-        # delete from keyword index
-        if index_node_ids:
-            kw_index.delete_by_ids(index_node_ids)
+            # delete from keyword index
+            if index_node_ids:
+                kw_index.delete_by_ids(index_node_ids)
 
-        for segment in segments:
-            db.session.delete(segment)
-        db.session.commit()
-        end_at = time.perf_counter()
-        logging.info(
-            click.style('Cleaned document when document update data source or process rule: {} latency: {}'.format(document_id, end_at - start_at), fg='green'))
-    except Exception:
-        logging.exception("Cleaned document when document update data source or process rule failed")
+            for segment in segments:
+                db.session.delete(segment)
+            db.session.commit()
+            end_at = time.perf_counter()
+            logging.info(
+                click.style('Cleaned document when document update data source or process rule: {} latency: {}'.format(document_id, end_at - start_at), fg='green'))
+        except Exception:
+            logging.exception("Cleaned document when document update data source or process rule failed")
 
     try:
         indexing_runner = IndexingRunner()
-        indexing_runner.run([document])
+        indexing_runner.run([document], incremental=incremental)
         end_at = time.perf_counter()
         logging.info(click.style('update document: {} latency: {}'.format(document.id, end_at - start_at), fg='green'))
     except DocumentIsPausedException as ex:
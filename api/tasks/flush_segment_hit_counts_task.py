@@ -0,0 +1,26 @@
+import logging
+import time
+
+import click
+from celery import shared_task
+
+
+@shared_task(queue='dataset')
+def flush_segment_hit_counts_task():
+    """
+    Async write the buffered hit counts of retrieved segments to the database
+
+    Usage: scheduled by segment_hit_counter.add, flush_segment_hit_counts_task.apply_async(countdown=interval)
+    """
+    logging.info(click.style('Start flush segment hit counts', fg='green'))
+    start_at = time.perf_counter()
+    # imported here, the counter module imports this task
+    from core.helper.segment_hit_counter import segment_hit_counter
+
+    try:
+        segment_hit_counter.flush()
+
+        end_at = time.perf_counter()
+        logging.info(click.style('Segment hit counts flushed, latency: {}'.format(end_at - start_at), fg='green'))
+    except Exception:
+        logging.exception("flush segment hit counts failed")
@@ -0,0 +1,108 @@
+import json
+import os
+import uuid
+
+import pytest
+
+# gevent monkey patching from inside pytest, after threading is imported, is not representative and may hang
+os.environ.setdefault('DEBUG', 'true')
+
+from extensions.ext_database import db
+from models.account import Tenant, Account, TenantAccountJoin
+from models.model import App, AppModelConfig, Conversation, Message, MessageChain
+from models.provider import Provider, ProviderType
+from tests.benchmark.fake_provider import PROVIDER_NAME, LLM_MODEL_NAME, register_benchmark_provider
+
+
+@pytest.fixture(scope='session')
+def app():
+    """
+    The real application, configured from the environment (.env) like the api server,
+    it needs the postgres and redis of docker/docker-compose.middleware.yaml or equivalents.
+    """
+    # the api server module creates its app on import
+    from app import app
+
+    with app.app_context(), register_benchmark_provider():
+        yield app
+
+
+@pytest.fixture(scope='session')
+def benchmark_app(app):
+    """
+    A chat app of a new tenant, backed by the benchmark provider. Everything it creates is removed afterwards.
+    """
+    tenant = Tenant(name='benchmark')
+    db.session.add(tenant)
+    db.session.flush()
+
+    account = Account(name='benchmark', email='benchmark-{}@example.com'.format(uuid.uuid4().hex))
+    db.session.add(account)
+    db.session.flush()
+
+    db.session.add(TenantAccountJoin(tenant_id=tenant.id, account_id=account.id, role='owner'))
+    db.session.add(Provider(
+        tenant_id=tenant.id,
+        provider_name=PROVIDER_NAME,
+        provider_type=ProviderType.CUSTOM.value,
+        encrypted_config=json.dumps({}),
+        is_valid=True
+    ))
+
+    app_model = App(
+        tenant_id=tenant.id,
+        name='benchmark',
+        mode='chat',
+        icon='🤖',
+        icon_background='#FFEAD5',
+        enable_site=False,
+        enable_api=True,
+        api_rpm=0,
+        api_rph=0,
+        status='normal'
+    )
+    db.session.add(app_model)
+    db.session.flush()
+
+    app_model_config = AppModelConfig(
+        app_id=app_model.id,
+        provider='',
+        model_id='',
+        configs={},
+        model=json.dumps({
+            'provider': PROVIDER_NAME,
+            'name': LLM_MODEL_NAME,
+            'mode': 'chat',
+            'completion_params': {
+                'max_tokens': 512,
+                'temperature': 1,
+                'top_p': 1,
+                'presence_penalty': 0,
+                'frequency_penalty': 0
+            }
+        }),
+        pre_prompt='You are a helpful assistant, answer the questions of the user.',
+        prompt_type='simple',
+        user_input_form=json.dumps([])
+    )
+    db.session.add(app_model_config)
+    db.session.flush()
+
+    app_model.app_model_config_id = app_model_config.id
+    db.session.commit()
+
+    yield app_model, account
+
+    message_ids = db.session.query(Message.id).filter(Message.app_id == app_model.id)
+    db.session.query(MessageChain).filter(MessageChain.message_id.in_(message_ids)) \
+        .delete(synchronize_session=False)
+    db.session.query(Message).filter(Message.app_id == app_model.id).delete(synchronize_session=False)
+    db.session.query(Conversation).filter(Conversation.app_id == app_model.id).delete(synchronize_session=False)
+    db.session.query(AppModelConfig).filter(AppModelConfig.app_id == app_model.id).delete(synchronize_session=False)
+    db.session.query(App).filter(App.id == app_model.id).delete(synchronize_session=False)
+    db.session.query(Provider).filter(Provider.tenant_id == tenant.id).delete(synchronize_session=False)
+    db.session.query(TenantAccountJoin).filter(TenantAccountJoin.tenant_id == tenant.id) \
+        .delete(synchronize_session=False)
+    db.session.query(Account).filter(Account.id == account.id).delete(synchronize_session=False)
+    db.session.query(Tenant).filter(Tenant.id == tenant.id).delete(synchronize_session=False)
+    db.session.commit()
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from typing import Type, List, Optional, Any
+from unittest.mock import patch
+
+from langchain.callbacks.manager import Callbacks, CallbackManagerForLLMRun
+from langchain.embeddings.base import Embeddings
+from langchain.schema import LLMResult, BaseMessage, ChatResult, ChatGeneration, AIMessage
+
+from core.model_providers.error import LLMBadRequestError
+from core.model_providers.model_provider_factory import ModelProviderFactory
+from core.model_providers.models.base import BaseProviderModel
+from core.model_providers.models.embedding.base import BaseEmbedding
+from core.model_providers.models.entity.message import PromptMessage
+from core.model_providers.models.entity.model_params import ModelType, ModelKwargsRules, ModelMode, KwargRule, \
+    ModelKwargs
+from core.model_providers.models.llm.base import BaseLLM
+from core.model_providers.providers.base import BaseModelProvider
+from core.model_providers.rules import provider_rules
+from core.third_party.langchain.llms.fake import FakeLLM
+
+PROVIDER_NAME = 'benchmark'
+LLM_MODEL_NAME = 'benchmark-chat'
+EMBEDDING_MODEL_NAME = 'benchmark-embedding'
+
+ANSWER_TOKENS = int(os.environ.get('BENCHMARK_ANSWER_TOKENS', 64))
+FIRST_TOKEN_LATENCY = float(os.environ.get('BENCHMARK_FIRST_TOKEN_LATENCY', 0)) / 1000
+TOKEN_LATENCY = float(os.environ.get('BENCHMARK_TOKEN_LATENCY', 0)) / 1000
+EMBEDDING_DIMENSIONS = 256
+
+ANSWER = ' '.join('token{}'.format(i) for i in range(ANSWER_TOKENS))
+
+
+def count_tokens(text: str) -> int:
+    """
+    Deterministic, tokenizer free token count, about one token per four characters like most BPE vocabularies.
+    """
+    return (len(text) + 3) // 4
+
+
+class BenchmarkChatModel(FakeLLM):
+    """
+    Chat model answering the same text for every prompt, one word per token,
+    with a configurable latency before the first token and between tokens.
+    """
+
+    first_token_latency: float = 0
+    token_latency: float = 0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.first_token_latency:
+            time.sleep(self.first_token_latency)
+
+        if self.streaming and run_manager:
+            for i, word in enumerate(self.response.split(' ')):
+                if i and self.token_latency:
+                    time.sleep(self.token_latency)
+
+                run_manager.on_llm_new_token(word if i == 0 else ' ' + word)
+
+        prompt_tokens = sum(count_tokens(message.content) + 4 for message in messages)
+        completion_tokens = count_tokens(self.response)
+
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.response))],
+            llm_output={'token_usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }}
+        )
+
+
+class BenchmarkLLM(BaseLLM):
+    model_mode: ModelMode = ModelMode.CHAT
+
+    def _init_client(self) -> Any:
+        return BenchmarkChatModel(
+            response=ANSWER,
+            num_token_func=self.get_num_tokens,
+            streaming=self.streaming,
+            callbacks=self.callbacks,
+            first_token_latency=FIRST_TOKEN_LATENCY,
+            token_latency=TOKEN_LATENCY
+        )
+
+    def _run(self, messages: List[PromptMessage],
+             stop: Optional[List[str]] = None,
+             callbacks: Callbacks = None,
+             **kwargs) -> LLMResult:
+        prompts = self._get_prompt_from_messages(messages)
+        return self._client.generate([prompts], stop, callbacks)
+
+    def get_num_tokens(self, messages: List[PromptMessage]) -> int:
+        return sum(count_tokens(message.content) + 4 for message in messages)
+
+    def _set_model_kwargs(self, model_kwargs: ModelKwargs):
+        pass
+
+    def handle_exceptions(self, ex: Exception) -> Exception:
+        return LLMBadRequestError(f"Benchmark: {str(ex)}")
+
+    @property
+    def support_streaming(self):
+        return True
+
+
+class BenchmarkEmbeddings(Embeddings):
+    """
+    Deterministic embeddings derived from the sha256 of the text, so equal texts get equal vectors.
+    """
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = []
+        seed = text.encode('utf-8')
+        while len(vector) < EMBEDDING_DIMENSIONS:
+            seed = hashlib.sha256(seed).digest()
+            vector.extend(byte / 255 - 0.5 for byte in seed)
+
+        return vector[:EMBEDDING_DIMENSIONS]
+
+
+class BenchmarkEmbedding(BaseEmbedding):
+    def __init__(self, model_provider: BaseModelProvider, name: str):
+        super().__init__(model_provider, BenchmarkEmbeddings(), name)
+
+    def get_num_tokens(self, text: str) -> int:
+        return count_tokens(text)
+
+    def handle_exceptions(self, ex: Exception) -> Exception:
+        return LLMBadRequestError(f"Benchmark embedding: {str(ex)}")
+
+
+class BenchmarkModelProvider(BaseModelProvider):
+    @property
+    def provider_name(self):
+        return PROVIDER_NAME
+
+    def _get_fixed_model_list(self, model_type: ModelType) -> list[dict]:
+        if model_type == ModelType.TEXT_GENERATION:
+            return [{'id': LLM_MODEL_NAME, 'name': LLM_MODEL_NAME, 'mode': ModelMode.CHAT.value}]
+        elif model_type == ModelType.EMBEDDINGS:
+            return [{'id': EMBEDDING_MODEL_NAME, 'name': EMBEDDING_MODEL_NAME}]
+
+        return []
+
+    def _get_text_generation_model_mode(self, model_name) -> str:
+        return ModelMode.CHAT.value
+
+    def get_model_class(self, model_type: ModelType) -> Type[BaseProviderModel]:
+        if model_type == ModelType.TEXT_GENERATION:
+            return BenchmarkLLM
+        elif model_type == ModelType.EMBEDDINGS:
+            return BenchmarkEmbedding
+
+        raise NotImplementedError
+
+    @classmethod
+    def is_provider_credentials_valid_or_raise(cls, credentials: dict):
+        pass
+
+    @classmethod
+    def encrypt_provider_credentials(cls, tenant_id: str, credentials: dict) -> dict:
+        return credentials
+
+    def get_provider_credentials(self, obfuscated: bool = False) -> dict:
+        return {}
+
+    @classmethod
+    def is_model_credentials_valid_or_raise(cls, model_name: str, model_type: ModelType, credentials: dict):
+        pass
+
+    @classmethod
+    def encrypt_model_credentials(cls, tenant_id: str, model_name: str, model_type: ModelType,
+                                  credentials: dict) -> dict:
+        return credentials
+
+    def get_model_parameter_rules(self, model_name: str, model_type: ModelType) -> ModelKwargsRules:
+        return ModelKwargsRules(
+            temperature=KwargRule[float](min=0, max=2, default=1, precision=2),
+            top_p=KwargRule[float](min=0, max=1, default=1, precision=2),
+            presence_penalty=KwargRule[float](min=-2, max=2, default=0, precision=2),
+            frequency_penalty=KwargRule[float](min=-2, max=2, default=0, precision=2),
+            max_tokens=KwargRule[int](min=10, max=4097, default=16, precision=0)
+        )
+
+    def get_model_credentials(self, model_name: str, model_type: ModelType, obfuscated: bool = False) -> dict:
+        return self.get_provider_credentials(obfuscated)
+
+
+@contextmanager
+def register_benchmark_provider():
+    """
+    Make the benchmark provider resolvable by ModelProviderFactory for the duration of the block.
+
+    It is registered at runtime rather than in the provider rules so it never shows up in a real deployment.
+    """
+    get_model_provider_class = ModelProviderFactory.get_model_provider_class.__func__
+
+    def get_benchmark_model_provider_class(cls, provider_name: str) -> Type[BaseModelProvider]:
+        if provider_name == PROVIDER_NAME:
+            return BenchmarkModelProvider
+
+        return get_model_provider_class(cls, provider_name)
+
+    rules = {
+        'support_provider_types': ['custom'],
+        'system_config': None,
+        'model_flexibility': 'fixed'
+    }
+
+    with patch.dict(provider_rules, {PROVIDER_NAME: rules}), \
+            patch.object(ModelProviderFactory, 'get_model_provider_class',
+                         classmethod(get_benchmark_model_provider_class)):
+        yield
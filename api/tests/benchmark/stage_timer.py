@@ -0,0 +1,117 @@
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from typing import Optional, List
+from unittest.mock import patch
+
+
+class StageTimer:
+    """
+    Collects per stage timings of benchmark runs by wrapping the functions that implement each stage.
+
+    Durations of a stage are summed over a run (a stage can be entered several times per request),
+    nested calls of the same stage are only counted once. Marks record the elapsed time since the
+    start of the run when an event first (or last) happens, like the first streamed token.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_at = None
+        self._current = {}
+        self.runs: List[dict] = []
+
+    def start_run(self):
+        with self._lock:
+            self._current = defaultdict(float)
+            self._started_at = time.perf_counter()
+
+    def end_run(self) -> dict:
+        with self._lock:
+            run = dict(self._current)
+            self.runs.append(run)
+
+        return run
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._current[stage] += seconds
+
+    def mark(self, name: str, first: bool = True):
+        elapsed = time.perf_counter() - self._started_at
+        with self._lock:
+            if not first or name not in self._current:
+                self._current[name] = elapsed
+
+    def timed(self, stage: str, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            depths = self._local.__dict__.setdefault('depths', defaultdict(int))
+            depths[stage] += 1
+            started_at = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                depths[stage] -= 1
+                if depths[stage] == 0:
+                    self.add(stage, time.perf_counter() - started_at)
+
+        return wrapper
+
+    def marked(self, name: str, func, first: bool = True):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.mark(name, first)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    def patch_stages(self, stack: ExitStack, stages: dict):
+        """
+        Wrap the given attributes, stages maps a stage name to a list of (owner, attribute) pairs.
+        Properties are wrapped on their getter.
+        """
+        for stage, targets in stages.items():
+            for owner, attribute in targets:
+                original = owner.__dict__[attribute]
+                if isinstance(original, property):
+                    wrapped = property(self.timed(stage, original.fget))
+                elif isinstance(original, classmethod):
+                    wrapped = classmethod(self.timed(stage, original.__func__))
+                elif isinstance(original, staticmethod):
+                    wrapped = staticmethod(self.timed(stage, original.__func__))
+                else:
+                    wrapped = self.timed(stage, original)
+
+                stack.enter_context(patch.object(owner, attribute, wrapped))
+
+    def report(self, title: str, stages: Optional[List[str]] = None) -> str:
+        names = stages or sorted({name for run in self.runs for name in run})
+        lines = [
+            '',
+            '{} ({} runs)'.format(title, len(self.runs)),
+            '{:<24}{:>10}{:>10}{:>10}{:>10}'.format('stage (ms)', 'mean', 'p50', 'p95', 'max')
+        ]
+
+        for name in names:
+            values = sorted(run[name] * 1000 for run in self.runs if name in run)
+            if not values:
+                lines.append('{:<24}{:>10}'.format(name, '-'))
+                continue
+
+            lines.append('{:<24}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}'.format(
+                name,
+                sum(values) / len(values),
+                self._percentile(values, 50),
+                self._percentile(values, 95),
+                values[-1]
+            ))
+
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _percentile(values: List[float], percent: int) -> float:
+        index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+        return values[index]
@@ -0,0 +1,139 @@
+"""
+End to end benchmark of a chat request, from CompletionService.completion to the last streamed event,
+against the benchmark provider so only the orchestration overhead is measured.
+
+Run it against local postgres and redis (docker/docker-compose.middleware.yaml) with:
+
+    pytest tests/benchmark -s
+
+Environment variables:
+    BENCHMARK_ITERATIONS          requests per mode, 20 by default
+    BENCHMARK_ANSWER_TOKENS       tokens of each answer, 64 by default
+    BENCHMARK_FIRST_TOKEN_LATENCY simulated model latency before the first token, in ms, 0 by default
+    BENCHMARK_TOKEN_LATENCY       simulated model latency between tokens, in ms, 0 by default
+"""
+import json
+import os
+import threading
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import pytest
+
+from core.completion import Completion
+from core.conversation_message_task import PubHandler
+from core.memory.read_only_conversation_token_db_buffer_shared_memory import \
+    ReadOnlyConversationTokenDBBufferSharedMemory
+from core.model_providers.model_factory import ModelFactory
+from core.orchestrator_rule_parser import OrchestratorRuleParser
+from core.prompt.prompt_transform import PromptTransform
+from core.tool.dataset_retriever_tool import DatasetRetrieverTool
+from models.model import AppModelConfig
+from services.completion_service import CompletionService
+from tests.benchmark.fake_provider import ANSWER
+from tests.benchmark.stage_timer import StageTimer
+
+ITERATIONS = int(os.environ.get('BENCHMARK_ITERATIONS', 20))
+
+STAGES = {
+    'config': [(AppModelConfig, '_get_parsed_column')],
+    'model_instance': [(ModelFactory, 'get_text_generation_model')],
+    'memory': [(ReadOnlyConversationTokenDBBufferSharedMemory, 'buffer')],
+    'retrieval': [(OrchestratorRuleParser, 'to_agent_executor'), (DatasetRetrieverTool, '_run')],
+    'prompt': [(PromptTransform, 'get_prompt'), (PromptTransform, 'get_advanced_prompt')],
+    'generate': [(Completion, 'generate')],
+}
+
+REPORT_STAGES = ['config', 'model_instance', 'memory', 'retrieval', 'prompt', 'generate',
+                 'first_token', 'last_token', 'client_first_token', 'client_last_token', 'total']
+
+
+@pytest.fixture
+def timer():
+    """
+    Time the stages of every request, marks are taken where the worker publishes the first token
+    and the message end, the worker thread is awaited after each request so runs never overlap.
+    """
+    timer = StageTimer()
+    worker_done = threading.Event()
+
+    generate_worker = CompletionService.__dict__['generate_worker'].__func__
+
+    def wait_generate_worker(cls, *args, **kwargs):
+        try:
+            return generate_worker(cls, *args, **kwargs)
+        finally:
+            worker_done.set()
+
+    with ExitStack() as stack:
+        timer.patch_stages(stack, STAGES)
+        stack.enter_context(patch.object(CompletionService, 'generate_worker', classmethod(wait_generate_worker)))
+        stack.enter_context(patch.object(PubHandler, 'pub_text', timer.marked('first_token', PubHandler.pub_text)))
+        stack.enter_context(patch.object(
+            PubHandler, 'pub_message_end', timer.marked('last_token', PubHandler.pub_message_end)
+        ))
+
+        timer.worker_done = worker_done
+        yield timer
+
+
+def _run(timer: StageTimer, benchmark_app, streaming: bool, conversation_id: str = None) -> str:
+    app_model, account = benchmark_app
+    args = {
+        'inputs': {},
+        'query': 'What is the answer to question {}?'.format(len(timer.runs)),
+        'files': [],
+        'auto_generate_name': False,
+        'retriever_from': 'dev'
+    }
+    if conversation_id:
+        args['conversation_id'] = conversation_id
+
+    timer.worker_done.clear()
+    timer.start_run()
+
+    response = CompletionService.completion(
+        app_model=app_model,
+        user=account,
+        args=args,
+        from_source='console',
+        streaming=streaming
+    )
+
+    if streaming:
+        answer = ''
+        for chunk in response:
+            if not chunk.startswith('id: '):
+                continue
+
+            data = json.loads(chunk.split('data: ', 1)[1])
+            if data['event'] == 'message':
+                timer.mark('client_first_token')
+                answer += data['answer']
+                conversation_id = data['conversation_id']
+
+        timer.mark('client_last_token')
+    else:
+        answer = response['answer']
+        conversation_id = response['conversation_id']
+        timer.mark('client_last_token')
+
+    assert timer.worker_done.wait(60), 'generate worker did not finish'
+    timer.mark('total')
+    timer.end_run()
+
+    assert answer == ANSWER
+
+    return conversation_id
+
+
+@pytest.mark.parametrize('streaming', [False, True], ids=['blocking', 'streaming'])
+def test_chat_hot_path(benchmark_app, timer, streaming):
+    # warm up caches and lazy imports once, then keep the history growing within a single conversation
+    conversation_id = _run(timer, benchmark_app, streaming)
+    timer.runs.clear()
+
+    for _ in range(ITERATIONS):
+        conversation_id = _run(timer, benchmark_app, streaming, conversation_id)
+
+    print(timer.report('chat {}'.format('streaming' if streaming else 'blocking'), REPORT_STAGES))
@@ -0,0 +1,119 @@
+from typing import NamedTuple, Optional
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+from langchain.schema import Document
+
+from core.conversation_message_task import ConversationMessageTask
+from core.tool import dataset_hydrator, dataset_retriever_tool
+from core.tool.dataset_hydrator import DatasetMetadataCache, SegmentDocument, hydrate_segments
+from core.tool.dataset_retriever_tool import DatasetRetrieverTool
+from models.dataset import Dataset, DocumentSegment
+
+
+class Row(NamedTuple):
+    DocumentSegment: DocumentSegment
+    document_id: Optional[str]
+    document_name: Optional[str]
+    document_data_source_type: Optional[str]
+
+
+def _segment(index_node_id: str) -> DocumentSegment:
+    return DocumentSegment(id=f'segment-{index_node_id}', dataset_id='dataset-id', document_id='document-id',
+                           index_node_id=index_node_id, content=index_node_id, position=1, hit_count=0)
+
+
+@pytest.fixture
+def query_first(mocker):
+    db = mocker.patch.object(dataset_hydrator, 'db')
+    query_first = db.session.query.return_value.filter.return_value.first
+
+    app = Flask(__name__)
+    app.config['DATASET_METADATA_CACHE_SIZE'] = 10
+    app.config['DATASET_METADATA_CACHE_TTL'] = 30
+
+    with app.app_context():
+        yield query_first
+
+
+def test_dataset_is_queried_once(query_first):
+    query_first.return_value = Dataset(id='dataset-id', tenant_id='tenant-id', name='faq',
+                                       indexing_technique='high_quality')
+    cache = DatasetMetadataCache()
+
+    first = cache.get('tenant-id', 'dataset-id')
+    second = cache.get('tenant-id', 'dataset-id')
+
+    assert query_first.call_count == 1
+    assert second.name == 'faq' and second.indexing_technique == 'high_quality'
+    # every caller gets its own copy
+    assert second is not first and second is not cache.get('tenant-id', 'dataset-id')
+
+
+def test_missing_dataset_is_not_cached(query_first):
+    query_first.return_value = None
+    cache = DatasetMetadataCache()
+
+    assert cache.get('tenant-id', 'dataset-id') is None
+    assert cache.get('tenant-id', 'dataset-id') is None
+    assert query_first.call_count == 2
+
+
+def test_segments_follow_retrieval_order(mocker):
+    db = mocker.patch.object(dataset_hydrator, 'db')
+    # the database returns the segments in its own order
+    db.session.query.return_value.filter.return_value.all.return_value = [
+        _segment('node-3'), _segment('node-1'), _segment('node-2')
+    ]
+
+    results = hydrate_segments(['dataset-id'], ['node-2', 'node-3', 'node-1'])
+
+    assert [(segment.index_node_id, document) for segment, document in results] == [
+        ('node-2', None), ('node-3', None), ('node-1', None)
+    ]
+    assert hydrate_segments(['dataset-id'], []) == []
+
+
+def test_segments_of_unavailable_documents_have_no_document(mocker):
+    db = mocker.patch.object(dataset_hydrator, 'db')
+    # the outer join finds no enabled, non archived document for node-2
+    db.session.query.return_value.outerjoin.return_value.filter.return_value.all.return_value = [
+        Row(_segment('node-2'), None, None, None),
+        Row(_segment('node-1'), 'document-id', 'faq.md', 'upload_file'),
+    ]
+
+    results = hydrate_segments(['dataset-id'], ['node-1', 'node-2'], with_documents=True)
+
+    assert [(segment.index_node_id, document) for segment, document in results] == [
+        ('node-1', SegmentDocument('document-id', 'faq.md', 'upload_file')),
+        ('node-2', None)
+    ]
+
+
+def test_segments_without_document_are_in_the_context_but_not_the_resources(mocker):
+    dataset = Dataset(id='dataset-id', tenant_id='tenant-id', name='faq', indexing_technique='high_quality')
+    mocker.patch.object(dataset_retriever_tool.dataset_metadata_cache, 'get', return_value=dataset)
+    mocker.patch.object(DatasetRetrieverTool, 'retrieve', return_value=[
+        Document(page_content=node_id, metadata={'doc_id': node_id, 'score': 0.5}) for node_id in ['node-1', 'node-2']
+    ])
+    hit_callback = mocker.patch.object(dataset_retriever_tool, 'DatasetIndexToolCallbackHandler').return_value
+    mocker.patch.object(dataset_retriever_tool, 'hydrate_segments', return_value=[
+        (_segment('node-1'), SegmentDocument('document-id', 'faq.md', 'upload_file')),
+        (_segment('node-2'), None),
+    ])
+
+    tool = DatasetRetrieverTool(
+        name='dataset-dataset-id',
+        tenant_id='tenant-id',
+        dataset_id='dataset-id',
+        conversation_message_task=MagicMock(spec=ConversationMessageTask),
+        return_resource=True,
+        retriever_from='dev'
+    )
+
+    with Flask(__name__).app_context():
+        assert tool.run({'query': 'how to reset'}) == 'node-1\nnode-2'
+
+    resources = hit_callback.return_retriever_resource_info.call_args.args[0]
+    assert [resource['segment_id'] for resource in resources] == ['segment-node-1']
@@ -0,0 +1,91 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+from langchain.schema import Document
+
+from core.conversation_message_task import ConversationMessageTask
+from core.tool import dataset_multi_retriever_tool
+from core.tool.dataset_multi_retriever_tool import DatasetMultiRetrieverTool
+from core.tool.dataset_retriever_tool import DatasetRetrieverTool
+from models.dataset import Dataset, DocumentSegment
+
+DATASETS = {
+    'faq': Dataset(id='faq', tenant_id='tenant-id', name='faq', indexing_technique='high_quality'),
+    'manual': Dataset(id='manual', tenant_id='tenant-id', name='manual', indexing_technique='high_quality'),
+    'notes': Dataset(id='notes', tenant_id='tenant-id', name='notes', indexing_technique='economy'),
+    'relevant': Dataset(id='relevant', tenant_id='tenant-id', name='relevant', indexing_technique='high_quality'),
+    'unrelated': Dataset(id='unrelated', tenant_id='tenant-id', name='unrelated', indexing_technique='high_quality'),
+}
+
+RESULTS = {
+    'faq': [('faq-1', 0.62), ('faq-2', 0.41)],
+    'manual': [('manual-1', 0.87), ('manual-2', 0.55)],
+    'notes': [('notes-1', None), ('notes-2', None)],
+    'relevant': [('relevant-1', 0.95), ('relevant-2', 0.9)],
+    'unrelated': [('unrelated-1', 0.2)],
+}
+
+
+def _retrieve(tool: DatasetRetrieverTool, dataset: Dataset, query: str, embedding_context=None):
+    return [Document(page_content=node_id, metadata={'doc_id': node_id, 'score': score})
+            for node_id, score in RESULTS[dataset.id]]
+
+
+def _hydrate(dataset_ids, index_node_ids, with_documents=False):
+    return [(DocumentSegment(dataset_id=node_id.split('-')[0], index_node_id=node_id, content=node_id), None)
+            for node_id in index_node_ids]
+
+
+@pytest.fixture
+def conversation_message_task(mocker):
+    mocker.patch.object(dataset_multi_retriever_tool.dataset_metadata_cache, 'get',
+                        side_effect=lambda tenant_id, dataset_id: DATASETS[dataset_id])
+    mocker.patch.object(DatasetRetrieverTool, 'retrieve', _retrieve)
+    mocker.patch.object(dataset_multi_retriever_tool, 'hydrate_segments', side_effect=_hydrate)
+    mocker.patch.object(dataset_multi_retriever_tool, 'DatasetIndexToolCallbackHandler')
+
+    with Flask(__name__).app_context():
+        yield MagicMock(spec=ConversationMessageTask)
+
+
+def _tool(conversation_message_task, dataset_id: str, top_k: int) -> DatasetRetrieverTool:
+    return DatasetRetrieverTool(
+        name=f'dataset-{dataset_id}',
+        tenant_id='tenant-id',
+        dataset_id=dataset_id,
+        top_k=top_k,
+        conversation_message_task=conversation_message_task,
+        return_resource=False,
+        retriever_from='dev'
+    )
+
+
+def test_results_of_all_datasets_are_merged_by_normalized_score(conversation_message_task):
+    tool = DatasetMultiRetrieverTool.from_tools([
+        _tool(conversation_message_task, 'faq', 4),
+        _tool(conversation_message_task, 'manual', 4),
+        _tool(conversation_message_task, 'notes', 4),
+    ])
+
+    # economy results are spread over the relevance scores of the query, from 0.87 down to 0.41
+    assert tool.run({'query': 'how to reset'}) == 'manual-1\nnotes-1\nfaq-1\nmanual-2'
+    assert conversation_message_task.on_dataset_query_end.call_count == 3
+
+
+def test_weak_best_match_of_a_dataset_does_not_beat_strong_matches(conversation_message_task):
+    tool = DatasetMultiRetrieverTool.from_tools([
+        _tool(conversation_message_task, 'unrelated', 2),
+        _tool(conversation_message_task, 'relevant', 2),
+    ])
+
+    assert tool.run({'query': 'how to reset'}) == 'relevant-1\nrelevant-2'
+
+
+def test_smallest_top_k_wins(conversation_message_task):
+    tool = DatasetMultiRetrieverTool.from_tools([
+        _tool(conversation_message_task, 'faq', 4),
+        _tool(conversation_message_task, 'manual', 1),
+    ])
+
+    assert tool.run({'query': 'how to reset'}) == 'manual-1'
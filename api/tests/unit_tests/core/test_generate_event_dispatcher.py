@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+
+import pytest
+
+from core.generate_event_dispatcher import GenerateEventDispatcher
+
+
+class FakeRedisStreams:
+    """
+    Just enough of redis streams for the dispatcher: xadd, blocking xread and pipelines.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._streams = {}
+        self._sequence = 0
+        self.xread_calls = 0
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        with self._condition:
+            self._sequence += 1
+            event_id = '1-{}'.format(self._sequence).encode()
+            self._streams.setdefault(key, []).append((event_id, {k.encode(): v for k, v in fields.items()}))
+            self._condition.notify_all()
+            return event_id
+
+    def xread(self, streams, count=None, block=None):
+        self.xread_calls += 1
+        deadline = time.monotonic() + block / 1000
+        with self._condition:
+            while True:
+                response = []
+                for key, last_id in streams.items():
+                    events = [event for event in self._streams.get(key, [])
+                              if GenerateEventDispatcher._parse_event_id(event[0].decode()) >
+                              GenerateEventDispatcher._parse_event_id(last_id)]
+                    if events:
+                        response.append((key.encode(), events[:count]))
+
+                remaining = deadline - time.monotonic()
+                if response or remaining <= 0:
+                    return response
+
+                self._condition.wait(remaining)
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self._commands = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self._commands.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(redis, name)(*args, **kwargs) for name, args, kwargs in self._commands]
+
+        return Pipeline()
+
+    def publish(self, channel, event):
+        return self.xadd(channel, {'data': json.dumps(event).encode()}).decode()
+
+
+@pytest.fixture
+def redis(mocker):
+    redis = FakeRedisStreams()
+    mocker.patch('core.generate_event_dispatcher.redis_client', redis)
+    return redis
+
+
+def test_dispatch_events_of_many_streams_with_one_reader(redis):
+    dispatcher = GenerateEventDispatcher()
+    first = dispatcher.subscribe('generate_result:a', '0', 1000)
+    second = dispatcher.subscribe('generate_result:b', '0', 1000)
+
+    redis.publish('generate_result:a', {'event': 'message', 'text': 'a'})
+    redis.publish('generate_result:b', {'event': 'message', 'text': 'b'})
+    redis.publish('generate_result:a', {'event': 'end'})
+
+    assert first.get(timeout=1)[1] == {'event': 'message', 'text': 'a'}
+    assert first.get(timeout=1)[1] == {'event': 'end'}
+    assert second.get(timeout=1)[1] == {'event': 'message', 'text': 'b'}
+
+    dispatcher.unsubscribe(first)
+    dispatcher.unsubscribe(second)
+    assert dispatcher._get_streams() == {}
+
+
+def test_resumed_subscription_only_gets_newer_events(redis):
+    dispatcher = GenerateEventDispatcher()
+    first_id = redis.publish('generate_result:a', {'event': 'message', 'text': 'first'})
+    redis.publish('generate_result:a', {'event': 'message', 'text': 'second'})
+
+    subscription = dispatcher.subscribe('generate_result:a', '0', 1000)
+    resumed = dispatcher.subscribe('generate_result:a', first_id, 1000)
+
+    assert subscription.get(timeout=1)[1]['text'] == 'first'
+    assert subscription.get(timeout=1)[1]['text'] == 'second'
+    assert resumed.get(timeout=1)[1]['text'] == 'second'
+
+    dispatcher.unsubscribe(subscription)
+    dispatcher.unsubscribe(resumed)
+
+
+def test_new_subscription_does_not_wait_for_pending_read(redis):
+    dispatcher = GenerateEventDispatcher()
+    idle = dispatcher.subscribe('generate_result:idle', '0', 10000)
+    time.sleep(0.1)
+
+    subscription = dispatcher.subscribe('generate_result:a', '0', 10000)
+    redis.publish('generate_result:a', {'event': 'end'})
+
+    started_at = time.monotonic()
+    assert subscription.get(timeout=5)[1] == {'event': 'end'}
+    assert time.monotonic() - started_at < 1
+
+    dispatcher.unsubscribe(idle)
+    dispatcher.unsubscribe(subscription)
@@ -0,0 +1,35 @@
+import threading
+from unittest.mock import MagicMock
+
+from flask import Flask
+from langchain.schema import Document
+
+from core import indexing_runner
+from core.indexing_runner import IndexingPipeline
+from models.dataset import Dataset, Document as DatasetDocument
+
+
+def test_pipeline_shuts_down_when_recording_an_error_fails(mocker):
+    db = mocker.patch.object(indexing_runner, 'db')
+    db.session.rollback.side_effect = Exception('database is down')
+    mocker.patch.object(indexing_runner, 'DatasetDocument')
+
+    runner = MagicMock()
+    runner._check_document_paused_status.side_effect = Exception('redis is down')
+
+    app = Flask(__name__)
+    app.config['INDEXING_PIPELINE_QUEUE_SIZE'] = 1
+
+    dataset = Dataset(id='dataset-id', tenant_id='tenant-id', indexing_technique='economy')
+    documents = [Document(page_content=str(i), metadata={'doc_id': str(i)}) for i in range(10)]
+
+    def run():
+        pipeline = IndexingPipeline(runner, app, chunk_size=1)
+        pipeline.submit(dataset, DatasetDocument(id='document-id'), documents)
+        pipeline.join()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
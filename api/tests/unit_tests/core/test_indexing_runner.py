@@ -0,0 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask
+from langchain.schema import Document
+
+from core.indexing_runner import IndexingRunner
+from core.model_providers.error import QuotaExceededError
+
+
+def test_qa_formatting_stops_at_the_first_non_transient_error(mocker):
+    mocker.patch.object(IndexingRunner, '_qa_executor', ThreadPoolExecutor(max_workers=1))
+    format_qa_document = mocker.patch.object(IndexingRunner, 'format_qa_document',
+                                             side_effect=QuotaExceededError())
+    documents = [Document(page_content=str(i)) for i in range(10)]
+
+    with Flask(__name__).app_context(), pytest.raises(QuotaExceededError):
+        IndexingRunner()._format_qa_documents(documents, 'tenant-id', 'English')
+
+    IndexingRunner._qa_executor.shutdown(wait=True)
+    assert format_qa_document.call_count < len(documents)
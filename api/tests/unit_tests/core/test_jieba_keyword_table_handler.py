@@ -0,0 +1,46 @@
+import jieba.analyse
+
+from core.index.keyword_table_index.jieba_keyword_table_handler import JiebaKeywordTableHandler
+
+
+def test_term_frequencies_count_tokens_not_substrings():
+    term_frequencies = JiebaKeywordTableHandler().get_term_frequencies(
+        'he said ai tools maintain ai models', ['ai', 'models', 'dataset']
+    )
+
+    assert term_frequencies == {'ai': 2, 'models': 1, 'dataset': 1}
+
+
+def test_keywords_are_extracted_with_their_term_frequencies():
+    text = 'he said machine learning models beat ai, ai models'
+    handler = JiebaKeywordTableHandler()
+
+    term_frequencies = handler.extract_keywords_with_term_frequencies(text, 5)
+
+    # same keywords as jieba's own tfidf extraction, with their counts
+    assert set(term_frequencies) == handler._expand_tokens_with_subtokens(jieba.analyse.extract_tags(text, topK=5))
+    assert term_frequencies['ai'] == 2 and term_frequencies['models'] == 2
+
+
+def test_keywords_are_extracted_in_spawned_workers():
+    texts = ['machine learning models'] * 64
+
+    term_frequencies_list = JiebaKeywordTableHandler().batch_extract_keywords_with_term_frequencies(
+        texts, max_workers=2
+    )
+
+    assert term_frequencies_list == [{'machine': 1, 'learning': 1, 'models': 1}] * 64
+
+
+def test_keywords_are_extracted_serially_in_daemonic_processes(mocker):
+    mocker.patch('multiprocessing.current_process').return_value.daemon = True
+    process_pool = mocker.patch(
+        'core.index.keyword_table_index.jieba_keyword_table_handler.ProcessPoolExecutor'
+    )
+
+    term_frequencies_list = JiebaKeywordTableHandler().batch_extract_keywords_with_term_frequencies(
+        ['machine learning'] * 64, max_workers=4
+    )
+
+    assert not process_pool.called
+    assert term_frequencies_list[0] == {'machine': 1, 'learning': 1}
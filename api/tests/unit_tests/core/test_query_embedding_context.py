@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.embedding.cached_embedding import CacheEmbedding
+from core.embedding.query_embedding_context import QueryEmbeddingContext
+
+
+def _embeddings(model_name: str) -> MagicMock:
+    embeddings = MagicMock(spec=CacheEmbedding)
+    embeddings.model_name = model_name
+
+    def embed_query(text: str):
+        time.sleep(0.05)
+        return [float(len(text))]
+
+    embeddings.embed_query.side_effect = embed_query
+    return embeddings
+
+
+def test_query_is_embedded_once_per_model_across_threads():
+    context = QueryEmbeddingContext()
+    ada = _embeddings('text-embedding-ada-002')
+    other = _embeddings('embedding-v1')
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        vectors = list(executor.map(lambda embeddings: context.embed_query(embeddings, 'reset password'),
+                                    [ada, ada, ada, other]))
+
+    assert vectors == [[14.0]] * 4
+    assert ada.embed_query.call_count == 1
+    assert other.embed_query.call_count == 1
+
+
+def test_failed_embedding_is_raised_to_every_caller():
+    context = QueryEmbeddingContext()
+    embeddings = _embeddings('text-embedding-ada-002')
+    embeddings.embed_query.side_effect = ValueError('rate limited')
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            context.embed_query(embeddings, 'reset password')
+
+    assert embeddings.embed_query.call_count == 1
@@ -0,0 +1,135 @@
+from collections import defaultdict
+
+import pytest
+from flask import Flask
+from redis.exceptions import ResponseError
+
+from core.helper import segment_hit_counter as segment_hit_counter_module
+from core.helper.segment_hit_counter import SegmentHitCounter
+
+
+class FakeRedisHashes:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def hincrby(self, key, field, amount=1):
+        hashes = self.data.setdefault(key, defaultdict(int))
+        hashes[field.encode('utf-8')] += amount
+        return hashes[field.encode('utf-8')]
+
+    def hgetall(self, key):
+        return {field: str(hits).encode('utf-8') for field, hits in self.data.get(key, {}).items()}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+
+        self.data[key] = value
+        return True
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def rename(self, src, dst):
+        if src not in self.data:
+            raise ResponseError('no such key')
+
+        self.data[dst] = self.data.pop(src)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+@pytest.fixture
+def counter(mocker):
+    redis = FakeRedisHashes()
+    mocker.patch.object(segment_hit_counter_module, 'redis_client', redis)
+    mocker.patch.object(segment_hit_counter_module, 'flush_segment_hit_counts_task')
+    mocker.patch.object(segment_hit_counter_module, 'db')
+
+    app = Flask(__name__)
+    app.config['SEGMENT_HIT_COUNT_FLUSH_INTERVAL'] = 30
+
+    with app.app_context():
+        counter = SegmentHitCounter()
+        counter.redis = redis
+        yield counter
+
+
+def test_hits_are_buffered_and_flush_scheduled_once(counter):
+    counter.add('dataset-1', ['node-1', 'node-2', 'node-1'])
+    counter.add('dataset-2', ['node-3'])
+
+    assert counter.redis.hgetall(SegmentHitCounter.hit_counts_key) == {
+        b'dataset-1:node-1': b'2',
+        b'dataset-1:node-2': b'1',
+        b'dataset-2:node-3': b'1',
+    }
+    segment_hit_counter_module.flush_segment_hit_counts_task.apply_async.assert_called_once_with(countdown=30)
+    segment_hit_counter_module.db.session.execute.assert_not_called()
+
+
+def test_flush_writes_all_hits_in_one_statement(counter):
+    counter.add('dataset-1', ['node-1', 'node-1', 'node-2'])
+    counter.flush()
+
+    db = segment_hit_counter_module.db
+    assert db.session.execute.call_count == 1
+    params = db.session.execute.call_args.args[1]
+    assert sorted(zip(
+        [params[f'index_node_id_{j}'] for j in range(2)],
+        [params[f'hits_{j}'] for j in range(2)]
+    )) == [('node-1', 2), ('node-2', 1)]
+    db.session.commit.assert_called_once()
+
+    # the next hit schedules a new flush, an empty flush does nothing
+    assert counter.redis.data == {}
+    counter.flush()
+    assert db.session.execute.call_count == 1
+
+
+def test_failed_flush_keeps_hits(counter):
+    segment_hit_counter_module.db.session.execute.side_effect = Exception('database is down')
+
+    counter.add('dataset-1', ['node-1'])
+    counter.flush()
+    counter.add('dataset-1', ['node-1'])
+
+    assert counter.redis.hgetall(SegmentHitCounter.hit_counts_key) == {b'dataset-1:node-1': b'2'}
+
+
+def test_flushing_hits_expire_and_are_kept_when_unreadable(counter, mocker):
+    mocker.patch.object(counter.redis, 'hgetall', side_effect=ConnectionError('redis is down'))
+
+    counter.add('dataset-1', ['node-1'])
+    counter.flush()
+
+    flushing_keys = [key for key in counter.redis.data if key.startswith('segment_hit_counts:flushing:')]
+    assert len(flushing_keys) == 1
+    assert counter.redis.ttls[flushing_keys[0]] == SegmentHitCounter.flushing_key_ttl
+    segment_hit_counter_module.db.session.execute.assert_not_called()
+
+
+def test_broker_errors_do_not_fail_retrieval(counter):
+    segment_hit_counter_module.flush_segment_hit_counts_task.apply_async.side_effect = Exception('broker is down')
+
+    counter.add('dataset-1', ['node-1'])
+
+    assert counter.redis.hgetall(SegmentHitCounter.hit_counts_key) == {b'dataset-1:node-1': b'1'}
@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from core.memory.token_counter import PromptMessageTokenCounter
+from core.model_providers.models.entity.message import PromptMessage
+
+
+@pytest.fixture
+def model_instance():
+    app = Flask(__name__)
+    app.config['PROMPT_TOKEN_COUNT_CACHE_SIZE'] = 100
+
+    model_instance = MagicMock()
+    model_instance.model_provider.provider_name = 'openai'
+    model_instance.name = 'gpt-3.5-turbo'
+    # 5 tokens per message plus 3 reply priming tokens per request
+    model_instance.get_num_tokens.side_effect = lambda messages: 3 + 5 * len(messages)
+
+    with app.app_context():
+        yield model_instance
+
+
+def test_request_overhead_is_charged_once(model_instance):
+    messages = [PromptMessage(content='message {}'.format(i)) for i in range(4)]
+
+    pruned = PromptMessageTokenCounter().prune(model_instance, messages, 13)
+
+    assert pruned == messages[2:]
+
+
+def test_oldest_messages_are_dropped_to_fit(model_instance):
+    messages = [PromptMessage(content='message {}'.format(i)) for i in range(4)]
+
+    assert PromptMessageTokenCounter().prune(model_instance, messages, 12) == messages[3:]
+    assert PromptMessageTokenCounter().prune(model_instance, messages, 7) == []
+
+
+def test_kept_messages_are_not_counted_again_far_from_the_limit(model_instance):
+    messages = [PromptMessage(content='message {}'.format(i)) for i in range(4)]
+    counter = PromptMessageTokenCounter()
+    counter.prune(model_instance, messages, 1000)
+    model_instance.get_num_tokens.reset_mock()
+
+    # per message counts and the overhead are memoized
+    assert counter.prune(model_instance, messages, 1000) == messages
+    model_instance.get_num_tokens.assert_not_called()
@@ -0,0 +1,43 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from libs.frozen import freeze, thaw, FrozenDict, FrozenList
+
+
+def test_freeze_is_read_only():
+    value = freeze({'model': {'completion_params': {'stop': ['\n']}}})
+
+    with pytest.raises(TypeError):
+        value['model'] = {}
+
+    with pytest.raises(TypeError):
+        value['model']['completion_params'].update({'max_tokens': 1})
+
+    with pytest.raises(TypeError):
+        value['model']['completion_params']['stop'].append('Human:')
+
+
+def test_copy_returns_mutable_deep_copy():
+    value = freeze({'completion_params': {'stop': ['\n']}})
+
+    for mutable in [value.copy(), copy.deepcopy(value), thaw(value)]:
+        assert type(mutable) is dict
+        assert type(mutable['completion_params']) is dict
+        assert type(mutable['completion_params']['stop']) is list
+        mutable['completion_params']['stop'].append('Human:')
+
+    assert value == {'completion_params': {'stop': ['\n']}}
+
+
+def test_frozen_values_serialize_as_plain_json():
+    value = freeze({'a': [1, {'b': None}]})
+
+    assert json.dumps(value) == '{"a": [1, {"b": null}]}'
+
+    unpickled = pickle.loads(pickle.dumps(value))
+    assert isinstance(unpickled, FrozenDict)
+    assert isinstance(unpickled['a'], FrozenList)
+    assert unpickled == value
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, Column, String, DateTime, event
+from sqlalchemy.orm import declarative_base, Session
+
+from libs.infinite_scroll_pagination import InfiniteScrollPagination
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+
+    id = Column(String(36), primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        now = datetime(2023, 1, 1)
+        # pairs of rows share a created_at, ties are broken by id
+        session.add_all([Item(id=f'item-{i:02d}', created_at=now + timedelta(seconds=i // 2)) for i in range(25)])
+        session.commit()
+
+        yield session
+
+
+def _paginate_all(session, limit):
+    pages = []
+    cursor = None
+    while True:
+        pagination = InfiniteScrollPagination.paginate(session.query(Item), Item, limit, cursor=cursor)
+        pages.append(pagination)
+        if not pagination.has_more:
+            return pages
+
+        cursor = pagination.data[-1]
+
+
+def test_paginate_walks_every_row_once(session):
+    pages = _paginate_all(session, 10)
+
+    assert [len(page.data) for page in pages] == [10, 10, 5]
+    assert [page.has_more for page in pages] == [True, True, False]
+    assert [item.id for page in pages for item in page.data] == [f'item-{i:02d}' for i in reversed(range(25))]
+
+
+def test_paginate_exact_page_has_no_more(session):
+    pages = _paginate_all(session, 5)
+
+    assert len(pages) == 5
+    assert pages[-1].has_more is False
+    assert len(pages[-1].data) == 5
+
+
+def test_paginate_does_not_count(session):
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    InfiniteScrollPagination.paginate(session.query(Item), Item, 10)
+
+    assert len(statements) == 1
+    assert 'count(' not in statements[0].lower()
@@ -0,0 +1,54 @@
+import pytest
+from Crypto.PublicKey import RSA
+from flask import Flask
+
+from libs import rsa
+
+
+@pytest.fixture
+def private_keys(mocker):
+    private_keys = {}
+    mocker.patch.object(rsa, 'redis_client')
+    rsa.redis_client.get.return_value = None
+    storage = mocker.patch.object(rsa, 'storage')
+    storage.save.side_effect = lambda filepath, data: private_keys.__setitem__(filepath, data)
+    storage.load.side_effect = lambda filepath: private_keys[filepath]
+
+    mocker.patch.object(rsa, '_private_key_cache', None)
+    mocker.patch.object(rsa, '_decrypted_text_cache', None)
+
+    app = Flask(__name__)
+    app.config['RSA_PRIVATE_KEY_CACHE_SIZE'] = 10
+    app.config['RSA_PRIVATE_KEY_CACHE_TTL'] = 600
+    app.config['DECRYPTED_TOKEN_CACHE_SIZE'] = 10
+    app.config['DECRYPTED_TOKEN_CACHE_TTL'] = 600
+
+    with app.app_context():
+        yield storage
+
+
+def test_decrypt_batch_loads_private_key_once(private_keys, mocker):
+    public_key = rsa.generate_key_pair('tenant-id')
+    import_key = mocker.spy(RSA, 'import_key')
+
+    encrypted_texts = [rsa.encrypt('api-key', public_key), rsa.encrypt('secret-key', public_key)]
+    assert rsa.decrypt_batch(encrypted_texts, 'tenant-id') == ['api-key', 'secret-key']
+    assert rsa.decrypt(encrypted_texts[0], 'tenant-id') == 'api-key'
+
+    # one import for each encrypt, a single one for all decrypts
+    assert import_key.call_count == 3
+    assert private_keys.load.call_count == 1
+
+
+def test_decrypt_after_key_pair_reset_by_another_process(private_keys, mocker):
+    public_key = rsa.generate_key_pair('tenant-id')
+    assert rsa.decrypt(rsa.encrypt('old-key', public_key), 'tenant-id') == 'old-key'
+
+    # the key pair is replaced in storage while the old private key is still cached here
+    mocker.patch.object(rsa, '_drop_private_key', wraps=rsa._drop_private_key)
+    private_key = RSA.generate(2048)
+    private_keys.save('privkeys/tenant-id/private.pem', private_key.export_key())
+    public_key = private_key.publickey().export_key()
+
+    assert rsa.decrypt(rsa.encrypt('new-key', public_key), 'tenant-id') == 'new-key'
+    rsa._drop_private_key.assert_called_once_with('tenant-id')
@@ -115,3 +115,27 @@ def test_get_model_credentials_obfuscated(mock_decrypt, mocker):
     middle_token = result['openai_api_key'][6:-2]
     assert len(middle_token) == max(len(VALIDATE_CREDENTIAL['openai_api_key']) - 8, 0)
     assert all(char == '*' for char in middle_token)
+
+
+def test_legacy_provider_config_is_converted_once(mocker):
+    provider = Provider(
+        id='provider_id',
+        tenant_id='tenant_id',
+        provider_name=PROVIDER_NAME,
+        provider_type=ProviderType.CUSTOM.value,
+        encrypted_config=json.dumps(VALIDATE_CREDENTIAL),
+        is_valid=True,
+    )
+
+    mock_session = mocker.patch('extensions.ext_database.db.session')
+    mock_invalidate = mocker.patch(
+        'core.model_providers.preferred_provider_cache.preferred_provider_cache.invalidate'
+    )
+
+    model_provider = MODEL_PROVIDER_CLASS(provider=provider)
+    model_provider._convert_provider_config_to_model_config()
+    model_provider._convert_provider_config_to_model_config()
+
+    assert mock_session.add.call_count == 5
+    mock_session.query.return_value.filter.return_value.update.assert_called_once()
+    mock_invalidate.assert_called_once_with('tenant_id')
@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from core.model_providers.preferred_provider_cache import PreferredProviderCache
+from models.provider import Provider, ProviderType
+
+
+@pytest.fixture
+def redis_versions(mocker):
+    versions = {}
+    mock_redis = mocker.patch('core.model_providers.preferred_provider_cache.redis_client')
+    mock_redis.get.side_effect = lambda key: versions.get(key)
+    mock_redis.incr.side_effect = lambda key: versions.__setitem__(key, str(int(versions.get(key, 0)) + 1).encode())
+    return versions
+
+
+@pytest.fixture
+def cache(redis_versions):
+    app = Flask(__name__)
+    app.config['PREFERRED_PROVIDER_CACHE_SIZE'] = 100
+    app.config['PREFERRED_PROVIDER_CACHE_TTL'] = 60
+
+    with app.app_context():
+        yield PreferredProviderCache()
+
+
+def _provider(is_valid: bool = True) -> Provider:
+    return Provider(
+        id='provider-id',
+        tenant_id='tenant-id',
+        provider_name='openai',
+        provider_type=ProviderType.CUSTOM.value,
+        encrypted_config='{"openai_api_key": "key"}',
+        is_valid=is_valid
+    )
+
+
+def test_resolved_provider_is_cached(cache):
+    resolve = MagicMock(return_value=_provider())
+
+    first = cache.get_or_resolve('tenant-id', 'openai', resolve)
+    second = cache.get_or_resolve('tenant-id', 'openai', resolve)
+
+    assert resolve.call_count == 1
+    assert second is not first
+    assert second.id == 'provider-id'
+    assert second.encrypted_config == '{"openai_api_key": "key"}'
+
+
+def test_invalid_provider_is_not_cached(cache):
+    resolve = MagicMock(return_value=_provider(is_valid=False))
+
+    cache.get_or_resolve('tenant-id', 'openai', resolve)
+    cache.get_or_resolve('tenant-id', 'openai', resolve)
+
+    assert resolve.call_count == 2
+
+
+def test_invalidate_from_another_process(cache, redis_versions):
+    resolve = MagicMock(return_value=_provider())
+    cache.get_or_resolve('tenant-id', 'openai', resolve)
+
+    # another process bumps the version of the tenant
+    PreferredProviderCache().invalidate('tenant-id')
+    cache.get_or_resolve('tenant-id', 'openai', resolve)
+    assert resolve.call_count == 2
+
+    # other tenants are left untouched
+    cache.invalidate('other-tenant-id')
+    cache.get_or_resolve('tenant-id', 'openai', resolve)
+    assert resolve.call_count == 2
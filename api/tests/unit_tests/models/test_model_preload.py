@@ -0,0 +1,177 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+from extensions.ext_database import db
+from models.account import Account
+from models.model import Conversation, Message, MessageFeedback, MessageAnnotation, MessageAgentThought, \
+    MessageFile, AppModelConfig, EndUser, UploadFile, DatasetRetrieverResource
+
+TABLES = [Account, Conversation, Message, MessageFeedback, MessageAnnotation, MessageAgentThought, MessageFile,
+          AppModelConfig, EndUser, UploadFile, DatasetRetrieverResource]
+
+
+@compiles(UUID, 'sqlite')
+def compile_uuid(type_, compiler, **kw):
+    return 'CHAR(36)'
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    with app.app_context():
+        tables = [model.__table__ for model in TABLES]
+        server_defaults = {}
+        for table in tables:
+            for column in table.columns:
+                # postgres only defaults like uuid_generate_v4() or CURRENT_TIMESTAMP(0)
+                server_defaults[column] = column.server_default
+                column.server_default = None
+
+        try:
+            db.metadata.create_all(db.engine, tables=tables)
+        finally:
+            for column, server_default in server_defaults.items():
+                column.server_default = server_default
+
+        yield app
+
+        db.session.remove()
+
+
+def _new_id():
+    return str(uuid.uuid4())
+
+
+def _create_conversation_with_messages(message_count: int) -> Conversation:
+    now = datetime.utcnow()
+    account = Account(id=_new_id(), name='admin', email='admin@example.com', status='active',
+                      last_active_at=now, created_at=now, updated_at=now)
+    app_model_config = AppModelConfig(id=_new_id(), app_id=_new_id(), provider='openai', model_id='gpt-3.5-turbo',
+                                      configs={}, created_at=now, updated_at=now)
+    end_user = EndUser(id=_new_id(), tenant_id=_new_id(), type='browser', session_id='session', is_anonymous=True,
+                       created_at=now, updated_at=now)
+    conversation = Conversation(id=_new_id(), app_id=app_model_config.app_id,
+                                app_model_config_id=app_model_config.id, model_provider='openai',
+                                model_id='gpt-3.5-turbo', mode='chat', name='test', status='normal',
+                                from_source='api', from_end_user_id=end_user.id, system_instruction_tokens=0,
+                                is_deleted=False, created_at=now, updated_at=now)
+    db.session.add_all([account, app_model_config, end_user, conversation])
+
+    for i in range(message_count):
+        message = Message(id=_new_id(), app_id=conversation.app_id, model_provider='openai',
+                          model_id='gpt-3.5-turbo', conversation_id=conversation.id, inputs={}, query=f'query {i}',
+                          message={}, message_tokens=1, message_unit_price=0, message_price_unit=0.001,
+                          answer=f'answer {i}', answer_tokens=1, answer_unit_price=0, answer_price_unit=0.001,
+                          provider_response_latency=0, currency='USD', from_source='api',
+                          from_end_user_id=end_user.id, agent_based=False,
+                          created_at=now + timedelta(seconds=i), updated_at=now)
+        db.session.add(message)
+        db.session.add(MessageFeedback(id=_new_id(), app_id=conversation.app_id, conversation_id=conversation.id,
+                                       message_id=message.id, rating='like', from_source='user',
+                                       from_end_user_id=end_user.id, created_at=now, updated_at=now))
+        db.session.add(MessageFeedback(id=_new_id(), app_id=conversation.app_id, conversation_id=conversation.id,
+                                       message_id=message.id, rating='dislike', from_source='admin',
+                                       from_account_id=account.id, created_at=now, updated_at=now))
+        db.session.add(MessageAnnotation(id=_new_id(), app_id=conversation.app_id,
+                                         conversation_id=conversation.id, message_id=message.id,
+                                         content='annotation', account_id=account.id,
+                                         created_at=now, updated_at=now))
+        db.session.add(MessageFile(id=_new_id(), message_id=message.id, type='image', transfer_method='remote_url',
+                                   url='https://example.com/image.png', created_by_role='end_user',
+                                   created_by=end_user.id, created_at=now))
+
+    db.session.commit()
+
+    return conversation
+
+
+def _serialize_message(message: Message) -> dict:
+    return {
+        'feedbacks': [(feedback.rating, feedback.from_account.id if feedback.from_account else None)
+                      for feedback in message.feedbacks],
+        'user_feedback': message.user_feedback.rating,
+        'admin_feedback': message.admin_feedback.rating,
+        'annotation': (message.annotation.content, message.annotation.account.id),
+        'agent_thoughts': message.agent_thoughts,
+        'retriever_resources': message.retriever_resources,
+        'files': message.files
+    }
+
+
+def _serialize_conversation(conversation: Conversation) -> dict:
+    return {
+        'annotated': conversation.annotated,
+        'annotation': conversation.annotation.content,
+        'message_count': conversation.message_count,
+        'user_feedback_stats': conversation.user_feedback_stats,
+        'admin_feedback_stats': conversation.admin_feedback_stats,
+        'first_message': conversation.first_message.query,
+        'summary': conversation.summary_or_query,
+        'from_end_user_session_id': conversation.from_end_user_session_id,
+        'model_config': conversation.model_config
+    }
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+
+def test_message_preload_properties_query_count(app):
+    conversation = _create_conversation_with_messages(20)
+    conversation_id = conversation.id
+
+    db.session.expunge_all()
+    messages = db.session.query(Message).filter(Message.conversation_id == conversation_id).all()
+    expected = [_serialize_message(message) for message in messages]
+
+    db.session.expunge_all()
+    messages = db.session.query(Message).filter(Message.conversation_id == conversation_id).all()
+    with QueryCounter(db.engine) as counter:
+        Message.preload_properties(messages)
+        serialized = [_serialize_message(message) for message in messages]
+
+    assert serialized == expected
+    # feedbacks, accounts of feedbacks, annotations, accounts of annotations, agent thoughts,
+    # retriever resources, message files
+    assert counter.count <= 7
+
+
+def test_conversation_preload_properties_query_count(app):
+    conversations = [_create_conversation_with_messages(3) for _ in range(10)]
+    conversation_ids = [conversation.id for conversation in conversations]
+
+    db.session.expunge_all()
+    conversations = db.session.query(Conversation).filter(Conversation.id.in_(conversation_ids)).all()
+    expected = [_serialize_conversation(conversation) for conversation in conversations]
+
+    db.session.expunge_all()
+    conversations = db.session.query(Conversation).filter(Conversation.id.in_(conversation_ids)).all()
+    with QueryCounter(db.engine) as counter:
+        Conversation.preload_properties(conversations)
+        serialized = [_serialize_conversation(conversation) for conversation in conversations]
+
+    assert serialized == expected
+    # annotations, accounts of annotations, message counts, feedback stats, first messages,
+    # app model configs, end users
+    assert counter.count <= 7
@@ -0,0 +1,69 @@
+import queue
+
+import pytest
+from flask import Flask
+
+from services import completion_service
+from services.completion_service import CompletionService
+
+
+class FakeSubscription:
+    def __init__(self, events):
+        self._events = iter(events)
+
+    def get(self, timeout=None):
+        event = next(self._events, None)
+        if event is None:
+            raise queue.Empty()
+
+        return event
+
+
+@pytest.fixture
+def stream(mocker):
+    clock = mocker.patch.object(completion_service.time, 'perf_counter', return_value=0)
+    stop = mocker.patch.object(completion_service.PubHandler, 'stop')
+    mocker.patch.object(completion_service.PubHandler, 'generate_channel_name', return_value='channel')
+    dispatcher = mocker.patch.object(completion_service, 'generate_event_dispatcher')
+
+    app = Flask(__name__)
+    app.config['COMPLETION_STREAM_TIMEOUT'] = 60
+    app.config['COMPLETION_STREAM_READ_BLOCK'] = 1000
+
+    def read(events):
+        dispatcher.subscribe.return_value = FakeSubscription(events)
+        return CompletionService.read_generate_events(mocker.Mock(), 'task-id')
+
+    with app.app_context():
+        yield read, clock, stop
+
+
+def test_stream_ends_with_the_task(stream):
+    read, clock, stop = stream
+
+    events = list(read([('1-1', {'event': 'message'}), ('1-2', {'event': 'end'})]))
+
+    assert [event_id for event_id, _ in events] == ['1-1', '1-2']
+    assert not stop.called
+
+
+def test_task_streaming_past_the_timeout_is_stopped(stream):
+    read, clock, stop = stream
+    events = read(('1-{}'.format(i), {'event': 'message'}) for i in range(1000))
+
+    assert next(events)[0] == '1-0'
+    clock.return_value = 61
+
+    assert list(events) == []
+    assert stop.called
+
+
+def test_idle_stream_pings_until_the_timeout(stream):
+    read, clock, stop = stream
+    events = read([])
+
+    assert next(events) == ('0', {'event': 'ping'})
+    clock.return_value = 61
+
+    assert list(events) == []
+    assert stop.called
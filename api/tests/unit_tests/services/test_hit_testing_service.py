@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from services.hit_testing_service import HitTestingService
+
+
+@pytest.fixture
+def embeddings():
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((11, 64))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+
+@pytest.mark.parametrize('method', ['pca', 'random_projection'])
+def test_linear_projections_are_deterministic(embeddings, method):
+    positions = HitTestingService.get_positions_from_embeddings(embeddings, method)
+
+    assert len(positions) == 11
+    assert positions == HitTestingService.get_positions_from_embeddings(embeddings, method)
+
+
+def test_pca_keeps_the_largest_spread(embeddings):
+    # points spread along a single direction end up on the x axis
+    direction = np.array(embeddings[0])
+    line = [(direction * t).tolist() for t in np.linspace(-1, 1, 5)]
+
+    positions = HitTestingService.get_positions_from_embeddings(line, 'pca')
+
+    assert np.allclose([position['y'] for position in positions], 0)
+    assert np.allclose(sorted(abs(position['x']) for position in positions), [0, 0.5, 0.5, 1, 1])
+
+
+def test_single_vector_is_centered():
+    assert HitTestingService.get_positions_from_embeddings([[0.1, 0.2]], 'pca') == [{'x': 0, 'y': 0}]
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        HitTestingService.get_positions_from_embeddings([[0.1, 0.2], [0.2, 0.1]], 'umap')